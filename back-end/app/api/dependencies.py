@@ -0,0 +1,81 @@
+"""
+Route dependencies. The pipeline services are created on first use (or at
+startup with PRELOAD_DEPENDENCIES) and shared afterwards; their modules are
+only imported then, so importing the app stays cheap for cold starts.
+Tests and benchmarks swap them through `app.dependency_overrides`.
+"""
+import os
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import Depends
+
+if TYPE_CHECKING:
+    from .document_processing.llama_parser import DocumentParser
+    from .document_processing.maverick_analyzer import MaverickAnalyzer
+    from .document_processing.output_generator import OutputGenerator
+    from .document_processing.scoring import ScoringLlamaService
+
+_document_parser: Optional["DocumentParser"] = None
+_maverick_analyzer: Optional["MaverickAnalyzer"] = None
+_output_generator: Optional["OutputGenerator"] = None
+_scoring_service: Optional["ScoringLlamaService"] = None
+
+
+def get_document_parser() -> "DocumentParser":
+    global _document_parser
+    if _document_parser is None:
+        from .document_processing.llama_parser import DocumentParser
+        _document_parser = DocumentParser(api_key=os.getenv("LLAMA_CLOUD_API_KEY"))
+    return _document_parser
+
+
+def get_maverick_analyzer() -> "MaverickAnalyzer":
+    global _maverick_analyzer
+    if _maverick_analyzer is None:
+        from .document_processing.maverick_analyzer import MaverickAnalyzer
+        _maverick_analyzer = MaverickAnalyzer()
+    return _maverick_analyzer
+
+
+def get_output_generator() -> "OutputGenerator":
+    global _output_generator
+    if _output_generator is None:
+        from .document_processing.output_generator import OutputGenerator
+        _output_generator = OutputGenerator()
+    return _output_generator
+
+
+def get_scoring_service() -> "ScoringLlamaService":
+    global _scoring_service
+    if _scoring_service is None:
+        from .document_processing.scoring import ScoringLlamaService
+        _scoring_service = ScoringLlamaService()
+    return _scoring_service
+
+
+class AnalysisPipeline:
+    """The services one analysis runs through, in order"""
+
+    def __init__(self, parser: "DocumentParser", analyzer: "MaverickAnalyzer",
+                 scoring: "ScoringLlamaService", output_generator: "OutputGenerator"):
+        self.parser = parser
+        self.analyzer = analyzer
+        self.scoring = scoring
+        self.output_generator = output_generator
+
+
+def get_analysis_pipeline(
+    parser: "DocumentParser" = Depends(get_document_parser),
+    analyzer: "MaverickAnalyzer" = Depends(get_maverick_analyzer),
+    scoring: "ScoringLlamaService" = Depends(get_scoring_service),
+    output_generator: "OutputGenerator" = Depends(get_output_generator)
+) -> AnalysisPipeline:
+    return AnalysisPipeline(parser, analyzer, scoring, output_generator)
+
+
+def preload_dependencies():
+    """Build every service (and the LlamaParse client) now instead of on the first request"""
+    get_document_parser().parser
+    get_maverick_analyzer()
+    get_scoring_service()
+    get_output_generator()
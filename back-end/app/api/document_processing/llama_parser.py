@@ -1,26 +1,58 @@
-from llama_parse import LlamaParse
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set, Tuple
+import asyncio
 import re
-from dotenv import load_dotenv
 import os
+from ...core import config
+from ...utils.adaptive_limiter import AdaptiveLimiter
+from ...utils.cache import ResultCache, get_result_cache
+from ...utils.tracing import current_span, traced
+from .local_pdf_extractor import LocalPDFExtractor
+from .page_splitter import PageShard, PageSplitter, page_fingerprints
 
 
 class DocumentParser:
-    def __init__(self, api_key: str):
-        load_dotenv()
-
+    def __init__(self, api_key: str, cache: Optional[ResultCache] = None):
         api_key = os.getenv('LLAMA_CLOUD_API_KEY')
         if not api_key:
             raise ValueError("LLAMA_CLOUD_API_KEY environment variable is not set")
 
-        self.parser = LlamaParse(
-            api_key=api_key,
-            result_type="markdown",
-            num_workers=4,
-            verbose=True,
-            language="en"
+        self.api_key = api_key
+        self._parser = None
+        self.local_extractor: Optional[LocalPDFExtractor] = (
+            LocalPDFExtractor() if config.LOCAL_PDF_EXTRACTION else None
         )
-    
+        self.splitter = PageSplitter(config.PARSE_PAGES_PER_SHARD)
+        self.shard_limiter = AdaptiveLimiter(
+            initial=config.PARSE_SHARD_INITIAL_CONCURRENCY,
+            minimum=1,
+            maximum=config.PARSE_SHARD_MAX_CONCURRENCY,
+            latency_target=config.PARSE_SHARD_LATENCY_TARGET
+        )
+        self.cache = cache or get_result_cache()
+
+    @property
+    def parser(self):
+        """
+        The LlamaParse client, built on first use: llama_parse pulls in
+        llama_index and takes over a second to import, and pages served by
+        the local extractor or the cache never need it.
+        """
+        if self._parser is None:
+            from llama_parse import LlamaParse
+            self._parser = LlamaParse(
+                api_key=self.api_key,
+                result_type="markdown",
+                num_workers=4,
+                verbose=True,
+                language="en"
+            )
+        return self._parser
+
+    @parser.setter
+    def parser(self, parser):
+        self._parser = parser
+
+    @traced("DocumentParser.parse_document")
     async def parse_document(self, file_path: str) -> Dict[str, Any]:
         """
         Parse document using LlamaParse's OCR and structured parsing
@@ -32,10 +64,128 @@ class DocumentParser:
             Dictionary containing structured document data
         """
         try:
+            if file_path.lower().endswith(".pdf"):
+                return await self._parse_pdf_incremental(file_path)
             documents = await self.parser.aload_data(file_path)
             return self._structure_output(documents)
         except Exception as e:
             raise Exception(f"Error parsing document: {str(e)}")
+
+    async def _parse_pdf_incremental(self, file_path: str) -> Dict[str, Any]:
+        """
+        Fingerprint every page and reuse cached page output, so a statement
+        that comes back with a few new or changed pages only parses those.
+        Output is one document per page in page order.
+        """
+        fingerprints = await asyncio.to_thread(page_fingerprints, file_path)
+        # Cache calls run off the loop: the SQLite cache can wait on another worker's write
+        cached_pages = await asyncio.to_thread(lambda: [self.cache.get("page", fingerprint) for fingerprint in fingerprints])
+        documents: Dict[int, Dict[str, Any]] = {
+            page: cached for page, cached in enumerate(cached_pages, start=1) if cached is not None
+        }
+
+        missing = [page for page in range(1, len(fingerprints) + 1) if page not in documents]
+        if missing:
+            fresh = await self._parse_pages(file_path, missing, len(fingerprints))
+            # A page whose OCR text could not be told apart is parsed again next time
+            await asyncio.to_thread(self._cache_pages, {
+                fingerprints[page - 1]: fresh[page] for page in missing if not fresh[page]["metadata"].get("degraded")
+            })
+            documents.update({page: fresh[page] for page in missing})
+        print(f"Page cache: {len(fingerprints) - len(missing)} reused, {len(missing)} parsed")
+        span = current_span()
+        span.set_attribute("pages", len(fingerprints))
+        span.set_attribute("parse.pages_cached", len(fingerprints) - len(missing))
+        span.set_attribute("cache.hit", not missing)
+
+        output = []
+        for page, fingerprint in enumerate(fingerprints, start=1):
+            document = documents[page]
+            # The same page content may sit at a different position this time
+            document["metadata"].update({"page": page, "fingerprint": fingerprint, "cached": page not in missing})
+            output.append(document)
+        return {"documents": output}
+
+    def _cache_pages(self, pages: Dict[str, Dict[str, Any]]):
+        for fingerprint, document in pages.items():
+            self.cache.set("page", fingerprint, document)
+
+    async def _parse_pages(self, file_path: str, page_numbers: List[int], page_count: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Parse the given (1-based) pages. Digital pages are read from the PDF
+        text layer locally; only scanned pages are sent to LlamaParse.
+        """
+        if self.local_extractor is None:
+            ocr_text, unmapped = await self._ocr_pages(file_path, page_numbers, page_count)
+            return {
+                page: self._page_document(page, ocr_text.get(page, ""), "ocr", degraded=page in unmapped)
+                for page in page_numbers
+            }
+
+        pages = await self.local_extractor.extract(file_path, page_numbers)
+        scanned = [page["page"] for page in pages if not page["has_text_layer"]]
+        ocr_text, unmapped = await self._ocr_pages(file_path, scanned, page_count) if scanned else ({}, set())
+        print(f"Local text layer: {len(pages) - len(scanned)} pages, OCR: {len(scanned)} pages")
+        current_span().set_attribute("parse.pages_ocr", len(scanned))
+
+        return {
+            page["page"]: (
+                self._page_document(page["page"], page["text"], "text_layer", page["tables"])
+                if page["has_text_layer"]
+                else self._page_document(page["page"], ocr_text.get(page["page"], ""), "ocr",
+                                         degraded=page["page"] in unmapped)
+            )
+            for page in pages
+        }
+
+    def _page_document(self, page: int, text: str, source: str, tables: Optional[List] = None,
+                       degraded: bool = False) -> Dict[str, Any]:
+        metadata = {"page": page, "source": source}
+        if degraded:
+            metadata["degraded"] = True
+        return {
+            "content": text,
+            "metadata": metadata,
+            "sections": self._split_into_sections(text),
+            "tables": tables or []
+        }
+
+    async def _ocr_pages(self, file_path: str, page_numbers: List[int],
+                         page_count: int) -> Tuple[Dict[int, str], Set[int]]:
+        """
+        Run LlamaParse on the given (1-based) pages; returns page -> text,
+        plus the pages whose text could not be mapped back to them one to
+        one (see _map_shard_text). Large page sets are cut into shards that
+        are parsed concurrently under the adaptive limit and reassembled in
+        page order.
+        """
+        if len(page_numbers) == page_count and page_count <= self.splitter.pages_per_shard:
+            documents = await self.parser.aload_data(file_path)
+            return self._map_shard_text(page_numbers, documents)
+
+        shards = await asyncio.to_thread(self.splitter.split, file_path, page_numbers)
+        print(f"Parsing {len(page_numbers)} pages as {len(shards)} shards")
+        results = await asyncio.gather(*(self._parse_shard(shard) for shard in shards))
+
+        page_text: Dict[int, str] = {}
+        unmapped: Set[int] = set()
+        for shard, documents in zip(shards, results):
+            shard_text, shard_unmapped = self._map_shard_text(shard.page_numbers, documents)
+            page_text.update(shard_text)
+            unmapped |= shard_unmapped
+        return page_text, unmapped
+
+    async def _parse_shard(self, shard: PageShard) -> List:
+        async with self.shard_limiter.slot():
+            return await self.parser.aload_data(shard.data, extra_info={"file_name": shard.file_name})
+
+    def _map_shard_text(self, page_numbers: List[int], documents: List) -> Tuple[Dict[int, str], Set[int]]:
+        if len(documents) == len(page_numbers):
+            return {page: doc.text for page, doc in zip(page_numbers, documents)}, set()
+        # Page split did not line up: keep the whole shard's text on its first
+        # page, and report every page of the shard so none of them is cached
+        print(f"LlamaParse returned {len(documents)} documents for {len(page_numbers)} pages; not caching them")
+        return {page_numbers[0]: "\n\n".join(doc.text for doc in documents)}, set(page_numbers)
     
     def _structure_output(self, parsed_data: List) -> Dict[str, Any]:
         """
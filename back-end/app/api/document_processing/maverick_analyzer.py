@@ -1,134 +1,366 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import asyncio
+import hashlib
 import json
+from fastapi import HTTPException
+from ...core import config
+from ...utils.cache import ResultCache, content_key, get_result_cache
+from ...utils.json_stream import JSONSectionStream
 from ...utils.llama_client import LlamaClient
+from ...utils.model_router import last_served_model
+from ...utils.request_profiler import profile_span
+from ...utils.tracing import current_span, traced
+from ...services.prompts import RenderedPrompt, get_prompt_registry
+from ...services.recurring import RecurringDetector
+from ...services.statement_transactions import transactions_from_parsed
+
+# Top-level sections of the analysis JSON -> scoring buckets
+SECTION_BUCKETS = {
+    "Cash Flow Analysis": "cash_flow",
+    "Expense Analysis": "expenses",
+    "Income Analysis": "income",
+    "Debt and Credit": "debt_credit",
+}
+
+SectionCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class _BucketAssembler:
+    """
+    Collects each chunk's sections and hands a bucket to the callback once
+    every chunk has delivered it, merged across chunks like the full analysis
+    and with the locally detected recurring items applied.
+    """
+
+    def __init__(self, analyzer: "MaverickAnalyzer", chunks: int, recurring: Optional[Dict[str, Any]],
+                 on_section: SectionCallback):
+        self.analyzer = analyzer
+        self.recurring = recurring
+        self.on_section = on_section
+        self.parts: Dict[str, List[Optional[Dict[str, Any]]]] = {bucket: [None] * chunks for bucket in SECTION_BUCKETS.values()}
+        self.delivered: set = set()
+
+    async def add(self, chunk: int, bucket: str, data: Dict[str, Any]):
+        parts = self.parts[bucket]
+        if parts[chunk] is not None or bucket in self.delivered:
+            return
+        parts[chunk] = data
+        if any(part is None for part in parts):
+            return
+        self.delivered.add(bucket)
+        merged = self.analyzer._merge_analyses([{bucket: part} for part in parts])
+        if self.recurring is not None:
+            self.analyzer._apply_recurring(merged, self.recurring)
+        await self.on_section(bucket, merged[bucket])
+
+    async def fill(self, chunk: int, structured: Dict[str, Any]):
+        """Deliver whatever the stream did not (unparseable or missing sections)"""
+        for bucket in SECTION_BUCKETS.values():
+            await self.add(chunk, bucket, structured[bucket])
+
 
 class MaverickAnalyzer:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResultCache] = None):
         self.llama_client = LlamaClient()
+        self.prompts = get_prompt_registry()
+        self.cache = cache or get_result_cache()
+        self.recurring_detector = RecurringDetector(amount_tolerance=config.RECURRING_AMOUNT_TOLERANCE)
 
-    async def analyze_transactions(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+    @traced("MaverickAnalyzer.analyze_transactions")
+    async def analyze_transactions(
+        self,
+        parsed_data: Dict[str, Any],
+        on_section: Optional[SectionCallback] = None
+    ) -> Dict[str, Any]:
         """
-        Analyze parsed statement data using Llama-4-Maverick
+        Analyze parsed statement data using Llama-4-Maverick. Pages are
+        analyzed in content-defined chunks whose results are cached by content,
+        so re-submitting a statement only re-analyzes chunks with changed pages.
+
+        With `on_section`, completions are streamed and each bucket
+        (cash_flow, expenses, ...) is passed to the callback as soon as every
+        chunk has produced that section. The returned analysis is still built
+        from the complete responses.
         """
         try:
-            print("Starting analyze_transactions with parsed_data:", parsed_data)
-            
             # Extract documents from the dictionary
             documents = parsed_data.get('documents', [])
             if not documents:
                 raise Exception("No documents found in parsed data")
-                
-            # Get the first document
-            document = documents[0]
-            print("First document:", document)
-            
-            # Get the content from the document
-            document_content = document.get('content', '')
-            if not document_content:
+
+            chunks = self._chunk_documents(documents)
+            if not chunks:
                 raise Exception("No content found in document")
-            
-            print("Document content:", document_content[:100])  # Print first 100 chars
-                
-            # Construct prompt for Maverick
-            prompt = self._build_analysis_prompt(document_content)
-            print("Built prompt successfully")
-            
-            # Get analysis from Maverick
-            print("Calling Maverick completion...")
-            response = await self.llama_client.get_maverick_completion(prompt)
-            print("Maverick response:", response)
-            
-            structured_analysis = self._structure_analysis(response)
+            print(f"Analyzing {len(documents)} pages as {len(chunks)} chunks")
+            span = current_span()
+            span.set_attribute("pages", len(documents))
+            span.set_attribute("analysis.chunks", len(chunks))
+            span.set_attribute("analysis.chunks_cached", 0)
+
+            recurring = await asyncio.to_thread(self._detect_recurring, parsed_data)
+            sections = _BucketAssembler(self, len(chunks), recurring, on_section) if on_section else None
+            analyses = await asyncio.gather(*(
+                self._analyze_chunk(chunk, recurring, index, sections) for index, chunk in enumerate(chunks)
+            ))
+            span.set_attribute("cache.hit", span.attributes.get("analysis.chunks_cached") == len(chunks))
+            structured_analysis = self._merge_analyses(list(analyses))
+            if recurring is not None:
+                self._apply_recurring(structured_analysis, recurring)
             print("Structured analysis successfully")
             return structured_analysis
             
+        except HTTPException:
+            # Upstream status (e.g. 429 with Retry-After) must reach the client intact
+            raise
         except Exception as e:
             print(f"Error in analyze_transactions: {str(e)}")
             raise Exception(f"Analysis failed: {str(e)}")
 
+    def _chunk_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """
+        Group page contents into chunks of about ANALYSIS_PAGES_PER_CHUNK
+        pages. Boundaries are content-defined: a chunk ends after a page whose
+        fingerprint hashes to a boundary (or at twice the target size), so an
+        inserted, removed or edited page only changes the chunks around it
+        and every other chunk keeps its text (and cache key).
+        """
+        size = max(1, config.ANALYSIS_PAGES_PER_CHUNK)
+        chunks, current = [], []
+        for index, doc in enumerate(documents):
+            current.append(doc.get('content', ''))
+            if len(current) >= 2 * size or index == len(documents) - 1 or self._ends_chunk(doc, size):
+                text = "\n\n".join(content for content in current if content)
+                if text:
+                    chunks.append(text)
+                current = []
+        return chunks
+
+    def _ends_chunk(self, doc: Dict[str, Any], size: int) -> bool:
+        """Whether a chunk boundary follows this page; one page in `size` on average"""
+        fingerprint = (doc.get('metadata') or {}).get('fingerprint')
+        if not fingerprint:
+            fingerprint = hashlib.sha256(str(doc.get('content', '')).encode("utf-8")).hexdigest()
+        return int(fingerprint[:8], 16) % size == 0
+
+    def _detect_recurring(self, parsed_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Recurring expenses, regular income and debt payments found locally
+        from the parsed transactions. None when detection is off or the
+        statement is too short to show a monthly repeat; the model then
+        produces those lists as before.
+        """
+        if not config.RECURRING_DETECTION:
+            return None
+        table = transactions_from_parsed(parsed_data)
+        if len(table) < config.RECURRING_MIN_TRANSACTIONS:
+            return None
+        span = int(table.dates.max() - table.dates.min())
+        if span < config.RECURRING_MIN_SPAN_DAYS:
+            print(f"Statement spans {span} days; leaving recurring analysis to the model")
+            return None
+        series = self.recurring_detector.detect(table)
+        print(f"Detected {len(series)} recurring series in {len(table)} transactions over {span} days")
+        return RecurringDetector.analysis_fields(series)
 
-    def _build_analysis_prompt(self, document_content: str) -> str: # TODO: get rid of llm score generation and use sub-heuristics for calculation individual buckets
+    def _describe_recurring(self, recurring: Dict[str, Any]) -> str:
         """
-        Build a prompt for Maverick to analyze the statement data
+        Only the stable fields (description, frequency): this text is part of
+        every chunk's cache key, and counts and amounts change whenever the
+        statement grows. _apply_recurring fills in the full items afterwards.
         """
-        return f"""As a financial analyst, analyze this bank statement data and provide a structured analysis for each section. The summary in each sectiondoesn't need to be very short, but it should be concise. Focus on:
-
-    1. Cash Flow Analysis:
-    - Total inflows and outflows
-    - Beginning and ending balance
-    - Overall cash flow health
-
-    2. Expense Analysis:
-    - Major expenses, usually categoerized as "out" or "debit" (over 75% of starting or ending balance)
-    - Recurring expenses
-    - Expense categories breakdown
-
-    3. Income Analysis:
-    - Regular income sources
-    - Additional/irregular income
-    - Income stability
-
-    4. Debt and Credit:
-    - Recurring debt payments, refrence inferred liability types as described below to build this list
-    - Inferred liability types, look for bank names, auto, mortgage, etc. in description or transaction name
-    - Payment patterns
-
-    Statement Data:
-    {document_content}
-
-    Please provide your analysis in exactly this JSON structure:
-
-    {{
-        "Cash Flow Analysis": {{ 
-            "total_inflows": <float>,
-            "total_outflows": <float>,
-            "beginning_balance": <float>,
-            "ending_balance": <float>,
-            "summary": <string>
-        }},
-        "Expense Analysis": {{
-            "major_expenses": [
-                {{
-                    "description": <string>,
-                    "amount": <float>
-                }}
-            ],
-            "recurring_expenses": [
-                {{
-                    "description": <string>,
-                    "amount": <float>
-                }}
-            ],
-            "summary": <string>
-        }},
-        "Income Analysis": {{
-            "regular_income_sources": [
-                {{
-                    "description": <string>,
-                    "total_amount": <float>
-                }}
-            ],
-            "additional_irregular_income": [
-                {{
-                    "description": <string>,
-                    "amount": <float>
-                }}
-            ],
-            "summary": <string>
-        }},
-        "Debt and Credit": {{
-            "recurring_debt_payments": [
-                {{
-                    "description": <string>,
-                    "amount": <float>
-                }}
-            ],
-            "inferred_liability_types": <string>,
-            "summary": <string>
-        }}
-    }}
-
-    Note: Ensure all fields are populated with appropriate indicators and keywords or phrases that relate to the statement data are in the summary to indicate positive or negative aspects."""
+        lines = sorted({
+            f"    - {item['description']}: {item['frequency']}"
+            for key in ("regular_sources", "recurring_expenses", "recurring_debt_payments")
+            for item in recurring[key][:10]
+        })
+        return "\n".join(lines) if lines else "    - none"
+
+    def _apply_recurring(self, analysis: Dict[str, Any], recurring: Dict[str, Any]):
+        """Works on a full analysis or on one holding only some of the buckets"""
+        if "expenses" in analysis:
+            analysis["expenses"]["recurring_expenses"] = recurring["recurring_expenses"]
+        if "income" in analysis:
+            analysis["income"]["regular_sources"] = recurring["regular_sources"]
+        if "debt_credit" not in analysis:
+            return
+        analysis["debt_credit"]["recurring_debt_payments"] = recurring["recurring_debt_payments"]
+        inferred = str(analysis["debt_credit"].get("inferred_liability_types", ""))
+        types = [kind.strip() for kind in inferred.split(",") if kind.strip() and kind.strip() != "N/A"]
+        for kind in recurring["liability_types"]:
+            if not any(kind.lower() in existing.lower() for existing in types):
+                types.append(kind)
+        analysis["debt_credit"]["inferred_liability_types"] = ", ".join(types) or "N/A"
+
+    async def _analyze_chunk(
+        self,
+        document_content: str,
+        recurring: Optional[Dict[str, Any]] = None,
+        index: int = 0,
+        sections: Optional[_BucketAssembler] = None
+    ) -> Dict[str, Any]:
+        prompt = self._build_analysis_prompt(document_content, recurring)
+        key = content_key(self.llama_client.maverick_model, prompt.template.id, prompt.template.prefix_hash, prompt.user)
+        # Off the loop: the SQLite cache can wait on another worker's write
+        cached = await asyncio.to_thread(self.cache.get, "chunk_analysis", key)
+        if cached is not None:
+            current_span().add("analysis.chunks_cached")
+            if sections is not None:
+                await sections.fill(index, cached)
+            return cached
+
+        if sections is not None and config.LLM_STREAMING:
+            response = await self._stream_chunk(prompt, index, sections)
+        else:
+            response = await self.llama_client.get_maverick_completion(prompt.user, system=prompt.system)
+        with profile_span("json_repair"):
+            structured = self._structure_analysis(response)
+        if sections is not None:
+            await sections.fill(index, structured)
+        # The key names the primary model: an answer from the fallback model is used but not cached
+        served_by_primary = last_served_model() == self.llama_client.maverick_model
+        if structured != self._get_fallback_structure() and served_by_primary:
+            await asyncio.to_thread(self.cache.set, "chunk_analysis", key, structured)
+        return structured
+
+    async def _stream_chunk(self, prompt: RenderedPrompt, index: int, sections: _BucketAssembler) -> str:
+        """Stream one completion, passing each section on as soon as it closes"""
+        parser = JSONSectionStream()
+        received = []
+        async for delta in self.llama_client.stream_maverick_completion(prompt.user, system=prompt.system):
+            received.append(delta)
+            for name, raw in parser.feed(delta):
+                bucket = SECTION_BUCKETS.get(name)
+                section = self._parse_section(name, raw) if bucket else None
+                if section is not None:
+                    await sections.add(index, bucket, section)
+        return "".join(received)
+
+    def _parse_section(self, name: str, raw: str) -> Optional[Dict[str, Any]]:
+        """One top-level section's JSON text -> that bucket's structured data"""
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                value = json.loads(self._clean_json_string(f"{{{json.dumps(name)}: {raw}}}"))[name]
+            except (json.JSONDecodeError, KeyError):
+                return None
+        if not isinstance(value, dict):
+            return None
+        return self._build_structured_analysis({name: value})[SECTION_BUCKETS[name]]
+
+    def _merge_analyses(self, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combine per-chunk analyses in page order: flows add up, balances come
+        from the first and last chunk that reports them, lists are
+        concatenated with duplicates (the same item reported by two chunks)
+        dropped. Chunks that failed (the fallback structure) are left out;
+        values no chunk reported get the neutral default.
+        """
+        failed = self._get_fallback_structure()
+        if all(analysis == failed for analysis in analyses):
+            return failed
+        dropped = sum(1 for analysis in analyses if analysis == failed)
+        if dropped:
+            print(f"Leaving {dropped} failed chunk analyses out of the merge")
+            current_span().set_attribute("analysis.chunks_failed", dropped)
+
+        def section(name: str) -> List[Dict[str, Any]]:
+            # Per section, so the streamed buckets (one section per part) skip failed chunks too
+            return [analysis.get(name, {}) for analysis in analyses if analysis.get(name) != failed[name]]
+
+        def summary(name: str) -> str:
+            parts = []
+            for part in section(name):
+                text = str(part.get("summary", "")).strip()
+                if text and text not in parts:
+                    parts.append(text)
+            return " ".join(parts)
+
+        def items(name: str, key: str) -> List[Any]:
+            merged, seen = [], set()
+            for part in section(name):
+                for item in part.get(key) or []:
+                    marker = json.dumps(item, sort_keys=True)
+                    if marker not in seen:
+                        seen.add(marker)
+                        merged.append(item)
+            return merged
+
+        def income_sources() -> List[Any]:
+            # Regular income recurs across chunks; report one total per source
+            merged: Dict[str, Any] = {}
+            for part in section("income"):
+                for item in part.get("regular_sources") or []:
+                    if not isinstance(item, dict):
+                        merged[json.dumps(item)] = item
+                        continue
+                    name = str(item.get("description", "")).strip().lower()
+                    if name in merged:
+                        merged[name]["total_amount"] = (
+                            self._safe_float(merged[name].get("total_amount"), 0.0) +
+                            self._safe_float(item.get("total_amount"), 0.0)
+                        )
+                    else:
+                        merged[name] = dict(item)
+            return list(merged.values())
+
+        def reported(name: str) -> List[float]:
+            values = (self._optional_float(flow.get(name)) for flow in section("cash_flow"))
+            return [value for value in values if value is not None]
+
+        inflows, outflows = reported("total_inflow"), reported("total_outflow")
+        total_inflow = sum(inflows) if inflows else self._safe_float(None)
+        total_outflow = sum(outflows) if outflows else self._safe_float(None)
+        beginning, ending = reported("beginning_balance"), reported("ending_balance")
+
+        liability_types = []
+        for part in section("debt_credit"):
+            for kind in str(part.get("inferred_liability_types", "")).split(","):
+                kind = kind.strip()
+                if kind and kind != "N/A" and kind not in liability_types:
+                    liability_types.append(kind)
+
+        return {
+            "cash_flow": {
+                "total_inflow": total_inflow,
+                "total_outflow": total_outflow,
+                "net_flow": total_inflow - total_outflow,
+                "beginning_balance": beginning[0] if beginning else self._safe_float(None),
+                "ending_balance": ending[-1] if ending else self._safe_float(None),
+                "summary": summary("cash_flow")
+            },
+            "expenses": {
+                "major_expenses": items("expenses", "major_expenses"),
+                "recurring_expenses": items("expenses", "recurring_expenses"),
+                "summary": summary("expenses")
+            },
+            "income": {
+                "regular_sources": income_sources(),
+                "irregular_sources": items("income", "irregular_sources"),
+                "summary": summary("income")
+            },
+            "debt_credit": {
+                "recurring_debt_payments": items("debt_credit", "recurring_debt_payments"),
+                "inferred_liability_types": ", ".join(liability_types) or "N/A",
+                "summary": summary("debt_credit")
+            }
+        }
+
+    def _build_analysis_prompt(self, document_content: str, recurring: Optional[Dict[str, Any]] = None) -> RenderedPrompt: # TODO: get rid of llm score generation and use sub-heuristics for calculation individual buckets
+        """
+        Build a prompt for Maverick to analyze the statement data. The
+        instructions and schema are a static system prefix; only the
+        statement (and the locally detected recurring items, when there are
+        any, with a template that no longer asks the model for those lists)
+        varies per request.
+        """
+        if recurring:
+            return self.prompts.render(
+                "analysis_known_recurring",
+                known_recurring=self._describe_recurring(recurring),
+                document_content=document_content
+            )
+        return self.prompts.render("analysis", document_content=document_content)
 
     def _structure_analysis(self, maverick_response: str) -> Dict[str, Any]:
         """
@@ -216,6 +448,19 @@ class MaverickAnalyzer:
                 return default
         return default
 
+    def _optional_float(self, value: Any) -> Optional[float]:
+        """Float, or None when the value is missing or not a number (0 is kept)"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value.replace('"', '').replace(',', ''))
+            except ValueError:
+                return None
+        return None
+
     def _safe_get(self, data: Dict[str, Any], *keys: str, default: Any = None) -> Any:
         """Safely get nested dictionary values"""
         current = data
@@ -227,17 +472,19 @@ class MaverickAnalyzer:
         return current if current != {} else default
 
     def _build_structured_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
-        """Build structured analysis from parsed JSON"""
+        """
+        Build one chunk's structured analysis from parsed JSON. Amounts the
+        chunk doesn't report stay None; _merge_analyses applies defaults.
+        """
+        inflow = self._optional_float(self._safe_get(analysis, "Cash Flow Analysis", "total_inflows"))
+        outflow = self._optional_float(self._safe_get(analysis, "Cash Flow Analysis", "total_outflows"))
         return {
             "cash_flow": {
-                "total_inflow": self._safe_float(self._safe_get(analysis, "Cash Flow Analysis", "total_inflows")),
-                "total_outflow": self._safe_float(self._safe_get(analysis, "Cash Flow Analysis", "total_outflows")),
-                "net_flow": (
-                    self._safe_float(self._safe_get(analysis, "Cash Flow Analysis", "total_inflows")) -
-                    self._safe_float(self._safe_get(analysis, "Cash Flow Analysis", "total_outflows"))
-                ),
-                "beginning_balance": self._safe_float(self._safe_get(analysis, "Cash Flow Analysis", "beginning_balance")),
-                "ending_balance": self._safe_float(self._safe_get(analysis, "Cash Flow Analysis", "ending_balance")),
+                "total_inflow": inflow,
+                "total_outflow": outflow,
+                "net_flow": inflow - outflow if inflow is not None and outflow is not None else None,
+                "beginning_balance": self._optional_float(self._safe_get(analysis, "Cash Flow Analysis", "beginning_balance")),
+                "ending_balance": self._optional_float(self._safe_get(analysis, "Cash Flow Analysis", "ending_balance")),
                 "summary": str(self._safe_get(analysis, "Cash Flow Analysis", "summary", default=""))
             },
             "expenses": {
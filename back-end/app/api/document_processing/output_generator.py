@@ -1,16 +1,35 @@
 from typing import Dict, Any, List
+from ...services.prompts import RenderedPrompt, get_prompt_registry
 from ...utils.llama_client import LlamaClient
+from ...utils.model_router import STAGE_NARRATIVE
+from ...utils.rate_limiter import PRIORITY_NARRATIVE
+from ...utils.tracing import traced
+
+SCORE_DESCRIPTIONS = {
+    "excellent": (90, 100, "Loan Approved"),
+    "good": (72, 89, "Loan Approved"),
+    "fair": (60, 71, "Further information needed"),
+    "concerning": (0, 59, "Loan Denied")
+}
+
+
+def health_status(score: float) -> str:
+    """
+    Decision for a final score; shared with offline re-scoring
+    """
+    for status, (min_score, max_score, description) in SCORE_DESCRIPTIONS.items():
+        if min_score <= score <= max_score:
+            return description
+    return "undefined status"
+
 
 class OutputGenerator:
     def __init__(self):
         self.llama_client = LlamaClient()
-        self.score_descriptions = {
-            "excellent": (90, 100, "Loan Approved"),
-            "good": (72, 89, "Loan Approved"),
-            "fair": (60, 71, "Further information needed"),
-            "concerning": (0, 59, "Loan Denied")
-        }
+        self.prompts = get_prompt_registry()
+        self.score_descriptions = SCORE_DESCRIPTIONS
 
+    @traced("OutputGenerator.generate_output")
     async def generate_output(
             self,
             maverick_analysis: Dict[str, Any],
@@ -51,89 +70,31 @@ class OutputGenerator:
         self,
         maverick_analysis: Dict[str, Any],
         scoring_result: Dict[str, Any]
-    ) -> str:
+    ) -> RenderedPrompt:
         """
-        Prepare context for LLM narrative generation
+        Prepare context for LLM narrative generation: the instructions and
+        output format are the template's static prefix, this statement's
+        numbers go last
         """
-        return f"""Analyze this financial data and provide insights in the following JSON format:
-    Required JSON Format:
-    {{
-        "summary": {{
-            "overall_health": "Brief 2-3 sentence overview of financial health",
-            "key_findings": ["List of 3-4 key findings"]
-        }},
-        "component_analysis": {{
-            "cash_flow": {{
-                "summary": "Detailed analysis including starting balance (${maverick_analysis['cash_flow']['beginning_balance']}) and ending balance (${maverick_analysis['cash_flow']['ending_balance']}). Must mention if balances < $500. Include specific numbers.",
-                "strengths": ["List of strengths"],
-                "concerns": ["List of concerns"]
-            }},
-            "debt_credit": {{
-                "summary": "Analysis including inferred liability types ({scoring_result['metrics']['debt_metrics']['inferred_liability_types']}), total recurring debt payments, and comparison to healthy ranges. Explain score of {scoring_result['component_scores']['debt_credit']}",
-                "strengths": ["List of strengths"],
-                "concerns": ["List of concerns"]
-            }},
-            "expenses": {{
-                "summary": "Analysis of expense patterns and ratios",
-                "strengths": ["List of strengths"],
-                "concerns": ["List of concerns"]
-            }},
-            "income": {{
-                "summary": "Analysis of income stability and sources",
-                "strengths": ["List of strengths"],
-                "concerns": ["List of concerns"]
-            }},
-        }},
-        "recommendations": {{
-            "flags": ["List of flags"]
-        }}
-    }}
-
-Overall Score: {scoring_result['final_score']}
-
-Component Scores:
-{self._format_scores_for_prompt(scoring_result['component_scores'])}
-
-Key Metrics:
-{self._format_metrics_for_prompt(scoring_result['metrics'])}
-
-Flags:
-{self._format_flags_for_prompt(scoring_result['flags'])}
-
-Here are some additional details for context in the summary part of each component:
-Cash Flow:
-    - Explicitly mention starting balance and ending balance from ${maverick_analysis['cash_flow']['beginning_balance']} and ${maverick_analysis['cash_flow']['ending_balance']}
-    - If balances are below $500, highlight this as a critical concern
-    - Compare inflow vs outflow and discuss the trend
-    - Include specific numbers to support the analysis
-
-Debt Credit:
-    - Include the inferred liability types
-    - Compare these numbers to typical healthy ranges
-    - Explain why the score is high or low based on these metrics
-
-Expenses:
-    - Mention total number of major expenses (${scoring_result['metrics']['expense_metrics']['major_expenses_count']})
-    - Discuss recurring expenses pattern (${scoring_result['metrics']['expense_metrics']['recurring_expenses_count']})
-    - Compare expense ratios to income
-    - Highlight any unusual spending patterns or large expenses
-    - Include specific numbers and percentages
-
-Income:
-    - Analyze regular income sources (${scoring_result['metrics']['income_stability']['regular_sources']})
-    - Discuss irregular income patterns (${scoring_result['metrics']['income_stability']['irregular_sources']})
-    - Comment on income stability and diversity
-    - Include specific income amounts and frequency
-    - Compare income levels to expenses and debt obligations
-"""
+        return self.prompts.render(
+            "narrative",
+            final_score=scoring_result['final_score'],
+            component_scores=self._format_scores_for_prompt(scoring_result['component_scores']),
+            metrics=self._format_metrics_for_prompt(scoring_result['metrics']),
+            flags=self._format_flags_for_prompt(scoring_result['flags']) or "- None",
+            beginning_balance=maverick_analysis['cash_flow']['beginning_balance'],
+            ending_balance=maverick_analysis['cash_flow']['ending_balance']
+        )
 
-    async def _generate_narrative(self, context: str) -> Dict[str, Any]:
+    async def _generate_narrative(self, context: RenderedPrompt) -> Dict[str, Any]:
         """
         Generate narrative analysis using LLM
         """
         try:
-            print("Sending context to LLM:", context)
-            response = await self.llama_client.get_maverick_completion(context)
+            print("Sending context to LLM:", context.user)
+            response = await self.llama_client.get_completion(
+                context.user, stage=STAGE_NARRATIVE, priority=PRIORITY_NARRATIVE, system=context.system
+            )
             print("Raw LLM response:", response)
             
             # Parse JSON if it's a string
@@ -158,10 +119,7 @@ Income:
         """
         Get health status description based on score
         """
-        for status, (min_score, max_score, description) in self.score_descriptions.items():
-            if min_score <= score <= max_score:
-                return description
-        return "undefined status"
+        return health_status(score)
 
     def _format_component_analysis(
         self,
@@ -0,0 +1,83 @@
+import hashlib
+import io
+import mmap
+from typing import List, Optional
+
+from pypdf import PdfReader, PdfWriter
+
+
+class PageShard:
+    def __init__(self, index: int, page_numbers: List[int], data: bytes):
+        self.index = index
+        self.page_numbers = page_numbers  # 1-based pages of the source document
+        self.data = data
+
+    @property
+    def file_name(self) -> str:
+        return f"pages-{self.page_numbers[0]}-{self.page_numbers[-1]}.pdf"
+
+
+class PageSplitter:
+    """
+    Cuts a PDF into shards of at most `pages_per_shard` pages. The source is
+    memory-mapped, so pypdf reads objects straight from the page cache instead
+    of a copied buffer, and shards are written to memory.
+    """
+
+    def __init__(self, pages_per_shard: int):
+        self.pages_per_shard = max(1, pages_per_shard)
+
+    def plan(self, page_numbers: List[int]) -> List[List[int]]:
+        ordered = sorted(page_numbers)
+        return [
+            ordered[start:start + self.pages_per_shard]
+            for start in range(0, len(ordered), self.pages_per_shard)
+        ]
+
+    def split(self, file_path: str, page_numbers: Optional[List[int]] = None) -> List[PageShard]:
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            reader = PdfReader(source)
+            if page_numbers is None:
+                page_numbers = list(range(1, len(reader.pages) + 1))
+
+            shards = []
+            for index, group in enumerate(self.plan(page_numbers)):
+                writer = PdfWriter()
+                for page in group:
+                    writer.add_page(reader.pages[page - 1])
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                shards.append(PageShard(index, group, buffer.getvalue()))
+            return shards
+
+
+def _stream_bytes(stream) -> bytes:
+    try:
+        return stream.get_data()
+    except Exception:
+        # Undecodable filter: fall back to the stream dictionary itself
+        return repr(dict(stream)).encode("utf-8")
+
+
+def page_fingerprints(file_path: str) -> List[str]:
+    """
+    Content hash per page: the page's content stream plus any image/form
+    XObjects it draws. Two scanned pages share the same "draw image" content
+    stream, so the XObject data is what tells them apart.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        reader = PdfReader(source)
+        fingerprints = []
+        for page in reader.pages:
+            digest = hashlib.sha256()
+            contents = page.get_contents()
+            if contents is not None:
+                digest.update(contents.get_data())
+            resources = page.get("/Resources")
+            xobjects = resources.get_object().get("/XObject") if resources is not None else None
+            if xobjects is not None:
+                for name, xobject in sorted(xobjects.get_object().items()):
+                    digest.update(name.encode("utf-8"))
+                    digest.update(_stream_bytes(xobject.get_object()))
+            fingerprints.append(digest.hexdigest())
+        return fingerprints
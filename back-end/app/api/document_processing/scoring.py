@@ -1,47 +1,99 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from .bucket_score_service import BucketScoreService
+from ...core import config
+from ...services.rules import CompiledRules, get_scoring_rules
+from ...utils.tracing import current_span, traced
+
+# Weights for different components in final score (when SCORING_RULES_ENABLED
+# is off; otherwise they come from the rules file)
+DEFAULT_WEIGHTS = {
+    "cash_flow": 0.4,
+    "expenses": 0.2,
+    "income": 0.3,
+    "debt_credit": 0.1,
+}
+
+# Thresholds for flag generation
+DEFAULT_THRESHOLDS = {
+    "low_score": 60,  # Score below this raises concerns
+    "high_inferred_liability_types": 0.30,  # Credit utilization above 30%
+    "negative_cash_flow": 0,  # Negative cash flow threshold
+    "large_expense_ratio": 0.40  # Large expenses vs income ratio
+}
 
 class ScoringLlamaService:
-    def __init__(self):
-        # Weights for different components in final score
-        self.weights = {
-            "cash_flow": 0.4,
-            "expenses": 0.2,
-            "income": 0.3,
-            "debt_credit": 0.1,
-        }
-
-        # Thresholds for flag generation
-        self.thresholds = {
-            "low_score": 60,  # Score below this raises concerns
-            "high_inferred_liability_types": 0.30,  # Credit utilization above 30%
-            "negative_cash_flow": 0,  # Negative cash flow threshold
-            "large_expense_ratio": 0.40  # Large expenses vs income ratio
-        }
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        thresholds: Optional[Dict[str, float]] = None,
+        rules: Optional[CompiledRules] = None
+    ):
+        """
+        `weights` and `thresholds` override individual defaults, so what-if
+        scenarios only need to name the values they change. `rules` pins a
+        compiled rules set; by default the live (hot-reloaded) rules are used.
+        """
+        for name, overrides, defaults in (("weight", weights, DEFAULT_WEIGHTS), ("threshold", thresholds, DEFAULT_THRESHOLDS)):
+            unknown = set(overrides or {}) - set(defaults)
+            if unknown:
+                raise Exception(f"Unknown scoring {name}(s): {', '.join(sorted(unknown))}")
+        self._weight_overrides = dict(weights or {})
+        self._threshold_overrides = dict(thresholds or {})
+        self.rules = rules
+        self.debug = True
 
         self.bucket_score_service = BucketScoreService()
+        self.refresh()
 
+    def refresh(self):
+        """
+        Resolve the rules this service scores with, and its effective weights
+        and thresholds (rules file values, then this instance's overrides)
+        """
+        rules = self.rules
+        if rules is None and config.SCORING_RULES_ENABLED:
+            rules = get_scoring_rules()
+        self.active_rules = rules
+        self.weights = {**(rules.weights if rules else DEFAULT_WEIGHTS), **self._weight_overrides}
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(rules.thresholds if rules else {}), **self._threshold_overrides}
+
+    def bucket_scores(self, maverick_analysis: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Component scores from the compiled rules, or the hand-written
+        BucketScoreService when rules are disabled
+        """
+        if self.active_rules is not None:
+            return self.active_rules.bucket_scores(maverick_analysis)
+        return self.bucket_score_service.calculate_bucket_scores(maverick_analysis)
+
+    def score_bucket(self, bucket: str, data: Dict[str, Any]) -> float:
+        """One component score, for buckets scored as they arrive from a stream"""
+        if self.active_rules is not None:
+            return self.active_rules.score_bucket(bucket, data)
+        return getattr(self.bucket_score_service, f"score_{bucket}")(data)
+
+    @traced("ScoringLlamaService.calculate_score")
     def calculate_score(self, maverick_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calculate final score and generate insights from Maverick analysis
         """
         try:
-            print("Starting score calculation with analysis:", maverick_analysis)
+            if self.debug:
+                print("Starting score calculation with analysis:", maverick_analysis)
+            self.refresh()
             
-            # Get component scores from bucket service
-            component_scores = self.bucket_score_service.calculate_bucket_scores(maverick_analysis)
+            # Get component scores from the scoring rules
+            component_scores = self.bucket_scores(maverick_analysis)
             
             # Calculate weighted score using bucket service scores
-            final_score = sum(
-                score * self.weights[component]
-                for component, score in component_scores.items()
-            )
+            final_score = self.weighted_score(component_scores)
             
             # Generate flags
             flags = self._generate_flags(maverick_analysis, component_scores)
             
             # Extract key metrics
             metrics = self._extract_key_metrics(maverick_analysis)
+            current_span().set_attribute("score.final", round(final_score, 2))
             
             return {
                 "final_score": round(final_score, 2),
@@ -55,6 +107,15 @@ class ScoringLlamaService:
             raise Exception(f"Scoring calculation failed: {str(e)}")
 
 
+    def weighted_score(self, component_scores: Dict[str, float]) -> float:
+        """
+        Weighted final score from bucket scores (unrounded)
+        """
+        return sum(
+            score * self.weights[component]
+            for component, score in component_scores.items()
+        )
+
     def _calculate_weighted_score(self, analysis: Dict[str, Any]) -> float:
         """
         Calculate weighted final score from component scores
@@ -84,7 +145,8 @@ class ScoringLlamaService:
         # Check cash flow
         try:
             net_flow = float(analysis["cash_flow"]["net_flow"])
-            print(f"Checking cash flow: {net_flow}")
+            if self.debug:
+                print(f"Checking cash flow: {net_flow}")
             if net_flow < self.thresholds["negative_cash_flow"]:
                 flags.append({
                     "type": "negative_cash_flow",
@@ -96,12 +158,14 @@ class ScoringLlamaService:
 
         # Check credit utilization - handle string or numeric values
         inferred_liability_types = analysis["debt_credit"]["inferred_liability_types"]
-        print(f"Raw inferred liability types value: {inferred_liability_types}")
+        if self.debug:
+            print(f"Raw inferred liability types value: {inferred_liability_types}")
         
         # Only process if it's a numeric value
         if isinstance(inferred_liability_types, (int, float)):
             inferred_liability_types_float = float(inferred_liability_types)
-            print(f"Checking inferred liability types: {inferred_liability_types_float}")
+            if self.debug:
+                print(f"Checking inferred liability types: {inferred_liability_types_float}")
             if inferred_liability_types_float > self.thresholds["high_inferred_liability_types"]:
                 flags.append({
                     "type": "high_inferred_liability_types",
@@ -109,11 +173,13 @@ class ScoringLlamaService:
                     "message": f"High inferred liability types at {inferred_liability_types_float*100:.1f}%"
                 })
         else:
-            print(f"Inferred liability types is not numeric: {inferred_liability_types}")
+            if self.debug:
+                print(f"Inferred liability types is not numeric: {inferred_liability_types}")
 
         # Check expense patterns
         major_expenses = analysis["expenses"]["major_expenses"]
-        print(f"Checking major expenses: {len(major_expenses)} found")
+        if self.debug:
+            print(f"Checking major expenses: {len(major_expenses)} found")
         if major_expenses:
             flags.append({
                 "type": "large_expenses",
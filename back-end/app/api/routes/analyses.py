@@ -0,0 +1,123 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from typing import Optional
+from ...core import config
+from ...models.rescore import RescoreRequest
+from ...services.analysis_store import get_analysis_store
+from ...services.job_store import get_job_store
+from ...utils.request_profiler import get_request_profiler
+import asyncio
+
+# Read-only views over stored analyses; nothing here calls the LLM
+router = APIRouter()
+
+
+@router.get("/")
+async def list_analyses(content_hash: Optional[str] = None, applicant_id: Optional[str] = None, limit: int = 50):
+    """
+    Summaries (score, decision, component scores) of stored analyses, newest first
+    """
+    return await asyncio.to_thread(get_analysis_store().find, content_hash, applicant_id, min(limit, 500))
+
+
+@router.get("/portfolio")
+async def portfolio(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None
+):
+    """
+    Aggregate score and decision statistics; `since`/`until` are unix timestamps
+    """
+    return await asyncio.to_thread(get_analysis_store().portfolio, since, until, min_score, max_score)
+
+
+@router.get("/tokens")
+async def token_usage(applicant_id: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None):
+    """
+    LLM token totals over stored analyses, overall and per stage
+    """
+    return await asyncio.to_thread(get_analysis_store().token_usage, applicant_id, since, until)
+
+
+@router.post("/rescore")
+async def rescore(request: RescoreRequest):
+    """
+    Re-score stored analyses under what-if weights/thresholds (or a grid of
+    them) without the LLM. Streams NDJSON: changed decisions as they are
+    found, then per-scenario decision distributions and deltas.
+    """
+    # Imported here: rescoring pulls in the scoring pipeline, which app startup doesn't need
+    from ...services.rescoring import RescoreSweep, expand_grid, grid_size, to_ndjson
+
+    try:
+        scenarios = grid_size(request.grid or {})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if scenarios > config.RESCORE_MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Grid expands to {scenarios} scenarios; the limit is {config.RESCORE_MAX_SCENARIOS}"
+        )
+    try:
+        sweep = RescoreSweep(expand_grid(request.grid or {}, request.weights, request.thresholds))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    records = get_analysis_store().iter_analyses(request.since, request.until, request.applicant_id)
+    # A sync iterator: Starlette drains it in the threadpool, off the event loop
+    return StreamingResponse(
+        to_ndjson(sweep.run(records, include_changes=request.include_changes)),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/applicants/{applicant_id}")
+async def applicant_history(applicant_id: str, limit: int = 50):
+    """
+    An applicant's past analyses, newest first, and the tokens spent on them
+    """
+    store = get_analysis_store()
+    return {
+        "applicant_id": applicant_id,
+        "analyses": await asyncio.to_thread(store.find, None, applicant_id, min(limit, 500)),
+        "token_usage": await asyncio.to_thread(store.token_usage, applicant_id),
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of an analysis request, from whichever worker ran it
+    """
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    """
+    A stored request profile: speedscope JSON (open in speedscope.app) or,
+    with format=collapsed, collapsed stacks for flamegraph tools
+    """
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be speedscope or collapsed")
+    text = await asyncio.to_thread(get_request_profiler().load, profile_id, format)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(text)
+    return Response(text, media_type="application/json")
+
+
+@router.get("/{analysis_id}")
+async def get_analysis(analysis_id: str):
+    """
+    The full stored record: parsed document, structured analysis, scores and final output
+    """
+    record = await asyncio.to_thread(get_analysis_store().get, analysis_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return record
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from dotenv import load_dotenv
-from typing import Dict
+from fastapi import APIRouter, Depends, Request, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, Awaitable, Callable, Dict, Optional
 # from ...services.preprocessor import PreprocessingService
 # from ...services.textract_service import TextractService
 # from ...services.llama_classifier import LlamaClassifier
@@ -8,61 +9,87 @@ from typing import Dict
 
 
 #LLAMA METHOD 
-from ..document_processing.llama_parser import DocumentParser
-from ..document_processing.maverick_analyzer import MaverickAnalyzer
-from ..document_processing.output_generator import OutputGenerator
-from ..document_processing.scoring import ScoringLlamaService
+from ..dependencies import AnalysisPipeline, get_analysis_pipeline
+from ...core import config
+from ...services.analysis_store import get_analysis_store
+from ...services.job_store import get_job_store
+from ...utils.model_router import start_route_log
+from ...utils.request_gate import RequestRejected, client_key, get_request_gate
+from ...utils.request_profiler import get_request_profiler, profile_span, profiling_requested
+from ...utils.token_accounting import start_token_ledger
+from ...utils.tracing import SPAN_KIND_SERVER, current_span, get_tracer
+import asyncio
+import contextlib
+import hashlib
+import json
 import os
+import tempfile
+import time
 
-load_dotenv()
 router = APIRouter()
 # textract_service = TextractService()
 # preprocessor = PreprocessingService()
 # llama_classifier = LlamaClassifier()
 
-# LLAMA METHOD
-document_parser = DocumentParser(api_key=os.getenv("LLAMA_CLOUD_API_KEY"))
-maverick_analyzer = MaverickAnalyzer()
-output_generator = OutputGenerator()
-scoring = ScoringLlamaService()
-UPLOAD_DIR = "app/uploads"  # Create this directory in your backend
+# LLAMA METHOD: the pipeline services come from app/api/dependencies.py
+UPLOAD_DIR = config.UPLOAD_DIR  # Shared by every worker; see _store_upload
+
+EventSink = Callable[[Dict[str, Any]], Awaitable[None]]
 
 @router.post("/upload")  #@router.post("/upload", response_model=List[Transaction])
-async def upload_statement(file: UploadFile = File(...)):
+async def upload_statement(request: Request, file: UploadFile = File(...)):
     """
-    Upload a bank statement file and save it temporarily
+    Upload a bank statement file and save it temporarily. Refused with 413
+    over UPLOAD_MAX_BYTES, and with 429/503 + Retry-After under load or
+    while the upload directory is over UPLOAD_DIR_MAX_BYTES.
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(
             status_code=400,
             detail="Only PDF files are supported at this time"
         )
-    
-    try:
-        # Create uploads directory if it doesn't exist
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        
-        # Save the file with a unique name
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            contents = await file.read()
-            buffer.write(contents)
-        
-        return {
-            "message": "PDF uploaded successfully",
-            "filename": file.filename
-        }
-        
-    except Exception as e:
+    if file.size is not None and file.size > config.UPLOAD_MAX_BYTES:
         raise HTTPException(
-            status_code=500,
-            detail=f"An error occurred while uploading the file: {str(e)}"
+            status_code=413,
+            detail=f"File is larger than the {config.UPLOAD_MAX_BYTES} byte upload limit"
         )
+    # Bodies over the limit are already refused while being received (UploadSizeLimit in main.py)
+
+    async with get_request_gate("upload").slot(client_key(request)):
+        if await asyncio.to_thread(_upload_dir_bytes) + (file.size or 0) > config.UPLOAD_DIR_MAX_BYTES:
+            raise RequestRejected(503, 60, "Upload storage is full; retry once pending analyses finish")
+        try:
+            # Create uploads directory if it doesn't exist
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+            # Save the file with a unique name
+            file_path = os.path.join(UPLOAD_DIR, file.filename)
+            await asyncio.to_thread(_store_upload, file.file, file_path, config.UPLOAD_MAX_BYTES)
+
+            return {
+                "message": "PDF uploaded successfully",
+                "filename": file.filename
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while uploading the file: {str(e)}"
+            )
 
 @router.post("/analyze/{filename}")
-async def analyze_statement(filename: str):
+async def analyze_statement(request: Request, filename: str, applicant_id: Optional[str] = None,
+                            pipeline: AnalysisPipeline = Depends(get_analysis_pipeline)):
     """
-    Analyze an uploaded PDF using Textract
+    Analyze an uploaded PDF using Textract. Results are saved to the analysis
+    store under the file's content hash and the optional applicant id.
+    Admitted through the "analyze" request gate (429/503 + Retry-After when
+    saturated). `?profile=1` (or `X-Profile: 1`) adds a stage-timed, sampled
+    profile; see app/utils/request_profiler.py. The request is traced (root
+    span "analyze_statement", continuing an incoming W3C traceparent) and
+    the response carries its `trace_id`.
     """
     file_path = os.path.join(UPLOAD_DIR, filename)
     
@@ -107,44 +134,280 @@ async def analyze_statement(filename: str):
 
 
         # LLAMA METHOD
-
-        print(f"Starting LlamaParse analysis for file: {file_path}")
-        parsed_data = await document_parser.parse_document(file_path)
-        print(f"Parsed data: {parsed_data}")
-        print(f"Parsed data type: {type(parsed_data)}")
-        
-        # Analyze with Llama Maverick
-        print("analyzing with maverick...")
-        maverick_analysis = await maverick_analyzer.analyze_transactions(parsed_data)
-        print(f"Maverick analysis: {maverick_analysis}")
-        
-        # Score the analysis
-        print("scoring result...")
-        scoring_result = scoring.calculate_score(maverick_analysis)
-        print(f"Scoring result: {scoring_result}")
-        
-        # Generate final user-facing output
-        print("generating final analysis output...")
-        final_analysis = await output_generator.generate_output(
-            maverick_analysis=maverick_analysis,
-            scoring_result=scoring_result
-        )
-        print(f"Final analysis: {final_analysis}")
-
-        # Clean up the files
-        os.remove(file_path)  # Remove local file
-        
-        return {
-            "parsed_data": parsed_data,
-            "message": "Analysis completed successfully",
-            "results": maverick_analysis,
-            "final_output": final_analysis,
-        }
+        with _request_span("analyze_statement", request, filename, applicant_id):
+            async with get_request_gate("analyze").slot(client_key(request)):
+                return await _run_analysis(pipeline, file_path, filename, applicant_id,
+                                           profile=profiling_requested(request))
         
+    except HTTPException:
+        # Keep upstream status codes (429 + Retry-After) instead of masking them as 500s
+        raise
     except Exception as e:
         # Log the full error for debugging
         print(f"Error during analysis: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+
+def _request_span(name: str, request: Request, filename: str, applicant_id: Optional[str]):
+    return get_tracer().span(
+        name, SPAN_KIND_SERVER, traceparent=request.headers.get("traceparent"),
+        attributes={"http.route": request.url.path, "file.name": filename, "applicant.id": applicant_id}
+    )
+
+
+def _store_upload(source, file_path: str, max_bytes: Optional[int] = None):
+    """
+    Write to a temp file in the upload directory, then rename it into place:
+    a worker handling /analyze never sees a half-written PDF. Stops with a
+    413 once more than `max_bytes` have been copied.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".part")
+    try:
+        copied = 0
+        with os.fdopen(fd, "wb") as buffer:
+            for block in iter(lambda: source.read(1 << 20), b""):
+                copied += len(block)
+                if max_bytes is not None and copied > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File is larger than the {max_bytes} byte upload limit"
+                    )
+                buffer.write(block)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+async def _run_analysis(pipeline: AnalysisPipeline, file_path: str, filename: str,
+                        applicant_id: Optional[str] = None, emit: Optional[EventSink] = None,
+                        profile: bool = False) -> Dict[str, Any]:
+    """
+    Runs the pipeline as a job in the shared job store, so its status can be
+    read from any worker while it runs and after it ends. With `profile`, the
+    run is profiled (rate limited) and the profile's summary is returned.
+    """
+    job_id = await _job_call("start", filename, applicant_id)
+    profiling = get_request_profiler().start(filename) if profile else None
+    try:
+        result = await _run_pipeline(pipeline, file_path, filename, applicant_id, emit)
+    except (Exception, asyncio.CancelledError) as e:
+        if job_id:
+            await _job_call("fail", job_id, str(getattr(e, "detail", "") or e) or type(e).__name__)
+        raise
+    finally:
+        # Failed runs are stored too: slow failures are worth a look
+        profile_summary = await asyncio.to_thread(get_request_profiler().finish, profiling) if profiling else None
+    if job_id:
+        await _job_call("finish", job_id, result["analysis_id"])
+    result["job_id"] = job_id
+    span = current_span()
+    result["trace_id"] = span.trace_id if span.sampled else None
+    span.set_attribute("job.id", job_id)
+    span.set_attribute("analysis.id", result["analysis_id"])
+    if profiling:
+        result["profile"] = profile_summary
+    return result
+
+
+async def _job_call(method: str, *args):
+    """Job bookkeeping never fails an analysis"""
+    try:
+        return await asyncio.to_thread(getattr(get_job_store(), method), *args)
+    except Exception as e:
+        print(f"Error recording analysis job: {str(e)}")
+        return None
+
+
+async def _run_pipeline(pipeline: AnalysisPipeline, file_path: str, filename: str,
+                        applicant_id: Optional[str] = None, emit: Optional[EventSink] = None) -> Dict[str, Any]:
+    """
+    Parse -> Maverick -> score -> output for one uploaded file. With `emit`,
+    progress events (including each bucket's score as soon as its section has
+    streamed in) are passed to it along the way. The response records which
+    model served each LLM stage and the tokens each stage used.
+    """
+    model_routes = start_route_log()
+    ledger = start_token_ledger(config.LLM_REQUEST_TOKEN_BUDGET)
+    with profile_span("hash"):
+        content_hash = await asyncio.to_thread(_file_sha256, file_path)
+
+    print(f"Starting LlamaParse analysis for file: {file_path}")
+    with profile_span("parse"):
+        parsed_data = await pipeline.parser.parse_document(file_path)
+    print(f"Parsed data: {parsed_data}")
+    print(f"Parsed data type: {type(parsed_data)}")
+    ledger.pages = len(parsed_data.get("documents") or [])
+    if emit:
+        await emit({"event": "parsed", "pages": ledger.pages})
+
+    # Analyze with Llama Maverick
+    print("analyzing with maverick...")
+    with profile_span("maverick"):
+        maverick_analysis = await pipeline.analyzer.analyze_transactions(
+            parsed_data, on_section=_section_scorer(pipeline, emit) if emit else None
+        )
+    print(f"Maverick analysis: {maverick_analysis}")
+
+    # Score the analysis
+    print("scoring result...")
+    with profile_span("scoring"):
+        scoring_result = pipeline.scoring.calculate_score(maverick_analysis)
+    print(f"Scoring result: {scoring_result}")
+    if emit:
+        await emit({
+            "event": "scored",
+            "final_score": scoring_result["final_score"],
+            "component_scores": scoring_result["component_scores"],
+            "flags": scoring_result["flags"],
+        })
+
+    # Generate final user-facing output
+    print("generating final analysis output...")
+    with profile_span("output"):
+        final_analysis = await pipeline.output_generator.generate_output(
+            maverick_analysis=maverick_analysis,
+            scoring_result=scoring_result
+        )
+    print(f"Final analysis: {final_analysis}")
+
+    token_usage = ledger.summary()
+    span = current_span()
+    span.set_attribute("pages", ledger.pages)
+    span.set_attribute("gen_ai.usage.input_tokens", token_usage["prompt_tokens"])
+    span.set_attribute("gen_ai.usage.output_tokens", token_usage["completion_tokens"])
+    with profile_span("save"):
+        analysis_id = await _save_analysis(
+            content_hash, applicant_id, filename, parsed_data, maverick_analysis, scoring_result, final_analysis,
+            token_usage
+        )
+
+    # Clean up the files; another worker may have analyzed the same upload
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(file_path)  # Remove local file
+
+    return {
+        "parsed_data": parsed_data,
+        "message": "Analysis completed successfully",
+        "analysis_id": analysis_id,
+        "results": maverick_analysis,
+        "final_output": final_analysis,
+        "model_routes": model_routes,
+        "token_usage": token_usage,
+    }
+
+
+def _section_scorer(pipeline: AnalysisPipeline, emit: EventSink):
+    async def on_section(bucket: str, data: Dict[str, Any]):
+        try:
+            score = pipeline.scoring.score_bucket(bucket, data)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            print(f"Could not score streamed {bucket} section: {str(e)}")
+            return
+        await emit({
+            "event": "bucket",
+            "bucket": bucket,
+            "score": score,
+        })
+    return on_section
+
+
+@router.post("/analyze/{filename}/stream")
+async def analyze_statement_stream(request: Request, filename: str, applicant_id: Optional[str] = None,
+                                   pipeline: AnalysisPipeline = Depends(get_analysis_pipeline)):
+    """
+    Same analysis as /analyze/{filename}, streamed as NDJSON events: "parsed",
+    one "bucket" per component score as soon as the model has written that
+    section, "scored", then "result" (or "error"). Every event carries
+    `elapsed_ms` since the analysis started. `?profile=1` profiles the run
+    as on /analyze/{filename}; the summary is part of the "result" event.
+    """
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    if not os.path.exists(file_path):
+        raise HTTPException(
+            status_code=404,
+            detail="File not found. Please upload the file first."
+        )
+
+    # Admission happens before the stream starts, so a refusal is a plain 429/503
+    ticket = await get_request_gate("analyze").acquire(client_key(request))
+    profile = profiling_requested(request)
+    request_span = _request_span("analyze_statement_stream", request, filename, applicant_id)
+    events: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    async def emit(event: Dict[str, Any]):
+        event["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        await events.put(event)
+
+    async def run():
+        try:
+            with request_span:
+                result = await _run_analysis(pipeline, file_path, filename, applicant_id, emit=emit, profile=profile)
+            await emit({
+                "event": "result",
+                "analysis_id": result["analysis_id"],
+                "job_id": result["job_id"],
+                "trace_id": result["trace_id"],
+                "final_output": result["final_output"],
+                "model_routes": result["model_routes"],
+                "token_usage": result["token_usage"],
+                **({"profile": result["profile"]} if "profile" in result else {}),
+            })
+        except HTTPException as e:
+            await emit({"event": "error", "status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"Error during analysis: {str(e)}")
+            await emit({"event": "error", "status": 500, "detail": str(e)})
+
+    async def lines():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                yield json.dumps(event, default=str) + "\n"
+                if event["event"] in ("result", "error"):
+                    break
+        finally:
+            # Client went away (or we're done): don't keep burning tokens
+            task.cancel()
+            ticket.release()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(ticket.release))
+
+
+def _upload_dir_bytes() -> int:
+    """Bytes currently waiting in the upload directory"""
+    try:
+        with os.scandir(UPLOAD_DIR) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return 0
+
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def _save_analysis(content_hash, applicant_id, filename, parsed_data, maverick_analysis, scoring_result, final_analysis,
+                         token_usage=None) -> Optional[str]:
+    """A failed save is logged, never turned into a failed analysis"""
+    if not config.ANALYSIS_STORE_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(
+            get_analysis_store().save,
+            content_hash, applicant_id, filename, parsed_data, maverick_analysis, scoring_result, final_analysis,
+            token_usage
+        )
+    except Exception as e:
+        print(f"Error saving analysis: {str(e)}")
+        return None
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from ...utils.loop_monitor import get_loop_monitor
+
+# Mounted only when DEBUG_ENDPOINTS_ENABLED is set
+router = APIRouter()
+
+
+@router.get("/loop")
+async def loop_diagnostics():
+    """
+    Event-loop lag statistics and stack samples of recent loop stalls
+    """
+    return get_loop_monitor().snapshot()
@@ -0,0 +1,420 @@
+"""
+Bulk-analyze a directory of statement PDFs offline.
+
+    python -m app.batch archive/
+    python -m app.batch archive/ --output results.jsonl --parse-workers 8 --llm-concurrency 16
+    python -m app.batch archive/ --output results.parquet      # needs pyarrow
+    python -m app.batch archive/ --applicant-from-dir            # archive/<applicant>/*.pdf
+
+Parsing runs in a process pool (--parse-workers); the Maverick, scoring and
+narrative stages run on the event loop, --llm-concurrency files at a time.
+Results go to the analysis store (default) or to a JSONL / Parquet file.
+Every finished file is appended to the checkpoint (default: next to the
+output), so rerunning the same command after a crash resumes where it
+stopped. Throughput stats are printed as JSON at the end.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .core import config
+from .utils.token_accounting import start_token_ledger
+
+ParserFactory = Callable[[], Any]
+
+
+def find_pdfs(root: str) -> List[str]:
+    """PDFs under `root`, as sorted paths relative to it"""
+    found = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                found.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(found)
+
+
+class Checkpoint:
+    """
+    Append-only JSONL of finished files. A line is written (and fsynced) only
+    once the file's result is durable in the output, so a crash loses at most
+    the files that were in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        torn = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from a crash
+                    if entry.get("status") == "done":
+                        self.done.add(entry["file"])
+        self._file = open(path, "a")
+        if torn:
+            self._file.write("\n")
+
+    def record(self, file: str, status: str, **details: Any):
+        self._file.write(json.dumps({"file": file, "status": status, "at": time.time(), **details}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if status == "done":
+            self.done.add(file)
+
+    def close(self):
+        self._file.close()
+
+
+class ResultSink:
+    """Where results go. `write`/`close` return the files now durable in the output."""
+
+    def write(self, result: Dict[str, Any]) -> List[str]:
+        raise NotImplementedError
+
+    def close(self) -> List[str]:
+        return []
+
+
+class StoreSink(ResultSink):
+    def __init__(self, path: str):
+        from .services.analysis_store import SQLiteAnalysisStore
+        self.store = SQLiteAnalysisStore(path)
+
+    def write(self, result):
+        result["analysis_id"] = self.store.save(
+            result["content_hash"], result["applicant_id"], os.path.basename(result["file"]),
+            result["parsed_data"], result["maverick_analysis"], result["scoring_result"], result["final_output"],
+            result["token_usage"]
+        )
+        return [result["file"]]
+
+    def close(self):
+        self.store.close()
+        return []
+
+
+def _flat_row(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "file": result["file"],
+        "content_hash": result["content_hash"],
+        "applicant_id": result["applicant_id"],
+        "pages": result["pages"],
+        "final_score": result["scoring_result"].get("final_score"),
+        "decision": result["final_output"].get("summary", {}).get("health_status"),
+        "component_scores": result["scoring_result"].get("component_scores", {}),
+        "maverick_analysis": result["maverick_analysis"],
+        "final_output": result["final_output"],
+        "prompt_tokens": result["token_usage"]["prompt_tokens"],
+        "completion_tokens": result["token_usage"]["completion_tokens"],
+    }
+
+
+class JSONLSink(ResultSink):
+    """One JSON object per file; appended to on resume"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a")
+
+    def write(self, result):
+        self._file.write(json.dumps(_flat_row(result), default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return [result["file"]]
+
+    def close(self):
+        self._file.close()
+        return []
+
+
+class ParquetSink(ResultSink):
+    """
+    Parquet part files (`<output>/part-NNNNN.parquet`), one per `rows_per_part`
+    results; a resumed run adds parts. Nested fields are stored as JSON text.
+    """
+
+    def __init__(self, path: str, rows_per_part: int = 500):
+        try:
+            import pyarrow  # noqa: F401
+            import pandas
+        except ImportError:
+            raise Exception("Parquet output needs pandas and pyarrow (pip install pyarrow)")
+        self._pandas = pandas
+        self.path = path
+        self.rows_per_part = rows_per_part
+        self._rows: List[Dict[str, Any]] = []
+        os.makedirs(path, exist_ok=True)
+        self._part = len([name for name in os.listdir(path) if name.endswith(".parquet")])
+
+    def write(self, result):
+        row = _flat_row(result)
+        for column in ("component_scores", "maverick_analysis", "final_output"):
+            row[column] = json.dumps(row[column], default=str)
+        self._rows.append(row)
+        return self._flush() if len(self._rows) >= self.rows_per_part else []
+
+    def _flush(self) -> List[str]:
+        if not self._rows:
+            return []
+        path = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        self._pandas.DataFrame(self._rows).to_parquet(path + ".part", index=False)
+        os.replace(path + ".part", path)
+        self._part += 1
+        files, self._rows = [row["file"] for row in self._rows], []
+        return files
+
+    def close(self):
+        return self._flush()
+
+
+def open_sink(output: Optional[str], db: str) -> ResultSink:
+    if not output:
+        return StoreSink(db)
+    if output.endswith(".jsonl"):
+        return JSONLSink(output)
+    if output.endswith(".parquet"):
+        return ParquetSink(output)
+    raise Exception(f"Unknown output format for {output}: use .jsonl or .parquet, or omit for the analysis store")
+
+
+# --- parse workers (run in the process pool) ---
+
+_worker_parser = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def default_parser():
+    """
+    DocumentParser for a pool worker. Its local text extraction runs inline:
+    the batch pool already spreads files over the cores.
+    """
+    from .api.document_processing.llama_parser import DocumentParser
+    from .api.document_processing.local_pdf_extractor import LocalPDFExtractor
+    parser = DocumentParser(api_key=os.getenv("LLAMA_CLOUD_API_KEY"))
+    if parser.local_extractor is not None:
+        parser.local_extractor = LocalPDFExtractor(executor=ThreadPoolExecutor(max_workers=1))
+    return parser
+
+
+def _init_parse_worker(parser_factory: ParserFactory, verbose: bool):
+    global _worker_parser, _worker_loop
+    # Keep stdout for the final stats: parser logging goes to stderr, or nowhere
+    sys.stdout = sys.stderr if verbose else open(os.devnull, "w")
+    _worker_parser = parser_factory()
+    # One loop for the worker's lifetime: the parser's shard limiter binds its
+    # asyncio primitives to the first loop that waits on them
+    _worker_loop = asyncio.new_event_loop()
+
+
+def _parse_file(path: str) -> Tuple[str, Dict[str, Any], float]:
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    parsed_data = _worker_loop.run_until_complete(_worker_parser.parse_document(path))
+    return digest.hexdigest(), parsed_data, time.perf_counter() - started
+
+
+def _percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+
+    def pick(pct: float) -> Optional[float]:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))], 3)
+
+    return {"p50": pick(50), "p95": pick(95), "max": round(ordered[-1], 3) if ordered else None}
+
+
+class BatchRunner:
+    """
+    Parse (process pool) -> analyze, score and narrate (event loop) -> sink,
+    with a bounded hand-off queue between the two so parsed documents never
+    pile up in memory faster than the LLM stages can take them.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        sink: ResultSink,
+        checkpoint: Checkpoint,
+        parse_workers: int,
+        llm_concurrency: int,
+        parser_factory: ParserFactory = default_parser,
+        applicant_from_dir: bool = False,
+        verbose: bool = False,
+        progress=sys.stderr
+    ):
+        self.root = root
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.parse_workers = max(1, parse_workers)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.parser_factory = parser_factory
+        self.applicant_from_dir = applicant_from_dir
+        self.verbose = verbose
+        self.progress = progress
+        self.stats: Dict[str, Any] = {"done": 0, "failed": 0, "pages": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._parse_seconds: List[float] = []
+        self._llm_seconds: List[float] = []
+
+    def _executor(self) -> Executor:
+        return ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parse_worker,
+            initargs=(self.parser_factory, self.verbose)
+        )
+
+    async def run(self, files: List[str]) -> Dict[str, Any]:
+        from .api.dependencies import get_maverick_analyzer, get_output_generator, get_scoring_service
+
+        pending = [file for file in files if file not in self.checkpoint.done]
+        self.stats.update({"files": len(files), "skipped": len(files) - len(pending)})
+        self._total = len(pending)
+        analyzer, scoring, output_generator = get_maverick_analyzer(), get_scoring_service(), get_output_generator()
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.llm_concurrency * 2)
+        started = time.perf_counter()
+
+        with self._executor() as executor:
+            loop = asyncio.get_running_loop()
+            parse_slots = asyncio.Semaphore(self.parse_workers * 2)
+
+            async def parse(file: str):
+                async with parse_slots:
+                    try:
+                        result = await loop.run_in_executor(executor, _parse_file, os.path.join(self.root, file))
+                    except Exception as e:
+                        self._finish(file, "failed", error=f"parse: {e}")
+                        return
+                await parsed.put((file, *result))
+
+            async def produce():
+                await asyncio.gather(*(parse(file) for file in pending))
+                for _ in range(self.llm_concurrency):
+                    await parsed.put(None)
+
+            async def consume():
+                while True:
+                    item = await parsed.get()
+                    if item is None:
+                        return
+                    await self._analyze(item, analyzer, scoring, output_generator)
+
+            await asyncio.gather(produce(), *(consume() for _ in range(self.llm_concurrency)))
+        for file in self.sink.close():
+            self._finish(file, "done")
+
+        elapsed = time.perf_counter() - started
+        self.stats.update({
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_minute": round(60 * self.stats["done"] / elapsed, 2) if elapsed else None,
+            "pages_per_second": round(self.stats["pages"] / elapsed, 2) if elapsed else None,
+            "parse_seconds": _percentiles(self._parse_seconds),
+            "llm_seconds": _percentiles(self._llm_seconds),
+            "parse_workers": self.parse_workers,
+            "llm_concurrency": self.llm_concurrency,
+        })
+        return self.stats
+
+    async def _analyze(self, item, analyzer, scoring, output_generator):
+        file, content_hash, parsed_data, parse_seconds = item
+        self._parse_seconds.append(parse_seconds)
+        started = time.perf_counter()
+        ledger = start_token_ledger(config.LLM_REQUEST_TOKEN_BUDGET)
+        try:
+            maverick_analysis = await analyzer.analyze_transactions(parsed_data)
+            scoring_result = scoring.calculate_score(maverick_analysis)
+            final_output = await output_generator.generate_output(
+                maverick_analysis=maverick_analysis,
+                scoring_result=scoring_result
+            )
+        except Exception as e:
+            self._finish(file, "failed", error=str(getattr(e, "detail", "") or e))
+            return
+        self._llm_seconds.append(time.perf_counter() - started)
+        usage = ledger.summary()
+        pages = len(parsed_data.get("documents") or [])
+        self.stats["pages"] += pages
+        self.stats["prompt_tokens"] += usage["prompt_tokens"]
+        self.stats["completion_tokens"] += usage["completion_tokens"]
+        result = {
+            "file": file,
+            "content_hash": content_hash,
+            "applicant_id": file.split(os.sep)[0] if self.applicant_from_dir and os.sep in file else None,
+            "pages": pages,
+            "parsed_data": parsed_data,
+            "maverick_analysis": maverick_analysis,
+            "scoring_result": scoring_result,
+            "final_output": final_output,
+            "token_usage": usage,
+        }
+        try:
+            durable = await asyncio.to_thread(self.sink.write, result)
+        except Exception as e:
+            self._finish(file, "failed", error=f"write: {e}")
+            return
+        for done in durable:
+            self._finish(done, "done", final_score=scoring_result.get("final_score") if done == file else None)
+
+    def _finish(self, file: str, status: str, **details: Any):
+        self.checkpoint.record(file, status, **details)
+        self.stats[status] += 1
+        finished = self.stats["done"] + self.stats["failed"]
+        note = details.get("error") or (f"score={details['final_score']}" if details.get("final_score") is not None else "")
+        print(f"[{finished}/{self._total}] {status} {file} {note}".rstrip(), file=self.progress)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory of statement PDFs (searched recursively)")
+    parser.add_argument("--output", help="results.jsonl or results.parquet (default: the analysis store)")
+    parser.add_argument("--db", default=config.ANALYSIS_STORE_PATH, help="analysis store path when --output is not given")
+    parser.add_argument("--checkpoint", help="progress file (default: <output or db>.checkpoint.jsonl)")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--llm-concurrency", type=int, default=config.LLM_MAX_CONCURRENCY,
+                        help="files in the LLM stages at once")
+    parser.add_argument("--applicant-from-dir", action="store_true",
+                        help="use each file's first subdirectory as its applicant id")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own logging (on stderr)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"No such directory: {args.directory}", file=sys.stderr)
+        return 1
+    try:
+        sink = open_sink(args.output, args.db)
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    checkpoint = Checkpoint(args.checkpoint or f"{(args.output or args.db).rstrip(os.sep)}.checkpoint.jsonl")
+    runner = BatchRunner(
+        args.directory, sink, checkpoint, args.parse_workers, args.llm_concurrency,
+        applicant_from_dir=args.applicant_from_dir, verbose=args.verbose
+    )
+    try:
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(contextlib.redirect_stdout(
+                sys.stderr if args.verbose else stack.enter_context(open(os.devnull, "w"))
+            ))
+            stats = asyncio.run(runner.run(find_pdfs(args.directory)))
+    finally:
+        checkpoint.close()
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Worker processes serving the app (`python main.py` starts this many uvicorn
+# workers; gunicorn sets it too). Per-process pools and LLM limits below are
+# split between workers, and caches, jobs and uploads are shared on disk.
+WEB_CONCURRENCY = max(1, _env_int("WEB_CONCURRENCY", 1))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "app/uploads")
+
+# Request admission per worker (see app/utils/request_gate.py): concurrent
+# requests, bounded FIFO queue and how long a request may wait in it, and a
+# per-client cap on running + queued requests. Beyond that: 429/503 with
+# Retry-After. Uploads are also capped in size and total bytes on disk.
+ANALYZE_MAX_ACTIVE = _env_int("ANALYZE_MAX_ACTIVE", 8)
+ANALYZE_MAX_QUEUE = _env_int("ANALYZE_MAX_QUEUE", 32)
+ANALYZE_MAX_QUEUE_WAIT = _env_float("ANALYZE_MAX_QUEUE_WAIT", 30.0)
+ANALYZE_MAX_PER_CLIENT = _env_int("ANALYZE_MAX_PER_CLIENT", 4)
+UPLOAD_MAX_ACTIVE = _env_int("UPLOAD_MAX_ACTIVE", 16)
+UPLOAD_MAX_QUEUE = _env_int("UPLOAD_MAX_QUEUE", 64)
+UPLOAD_MAX_QUEUE_WAIT = _env_float("UPLOAD_MAX_QUEUE_WAIT", 10.0)
+UPLOAD_MAX_PER_CLIENT = _env_int("UPLOAD_MAX_PER_CLIENT", 8)
+UPLOAD_MAX_BYTES = _env_int("UPLOAD_MAX_BYTES", 25 * 1024 * 1024)
+UPLOAD_DIR_MAX_BYTES = _env_int("UPLOAD_DIR_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+# Per-client caps count requests by peer address. An X-Client-Id header is
+# only honored on requests whose peer is one of these comma-separated
+# addresses (a reverse proxy or gateway that sets it after authenticating);
+# from anyone else it is ignored, since a client could rotate it at will.
+TRUSTED_PROXIES = [host.strip() for host in os.getenv("TRUSTED_PROXIES", "").split(",") if host.strip()]
+
+
+# LLM backend: "http" (OpenAI-compatible server), "replay" (recorded fixtures) or "fake"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "http")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.llama-api.com")
+LLM_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("LLAMA_API_KEY")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama4-maverick")
+LLM_REPLAY_DIR = os.getenv("LLM_REPLAY_DIR", "tests/fixtures/llm")
+LLM_REPLAY_RECORD = _env_bool("LLM_REPLAY_RECORD", False)
+LLM_FAKE_LATENCY_MS = _env_float("LLM_FAKE_LATENCY_MS", 0.0)
+LLM_FAKE_JITTER_MS = _env_float("LLM_FAKE_JITTER_MS", 0.0)
+LLM_FAKE_ERROR_RATE = _env_float("LLM_FAKE_ERROR_RATE", 0.0)
+
+# LLM admission control (shared by every LlamaClient in the process). The
+# limits are for the whole deployment; each worker gets 1/WEB_CONCURRENCY.
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 4)
+LLM_REQUESTS_PER_MINUTE = _env_int("LLM_REQUESTS_PER_MINUTE", 60)
+LLM_TOKENS_PER_MINUTE = _env_int("LLM_TOKENS_PER_MINUTE", 200000)
+LLM_DEFAULT_RETRY_AFTER = _env_float("LLM_DEFAULT_RETRY_AFTER", 2.0)
+LLM_EXPECTED_COMPLETION_TOKENS = _env_int("LLM_EXPECTED_COMPLETION_TOKENS", 1500)
+
+# LLM retry, timeout and hedging policy (seconds)
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 3)
+LLM_RETRY_BASE_DELAY = _env_float("LLM_RETRY_BASE_DELAY", 0.5)
+LLM_RETRY_MAX_DELAY = _env_float("LLM_RETRY_MAX_DELAY", 8.0)
+LLM_ATTEMPT_TIMEOUT = _env_float("LLM_ATTEMPT_TIMEOUT", 60.0)
+LLM_DEADLINE = _env_float("LLM_DEADLINE", 150.0)
+LLM_HEDGE_ENABLED = _env_bool("LLM_HEDGE_ENABLED", False)
+LLM_HEDGE_MIN_SAMPLES = _env_int("LLM_HEDGE_MIN_SAMPLES", 20)
+LLM_HEDGE_MIN_DELAY = _env_float("LLM_HEDGE_MIN_DELAY", 1.0)
+
+# Per-stage model routing: model, completion cap and latency budget (seconds).
+# A stage with a fallback model switches to it while its primary is rate
+# limited or running over budget. Narrative generation rewords structured
+# facts, so it goes to the smaller model by default.
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama4-scout")
+LLM_ANALYSIS_MODEL = os.getenv("LLM_ANALYSIS_MODEL", LLM_MODEL)
+LLM_ANALYSIS_FALLBACK_MODEL = os.getenv("LLM_ANALYSIS_FALLBACK_MODEL", "")
+LLM_ANALYSIS_MAX_TOKENS = _env_int("LLM_ANALYSIS_MAX_TOKENS", 4096)
+LLM_ANALYSIS_LATENCY_BUDGET = _env_float("LLM_ANALYSIS_LATENCY_BUDGET", 90.0)
+LLM_NARRATIVE_MODEL = os.getenv("LLM_NARRATIVE_MODEL", LLM_FAST_MODEL)
+LLM_NARRATIVE_FALLBACK_MODEL = os.getenv("LLM_NARRATIVE_FALLBACK_MODEL", "")
+LLM_NARRATIVE_MAX_TOKENS = _env_int("LLM_NARRATIVE_MAX_TOKENS", 2048)
+LLM_NARRATIVE_LATENCY_BUDGET = _env_float("LLM_NARRATIVE_LATENCY_BUDGET", 20.0)
+LLM_ROUTE_MIN_SAMPLES = _env_int("LLM_ROUTE_MIN_SAMPLES", 10)
+
+# Token budgets. A prompt over its stage cap is compacted (whitespace and
+# table padding) or, with LLM_PROMPT_BUDGET_ACTION=abort or when compaction
+# is not enough, refused with a 413 before it is sent. LLM_REQUEST_TOKEN_BUDGET
+# caps prompt + completion tokens per analysis request (0 = no cap).
+LLM_ANALYSIS_MAX_PROMPT_TOKENS = _env_int("LLM_ANALYSIS_MAX_PROMPT_TOKENS", 24000)
+LLM_NARRATIVE_MAX_PROMPT_TOKENS = _env_int("LLM_NARRATIVE_MAX_PROMPT_TOKENS", 8000)
+LLM_PROMPT_BUDGET_ACTION = os.getenv("LLM_PROMPT_BUDGET_ACTION", "compact")
+LLM_REQUEST_TOKEN_BUDGET = _env_int("LLM_REQUEST_TOKEN_BUDGET", 0)
+
+# Diagnostics
+LOOP_MONITOR_ENABLED = _env_bool("LOOP_MONITOR_ENABLED", True)
+LOOP_MONITOR_INTERVAL = _env_float("LOOP_MONITOR_INTERVAL", 0.05)
+LOOP_MONITOR_THRESHOLD = _env_float("LOOP_MONITOR_THRESHOLD", 0.1)
+DEBUG_ENDPOINTS_ENABLED = _env_bool("DEBUG_ENDPOINTS_ENABLED", False)
+
+# On-demand request profiling: ?profile=1 or an X-Profile: 1 header on
+# /analyze samples stacks and times each stage; profiles are stored in
+# PROFILE_DIR and served from /api/v1/analyses/profiles/{id}
+PROFILING_ENABLED = _env_bool("PROFILING_ENABLED", True)
+PROFILE_SAMPLE_INTERVAL = _env_float("PROFILE_SAMPLE_INTERVAL", 0.005)
+PROFILE_MAX_SECONDS = _env_float("PROFILE_MAX_SECONDS", 300.0)
+PROFILE_RATE_PER_MINUTE = _env_float("PROFILE_RATE_PER_MINUTE", 2.0)
+PROFILE_BURST = _env_int("PROFILE_BURST", 2)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "app/data/profiles")
+PROFILE_KEEP = _env_int("PROFILE_KEEP", 50)
+
+# Tracing: OpenTelemetry-style spans over the pipeline, exported as OTLP/JSON.
+# TRACE_EXPORTER is "none" (the default), "file" (TRACE_FILE_PATH, one export
+# request per line, rotated at TRACE_FILE_MAX_BYTES keeping TRACE_FILE_BACKUPS
+# old files) or "otlp_http" (a collector at OTEL_EXPORTER_OTLP_ENDPOINT).
+TRACING_ENABLED = _env_bool("TRACING_ENABLED", True)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH", "app/data/traces.jsonl")
+TRACE_FILE_MAX_BYTES = _env_int("TRACE_FILE_MAX_BYTES", 50 * 1024 * 1024)
+TRACE_FILE_BACKUPS = _env_int("TRACE_FILE_BACKUPS", 2)
+TRACE_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+TRACE_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "bank-statement-analyzer")
+TRACE_SAMPLE_RATIO = _env_float("TRACE_SAMPLE_RATIO", 1.0)
+TRACE_EXPORT_INTERVAL = _env_float("TRACE_EXPORT_INTERVAL", 2.0)
+TRACE_MAX_QUEUE = _env_int("TRACE_MAX_QUEUE", 2048)
+
+# Local PDF text-layer extraction (cloud OCR only for scanned pages)
+LOCAL_PDF_EXTRACTION = _env_bool("LOCAL_PDF_EXTRACTION", True)
+LOCAL_PDF_MIN_CHARS = _env_int("LOCAL_PDF_MIN_CHARS", 40)
+LOCAL_PDF_WORKERS = _env_int("LOCAL_PDF_WORKERS", max(1, min(4, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+LOCAL_PDF_PAGES_PER_TASK = _env_int("LOCAL_PDF_PAGES_PER_TASK", 8)
+
+# Page-range sharding for cloud OCR of long documents
+PARSE_PAGES_PER_SHARD = _env_int("PARSE_PAGES_PER_SHARD", 8)
+PARSE_SHARD_INITIAL_CONCURRENCY = _env_int("PARSE_SHARD_INITIAL_CONCURRENCY", 4)
+PARSE_SHARD_MAX_CONCURRENCY = _env_int("PARSE_SHARD_MAX_CONCURRENCY", 8)
+PARSE_SHARD_LATENCY_TARGET = _env_float("PARSE_SHARD_LATENCY_TARGET", 30.0)
+
+# Incremental re-analysis: per-page parse and per-chunk analysis caching.
+# RESULT_CACHE_BACKEND is "memory", "sqlite" (shared file) or "auto" (sqlite
+# when WEB_CONCURRENCY > 1).
+RESULT_CACHE_MAX_ENTRIES = _env_int("RESULT_CACHE_MAX_ENTRIES", 5000)
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "auto")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "app/data/cache.db")
+ANALYSIS_PAGES_PER_CHUNK = _env_int("ANALYSIS_PAGES_PER_CHUNK", 6)
+
+# Local recurring-payment detection (replaces the model's recurring lists)
+RECURRING_DETECTION = _env_bool("RECURRING_DETECTION", True)
+RECURRING_MIN_TRANSACTIONS = _env_int("RECURRING_MIN_TRANSACTIONS", 5)
+RECURRING_MIN_SPAN_DAYS = _env_int("RECURRING_MIN_SPAN_DAYS", 45)
+RECURRING_AMOUNT_TOLERANCE = _env_float("RECURRING_AMOUNT_TOLERANCE", 0.1)
+
+# Persistent analysis store, and analysis job status shared by all workers
+ANALYSIS_STORE_ENABLED = _env_bool("ANALYSIS_STORE_ENABLED", True)
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", "app/data/analyses.db")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "app/data/jobs.db")
+
+# Declarative scoring rules (hot-reloaded; see app/core/scoring_rules.yaml)
+SCORING_RULES_ENABLED = _env_bool("SCORING_RULES_ENABLED", True)
+SCORING_RULES_PATH = os.getenv("SCORING_RULES_PATH", os.path.join(os.path.dirname(__file__), "scoring_rules.yaml"))
+SCORING_RULES_RELOAD_INTERVAL = _env_float("SCORING_RULES_RELOAD_INTERVAL", 2.0)
+# What-if re-scoring: most scenarios one /analyses/rescore grid may expand to
+RESCORE_MAX_SCENARIOS = _env_int("RESCORE_MAX_SCENARIOS", 1000)
+
+# Streamed completions for incremental per-bucket scoring
+LLM_STREAMING = _env_bool("LLM_STREAMING", True)
+
+# Prompt templates: static system prefixes + per-request user content.
+# PROMPT_VERSIONS pins template versions, e.g. "analysis=1,narrative=1"
+PROMPT_TEMPLATES_PATH = os.getenv("PROMPT_TEMPLATES_PATH", os.path.join(os.path.dirname(__file__), "prompt_templates.yaml"))
+PROMPT_VERSIONS = os.getenv("PROMPT_VERSIONS", "")
+
+# Startup: pipeline services are built on the first request, which keeps cold
+# starts short; PRELOAD_DEPENDENCIES builds them (and imports LlamaParse)
+# during startup instead, for long-running servers.
+PRELOAD_DEPENDENCIES = _env_bool("PRELOAD_DEPENDENCIES", False)
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+class RescoreRequest(BaseModel):
+    weights: Optional[Dict[str, float]] = None
+    thresholds: Optional[Dict[str, float]] = None
+    grid: Optional[Dict[str, Dict[str, List[float]]]] = Field(
+        None, description='e.g. {"weights": {"cash_flow": [0.3, 0.5]}, "thresholds": {"low_score": [55, 65]}}'
+    )
+    since: Optional[float] = None
+    until: Optional[float] = None
+    applicant_id: Optional[str] = None
+    include_changes: bool = True
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "weights": {"cash_flow": 0.5, "income": 0.2},
+                "grid": {"thresholds": {"low_score": [55, 60, 65]}},
+                "include_changes": False
+            }
+        }
@@ -0,0 +1,203 @@
+from array import array
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .transaction import Transaction
+
+EPOCH = date(1970, 1, 1)
+TYPE_CODES = {"UNKNOWN": 0, "credit": 1, "debit": 2}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+NO_CATEGORY = -1
+
+
+def to_epoch_day(value: Union[date, datetime]) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def to_cents(value: Union[Decimal, float, int, str]) -> int:
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+class StringPool:
+    """Interns repeated strings (descriptions, categories) as small integer ids"""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self._ids: Dict[str, int] = {value: i for i, value in enumerate(self.values)}
+
+    def intern(self, value: str) -> int:
+        index = self._ids.get(value)
+        if index is None:
+            index = len(self.values)
+            self._ids[value] = index
+            self.values.append(value)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class TransactionTable:
+    """
+    Columnar transactions: epoch-day dates, signed amounts and balances in
+    integer cents, an int8 type code and interned description/category ids.
+    Aggregates run over whole columns; convert to `Transaction` models only
+    where a response needs them.
+    """
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        amounts: np.ndarray,
+        types: np.ndarray,
+        description_ids: np.ndarray,
+        balances: np.ndarray,
+        category_ids: np.ndarray,
+        strings: StringPool
+    ):
+        self.dates = dates
+        self.amounts = amounts
+        self.types = types
+        self.description_ids = description_ids
+        self.balances = balances
+        self.category_ids = category_ids
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    @classmethod
+    def empty(cls) -> "TransactionTable":
+        return TransactionTableBuilder().build()
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> "TransactionTable":
+        builder = TransactionTableBuilder()
+        for t in transactions:
+            builder.append(
+                to_epoch_day(t.date), t.description, to_cents(t.amount),
+                t.transaction_type, to_cents(t.balance_after), t.category
+            )
+        return builder.build()
+
+    @property
+    def nbytes(self) -> int:
+        """Column memory, excluding the (shared) string pool"""
+        return sum(column.nbytes for column in (
+            self.dates, self.amounts, self.types, self.description_ids, self.balances, self.category_ids
+        ))
+
+    def description(self, row: int) -> str:
+        return self.strings.values[self.description_ids[row]]
+
+    def category(self, row: int) -> Optional[str]:
+        index = self.category_ids[row]
+        return self.strings.values[index] if index != NO_CATEGORY else None
+
+    def rows(self) -> Iterator[Tuple[date, str, Decimal, Optional[str]]]:
+        """(date, description, amount, category) per row, for prompt building"""
+        for row in range(len(self)):
+            yield (
+                EPOCH + timedelta(days=int(self.dates[row])),
+                self.description(row),
+                Decimal(int(self.amounts[row])) / 100,
+                self.category(row)
+            )
+
+    def to_transactions(self) -> List[Transaction]:
+        """API boundary: materialize Pydantic models (dates at midnight)"""
+        return [
+            Transaction(
+                date=datetime.combine(EPOCH + timedelta(days=int(self.dates[row])), datetime.min.time()),
+                description=self.description(row),
+                amount=Decimal(int(self.amounts[row])) / 100,
+                transaction_type=TYPE_NAMES.get(int(self.types[row]), "UNKNOWN"),
+                balance_after=Decimal(int(self.balances[row])) / 100,
+                category=self.category(row)
+            )
+            for row in range(len(self))
+        ]
+
+    def inflow_cents(self) -> int:
+        return int(self.amounts[self.amounts > 0].sum())
+
+    def outflow_cents(self) -> int:
+        return int(-self.amounts[self.amounts < 0].sum())
+
+    def net_cents(self) -> int:
+        return int(self.amounts.sum())
+
+    def monthly(self) -> Dict[str, Dict[str, float]]:
+        """Inflow, outflow and net per calendar month, keyed 'YYYY-MM'"""
+        if not len(self):
+            return {}
+        months = self.dates.astype("datetime64[D]").astype("datetime64[M]")
+        keys, bucket = np.unique(months, return_inverse=True)
+        # float64 weights are exact for sums below 2**53 cents
+        credits = np.where(self.amounts > 0, self.amounts, 0)
+        debits = np.where(self.amounts < 0, -self.amounts, 0)
+        inflow = np.rint(np.bincount(bucket, weights=credits, minlength=len(keys))).astype(np.int64)
+        outflow = np.rint(np.bincount(bucket, weights=debits, minlength=len(keys))).astype(np.int64)
+        return {
+            str(key): {
+                "inflow": int(inflow[i]) / 100,
+                "outflow": int(outflow[i]) / 100,
+                "net": int(inflow[i] - outflow[i]) / 100,
+            }
+            for i, key in enumerate(keys)
+        }
+
+
+class TransactionTableBuilder:
+    """Appends rows into compact `array` buffers, then freezes them as NumPy columns"""
+
+    def __init__(self, strings: Optional[StringPool] = None):
+        self.strings = strings or StringPool()
+        self._dates = array("q")
+        self._amounts = array("q")
+        self._types = array("b")
+        self._descriptions = array("i")
+        self._balances = array("q")
+        self._categories = array("i")
+
+    def __len__(self) -> int:
+        return len(self._amounts)
+
+    def append(
+        self,
+        epoch_day: int,
+        description: str,
+        amount_cents: int,
+        transaction_type: str = "UNKNOWN",
+        balance_cents: int = 0,
+        category: Optional[str] = None
+    ):
+        self._dates.append(epoch_day)
+        self._amounts.append(amount_cents)
+        self._types.append(TYPE_CODES.get(transaction_type, 0))
+        self._descriptions.append(self.strings.intern(description))
+        self._balances.append(balance_cents)
+        self._categories.append(self.strings.intern(category) if category is not None else NO_CATEGORY)
+
+    def build(self) -> TransactionTable:
+        return TransactionTable(
+            dates=np.frombuffer(self._dates, dtype=np.int64).copy(),
+            amounts=np.frombuffer(self._amounts, dtype=np.int64).copy(),
+            types=np.frombuffer(self._types, dtype=np.int8).copy(),
+            description_ids=np.frombuffer(self._descriptions, dtype=np.int32).copy(),
+            balances=np.frombuffer(self._balances, dtype=np.int64).copy(),
+            category_ids=np.frombuffer(self._categories, dtype=np.int32).copy(),
+            strings=self.strings
+        )
+
+
+def as_table(transactions: Union[TransactionTable, Iterable[Transaction]]) -> TransactionTable:
+    """Accept either representation at service entry points"""
+    if isinstance(transactions, TransactionTable):
+        return transactions
+    return TransactionTable.from_transactions(transactions)
@@ -0,0 +1,72 @@
+"""
+Re-score stored analyses offline with what-if weights and thresholds.
+
+    python -m app.rescore --weights '{"cash_flow": 0.5, "income": 0.2}'
+    python -m app.rescore --grid grid.json --no-changes
+    python -m app.rescore --db app/data/analyses.db --since 2025-01-01
+
+Writes NDJSON to stdout: changed decisions, then one summary line per scenario.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Optional
+
+from .core import config
+from .services.analysis_store import SQLiteAnalysisStore
+from .services.rescoring import RescoreSweep, expand_grid, to_ndjson
+
+
+def _json_arg(value: Optional[str]) -> Any:
+    """Inline JSON, or a path to a JSON file"""
+    if value is None:
+        return None
+    if os.path.exists(value):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=config.ANALYSIS_STORE_PATH, help="analysis store path")
+    parser.add_argument("--weights", help="JSON object (or file) of weight overrides")
+    parser.add_argument("--thresholds", help="JSON object (or file) of threshold overrides")
+    parser.add_argument("--grid", help='JSON (or file) like {"weights": {"cash_flow": [0.3, 0.5]}}')
+    parser.add_argument("--since", help="ISO date or unix timestamp")
+    parser.add_argument("--until", help="ISO date or unix timestamp")
+    parser.add_argument("--applicant", help="only this applicant's analyses")
+    parser.add_argument("--no-changes", action="store_true", help="only print scenario summaries")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No analysis store at {args.db}", file=sys.stderr)
+        return 1
+    try:
+        scenarios = list(expand_grid(_json_arg(args.grid) or {}, _json_arg(args.weights), _json_arg(args.thresholds)))
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    store = SQLiteAnalysisStore(args.db)
+    sweep = RescoreSweep(scenarios)
+    records = store.iter_analyses(_timestamp(args.since), _timestamp(args.until), args.applicant)
+    for line in to_ndjson(sweep.run(records, include_changes=not args.no_changes)):
+        sys.stdout.write(line)
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
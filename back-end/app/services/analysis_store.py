@@ -0,0 +1,292 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..core import config
+
+SUMMARY_COLUMNS = (
+    "id, content_hash, applicant_id, filename, created_at, final_score, decision, component_scores, "
+    "prompt_tokens, completion_tokens"
+)
+
+# Columns added after the first release; created on open if missing
+ADDED_COLUMNS = {
+    "prompt_tokens": "INTEGER",
+    "completion_tokens": "INTEGER",
+    "token_usage": "TEXT",
+}
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, default=str).encode("utf-8"), 6)
+
+
+def _unpack(blob: Optional[bytes]) -> Any:
+    return json.loads(zlib.decompress(blob)) if blob is not None else None
+
+
+class AnalysisStore:
+    """Persists pipeline results so they can be looked up and re-scored without the LLM"""
+
+    def save(
+        self,
+        content_hash: str,
+        applicant_id: Optional[str],
+        filename: str,
+        parsed_data: Dict[str, Any],
+        maverick_analysis: Dict[str, Any],
+        scoring_result: Dict[str, Any],
+        final_output: Dict[str, Any],
+        token_usage: Optional[Dict[str, Any]] = None
+    ) -> str:
+        raise NotImplementedError
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def find(self, content_hash: Optional[str] = None, applicant_id: Optional[str] = None,
+             limit: int = 50) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def portfolio(self, since: Optional[float] = None, until: Optional[float] = None,
+                  min_score: Optional[float] = None, max_score: Optional[float] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def iter_analyses(self, since: Optional[float] = None, until: Optional[float] = None,
+                      applicant_id: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Summaries plus the decoded Maverick analysis, in insertion order"""
+        raise NotImplementedError
+
+    def token_usage(self, applicant_id: Optional[str] = None, since: Optional[float] = None,
+                    until: Optional[float] = None) -> Dict[str, Any]:
+        """LLM token totals over stored analyses, overall and by stage"""
+        raise NotImplementedError
+
+
+class SQLiteAnalysisStore(AnalysisStore):
+    """
+    One row per analysis. Small columns (hash, applicant, date, score,
+    decision) are indexed for lookups and portfolio queries; the parsed
+    document, structured analysis, scores and final output are stored as
+    zlib-compressed JSON and only decoded when a full record is requested.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._connection:
+            if self.path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    applicant_id TEXT,
+                    filename TEXT,
+                    created_at REAL NOT NULL,
+                    final_score REAL,
+                    decision TEXT,
+                    component_scores TEXT,
+                    parsed_data BLOB,
+                    maverick_analysis BLOB,
+                    scoring_result BLOB,
+                    final_output BLOB
+                );
+                CREATE INDEX IF NOT EXISTS idx_analyses_content_hash ON analyses (content_hash);
+                CREATE INDEX IF NOT EXISTS idx_analyses_applicant ON analyses (applicant_id, created_at);
+                CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at);
+                CREATE INDEX IF NOT EXISTS idx_analyses_final_score ON analyses (final_score);
+            """)
+            existing = {row["name"] for row in self._connection.execute("PRAGMA table_info(analyses)")}
+            for column, kind in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._connection.execute(f"ALTER TABLE analyses ADD COLUMN {column} {kind}")
+
+    def save(self, content_hash, applicant_id, filename, parsed_data, maverick_analysis, scoring_result, final_output,
+             token_usage=None) -> str:
+        analysis_id = uuid.uuid4().hex
+        token_usage = token_usage or {}
+        row = (
+            analysis_id, content_hash, applicant_id, filename, time.time(),
+            scoring_result.get("final_score"),
+            final_output.get("summary", {}).get("health_status"),
+            json.dumps(scoring_result.get("component_scores", {})),
+            _pack(parsed_data), _pack(maverick_analysis), _pack(scoring_result), _pack(final_output),
+            token_usage.get("prompt_tokens"), token_usage.get("completion_tokens"),
+            json.dumps(token_usage.get("stages", {})),
+        )
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO analyses (id, content_hash, applicant_id, filename, created_at, final_score, decision, "
+                "component_scores, parsed_data, maverick_analysis, scoring_result, final_output, "
+                "prompt_tokens, completion_tokens, token_usage) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row
+            )
+        return analysis_id
+
+    def _summary(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "content_hash": row["content_hash"],
+            "applicant_id": row["applicant_id"],
+            "filename": row["filename"],
+            "created_at": row["created_at"],
+            "final_score": row["final_score"],
+            "decision": row["decision"],
+            "component_scores": json.loads(row["component_scores"] or "{}"),
+            "prompt_tokens": row["prompt_tokens"],
+            "completion_tokens": row["completion_tokens"],
+        }
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        if row is None:
+            return None
+        record = self._summary(row)
+        for column in ("parsed_data", "maverick_analysis", "scoring_result", "final_output"):
+            record[column] = _unpack(row[column])
+        record["token_usage"] = json.loads(row["token_usage"] or "{}")
+        return record
+
+    def find(self, content_hash=None, applicant_id=None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest first; filters combine with AND"""
+        clauses, params = [], []
+        if content_hash is not None:
+            clauses.append("content_hash = ?")
+            params.append(content_hash)
+        if applicant_id is not None:
+            clauses.append("applicant_id = ?")
+            params.append(applicant_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM analyses {where} ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def portfolio(self, since=None, until=None, min_score=None, max_score=None) -> Dict[str, Any]:
+        """Counts, score statistics and decision mix, computed in SQL over the indexed columns"""
+        clauses, params = [], []
+        for clause, value in (
+            ("created_at >= ?", since), ("created_at < ?", until),
+            ("final_score >= ?", min_score), ("final_score <= ?", max_score),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            totals = self._connection.execute(
+                f"SELECT COUNT(*) AS count, AVG(final_score) AS average, MIN(final_score) AS minimum, "
+                f"MAX(final_score) AS maximum, COUNT(DISTINCT applicant_id) AS applicants FROM analyses {where}",
+                params
+            ).fetchone()
+            decisions = self._connection.execute(
+                f"SELECT decision, COUNT(*) AS count FROM analyses {where} GROUP BY decision", params
+            ).fetchall()
+            bands = self._connection.execute(
+                f"SELECT CAST(final_score / 10 AS INTEGER) * 10 AS band, COUNT(*) AS count "
+                f"FROM analyses {where} GROUP BY band ORDER BY band", params
+            ).fetchall()
+        return {
+            "count": totals["count"],
+            "applicants": totals["applicants"],
+            "score": {
+                "average": round(totals["average"], 2) if totals["average"] is not None else None,
+                "min": totals["minimum"],
+                "max": totals["maximum"],
+            },
+            "decisions": {row["decision"] or "unknown": row["count"] for row in decisions},
+            "score_bands": {f"{int(row['band'])}-{int(row['band']) + 9}": row["count"] for row in bands if row["band"] is not None},
+        }
+
+    def iter_analyses(self, since=None, until=None, applicant_id=None, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Pages through by rowid so the lock is only held per batch and a long
+        sweep never blocks writers; only the analysis blob is decompressed
+        """
+        clauses, params = ["rowid > ?"], []
+        for clause, value in (("created_at >= ?", since), ("created_at < ?", until), ("applicant_id = ?", applicant_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        query = (
+            f"SELECT rowid, {SUMMARY_COLUMNS}, maverick_analysis FROM analyses "
+            f"WHERE {' AND '.join(clauses)} ORDER BY rowid LIMIT ?"
+        )
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._connection.execute(query, (last_rowid, *params, batch_size)).fetchall()
+            for row in rows:
+                record = self._summary(row)
+                record["maverick_analysis"] = _unpack(row["maverick_analysis"])
+                yield record
+            if len(rows) < batch_size:
+                return
+            last_rowid = rows[-1]["rowid"]
+
+    def token_usage(self, applicant_id=None, since=None, until=None) -> Dict[str, Any]:
+        clauses, params = [], []
+        for clause, value in (("applicant_id = ?", applicant_id), ("created_at >= ?", since), ("created_at < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            totals = self._connection.execute(
+                f"SELECT COUNT(*) AS analyses, COUNT(prompt_tokens) AS accounted, "
+                f"TOTAL(prompt_tokens) AS prompt_tokens, TOTAL(completion_tokens) AS completion_tokens "
+                f"FROM analyses {where}", params
+            ).fetchone()
+            stage_rows = self._connection.execute(
+                f"SELECT json_each.key AS stage, TOTAL(json_extract(json_each.value, '$.calls')) AS calls, "
+                f"TOTAL(json_extract(json_each.value, '$.prompt_tokens')) AS prompt_tokens, "
+                f"TOTAL(json_extract(json_each.value, '$.completion_tokens')) AS completion_tokens "
+                f"FROM analyses, json_each(analyses.token_usage) {where} GROUP BY json_each.key", params
+            ).fetchall()
+        prompt_tokens, completion_tokens = int(totals["prompt_tokens"]), int(totals["completion_tokens"])
+        return {
+            "analyses": totals["analyses"],
+            "accounted_analyses": totals["accounted"],
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "average_tokens": round((prompt_tokens + completion_tokens) / totals["accounted"], 1) if totals["accounted"] else None,
+            "stages": {
+                row["stage"]: {
+                    "calls": int(row["calls"]),
+                    "prompt_tokens": int(row["prompt_tokens"]),
+                    "completion_tokens": int(row["completion_tokens"]),
+                }
+                for row in stage_rows
+            },
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_analysis_store: Optional[AnalysisStore] = None
+
+
+def get_analysis_store() -> AnalysisStore:
+    global _analysis_store
+    if _analysis_store is None:
+        _analysis_store = SQLiteAnalysisStore(config.ANALYSIS_STORE_PATH)
+    return _analysis_store
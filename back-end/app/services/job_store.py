@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from ..core import config
+
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+# Reported (not stored) for a running job whose worker process is gone
+JOB_ABANDONED = "abandoned"
+
+
+class JobStore:
+    """Status of analysis requests, readable from any worker"""
+
+    def start(self, filename: str, applicant_id: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def finish(self, job_id: str, analysis_id: Optional[str] = None):
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str):
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SQLiteJobStore(JobStore):
+    """
+    One row per analysis request in a WAL-mode SQLite file, so a job started
+    on one worker can be looked up through any other.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    applicant_id TEXT,
+                    status TEXT NOT NULL,
+                    worker_pid INTEGER,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    analysis_id TEXT,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+            """)
+
+    def start(self, filename, applicant_id=None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO jobs (id, filename, applicant_id, status, worker_pid, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, filename, applicant_id, JOB_RUNNING, os.getpid(), time.time())
+            )
+        return job_id
+
+    def finish(self, job_id, analysis_id=None):
+        self._close(job_id, JOB_DONE, analysis_id=analysis_id)
+
+    def fail(self, job_id, error):
+        self._close(job_id, JOB_FAILED, error=error[:2000])
+
+    def _close(self, job_id: str, status: str, analysis_id: Optional[str] = None, error: Optional[str] = None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, analysis_id = ?, error = ? WHERE id = ?",
+                (status, time.time(), analysis_id, error, job_id)
+            )
+
+    def get(self, job_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == JOB_RUNNING and not _process_alive(job["worker_pid"]):
+            job["status"] = JOB_ABANDONED
+        finished = job["finished_at"] or time.time()
+        job["elapsed_seconds"] = round(finished - job["created_at"], 3)
+        return job
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_job_store: Optional[JobStore] = None
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    if _job_store is None:
+        _job_store = SQLiteJobStore(config.JOB_STORE_PATH)
+    return _job_store
@@ -1,6 +1,7 @@
 import os
-from typing import List, Dict
+from typing import List, Dict, Iterable, Union
 from ..models.transaction import Transaction
+from ..models.transaction_table import TransactionTable, as_table
 import requests
 from datetime import datetime
 from decimal import Decimal
@@ -16,14 +17,14 @@ class LlamaClassifier:
         if self.debug:
             print(f"DEBUG LlamaClassifier: {message}")
 
-    def create_analysis_prompt(self, transactions: List[Transaction]) -> str:
+    def create_analysis_prompt(self, transactions: Union[TransactionTable, Iterable[Transaction]]) -> str:
         """Create a structured prompt for the Llama model"""
         
         # Convert transactions to a readable format
         transaction_text = "\n".join([
-            f"Date: {t.date}, Description: {t.description}, "
-            f"Amount: {t.amount}, Category: {t.category}"
-            for t in transactions
+            f"Date: {date}, Description: {description}, "
+            f"Amount: {amount}, Category: {category}"
+            for date, description, amount, category in as_table(transactions).rows()
         ])
 
         prompt = f"""As an expert financial analyst, analyze these bank transactions and assess loan worthiness. Please
@@ -53,8 +54,9 @@ Keep the analysis concise and data-driven."""
 
         return prompt
 
-    async def analyze_transactions(self, transactions: List[Transaction]) -> Dict:
+    async def analyze_transactions(self, transactions: Union[TransactionTable, Iterable[Transaction]]) -> Dict:
         """Send transactions to Llama API and get analysis"""
+        transactions = as_table(transactions)
         
         self.log(f"Analyzing {len(transactions)} transactions")
         
@@ -160,18 +162,20 @@ Keep the analysis concise and data-driven."""
             self.log(f"Error getting final analysis: {e}")
             raise
 
-    def extract_metrics(self, transactions: List[Transaction]) -> Dict:
+    def extract_metrics(self, transactions: Union[TransactionTable, Iterable[Transaction]]) -> Dict:
         """Calculate basic financial metrics from transactions"""
         try:
-            total_inflow = sum(t.amount for t in transactions if t.amount > 0)
-            total_outflow = abs(sum(t.amount for t in transactions if t.amount < 0))
+            table = as_table(transactions)
+            total_inflow = table.inflow_cents()
+            total_outflow = table.outflow_cents()
             
             return {
-                "total_transactions": len(transactions),
-                "total_inflow": float(total_inflow),
-                "total_outflow": float(total_outflow),
-                "net_flow": float(total_inflow - total_outflow),
-                "average_transaction": float(sum(abs(t.amount) for t in transactions) / len(transactions)) if transactions else 0
+                "total_transactions": len(table),
+                "total_inflow": total_inflow / 100,
+                "total_outflow": total_outflow / 100,
+                "net_flow": (total_inflow - total_outflow) / 100,
+                "average_transaction": (total_inflow + total_outflow) / 100 / len(table) if len(table) else 0,
+                "monthly": table.monthly()
             }
         except Exception as e:
             self.log(f"Error calculating metrics: {str(e)}")
@@ -3,10 +3,13 @@ from decimal import Decimal
 import re
 from typing import List, Dict
 from ..models.transaction import Transaction
+from ..models.transaction_table import TransactionTable, TransactionTableBuilder, to_epoch_day
+from ..utils.date_inference import DateParseResult, parse_date_value, parse_dates
 
 class PreprocessingService:
     def __init__(self):
         self.debug = True
+        self._date_format = None  # last format seen; statements rarely mix them
         
     def log(self, message: str):
         """Debug logging"""
@@ -36,7 +39,12 @@ class PreprocessingService:
 
     def process_textract_blocks(self, blocks: List[Dict]) -> List[Transaction]:
         """Process Textract blocks into transactions"""
-        transactions = []
+        return self.textract_blocks_table(blocks).to_transactions()
+
+    def textract_blocks_table(self, blocks: List[Dict]) -> TransactionTable:
+        """Process Textract blocks into a columnar transaction table"""
+        builder = TransactionTableBuilder()
+        today = to_epoch_day(datetime.now())
         
         # Get all LINE blocks
         lines = [
@@ -54,45 +62,27 @@ class PreprocessingService:
             
             # Find potential header for this line based on geometry
             potential_header = self.find_potential_header(blocks, line)
-            self.log(f"\nProcessing line: {text} (Potential header: {potential_header})")
             
-            try:
-                transaction = Transaction(
-                    date=datetime.now(),           # Default current date
-                    description=text,              # Use full line as description
-                    amount=Decimal('0.00'),        # Default amount
-                    transaction_type="UNKNOWN",    # Required field
-                    category=potential_header,     # Use potential header as category
-                    status="UNVERIFIED",           # Default status
-                    balance_after=Decimal('0.00')  # Required field
-                )
-                
-                transactions.append(transaction)
-                self.log(f"Created transaction: {transaction}")
-                
-            except Exception as e:
-                self.log(f"Error creating transaction: {str(e)}")
-                continue
+            # Unverified row: current date, zero amount, header as category
+            builder.append(today, text, 0, "UNKNOWN", 0, potential_header)
         
-        self.log(f"\nTotal transactions found: {len(transactions)}")
-        return transactions
+        self.log(f"Total transactions found: {len(builder)}")
+        return builder.build()
 
     def parse_date(self, date_str: str) -> datetime:
         """Parse date string into datetime"""
-        date_formats = [
-            '%m/%d/%Y', '%m-%d-%Y',
-            '%d/%m/%Y', '%d-%m-%Y',
-            '%m/%d/%y', '%m-%d-%y',
-            '%Y-%m-%d'  # ISO format
-        ]
-        
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        
-        raise ValueError(f"Unable to parse date: {date_str}")
+        parsed, self._date_format = parse_date_value(date_str, self._date_format)
+        if parsed is None:
+            raise ValueError(f"Unable to parse date: {date_str}")
+        return datetime.combine(parsed, datetime.min.time())
+
+    def parse_dates(self, date_strs: List[str]) -> DateParseResult:
+        """Parse a whole date column with one inferred format"""
+        result = parse_dates(date_strs)
+        self.log(f"Parsed dates: {result.summary()}")
+        for row, value in result.unparseable:
+            self.log(f"Unparseable date in row {row}: {value!r}")
+        return result
 
     def parse_amount(self, amount_str: str) -> Decimal:
         """Parse amount string into Decimal"""
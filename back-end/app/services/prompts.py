@@ -0,0 +1,111 @@
+import hashlib
+import re
+import string
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from ..core import config
+
+PLACEHOLDER = re.compile(r"\{[A-Za-z_][A-Za-z0-9_]*\}")
+
+
+class PromptTemplate:
+    """One version of a prompt: a static system prefix and a user template for the variable part"""
+
+    def __init__(self, name: str, version: int, system: str, user: str):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user = user
+        self.placeholders = {field for _, field, _, _ in string.Formatter().parse(user) if field}
+        if PLACEHOLDER.search(system):
+            # The prefix is sent verbatim; a {name} there is a template mistake
+            raise Exception(f"Prompt {self.id} has placeholders in its static prefix")
+        self.prefix_hash = hashlib.sha256(system.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def render(self, **variables: Any) -> "RenderedPrompt":
+        missing = self.placeholders - set(variables)
+        if missing:
+            raise Exception(f"Prompt {self.id} is missing: {', '.join(sorted(missing))}")
+        return RenderedPrompt(self, self.user.format(**variables))
+
+
+class RenderedPrompt:
+    def __init__(self, template: PromptTemplate, user: str):
+        self.template = template
+        self.system = template.system
+        self.user = user
+
+    def messages(self) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user},
+        ]
+
+
+class PromptRegistry:
+    """
+    Versioned prompt templates. `get` returns the newest version of a template
+    unless `pins` ({name: version}) selects another one.
+    """
+
+    def __init__(self, templates: List[PromptTemplate], pins: Optional[Dict[str, int]] = None):
+        self._templates: Dict[str, Dict[int, PromptTemplate]] = {}
+        for template in templates:
+            versions = self._templates.setdefault(template.name, {})
+            if template.version in versions:
+                raise Exception(f"Duplicate prompt template {template.id}")
+            versions[template.version] = template
+        self.pins = dict(pins or {})
+
+    def versions(self, name: str) -> List[int]:
+        return sorted(self._templates.get(name, {}))
+
+    def get(self, name: str, version: Optional[int] = None) -> PromptTemplate:
+        versions = self._templates.get(name)
+        if not versions:
+            raise Exception(f"Unknown prompt template '{name}'")
+        version = version if version is not None else self.pins.get(name, max(versions))
+        if version not in versions:
+            raise Exception(f"Prompt template '{name}' has no version {version}")
+        return versions[version]
+
+    def render(self, name: str, **variables: Any) -> RenderedPrompt:
+        return self.get(name).render(**variables)
+
+
+def load_prompt_templates(path: str) -> List[PromptTemplate]:
+    with open(path) as f:
+        spec = yaml.safe_load(f)
+    return [
+        PromptTemplate(name, int(entry["version"]), entry["system"], entry["user"])
+        for name, entries in spec.items()
+        for entry in entries
+    ]
+
+
+def parse_pins(value: str) -> Dict[str, int]:
+    """'analysis=2,narrative=1' -> {"analysis": 2, "narrative": 1}"""
+    pins = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, version = item.partition("=")
+        pins[name.strip()] = int(version)
+    return pins
+
+
+_prompt_registry: Optional[PromptRegistry] = None
+
+
+def get_prompt_registry() -> PromptRegistry:
+    global _prompt_registry
+    if _prompt_registry is None:
+        _prompt_registry = PromptRegistry(
+            load_prompt_templates(config.PROMPT_TEMPLATES_PATH),
+            parse_pins(config.PROMPT_VERSIONS)
+        )
+    return _prompt_registry
@@ -0,0 +1,186 @@
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.transaction_table import EPOCH, TransactionTable
+from .preprocessor import PreprocessingService
+
+# (name, nominal days, accepted interval range)
+PERIODS: List[Tuple[str, int, Tuple[int, int]]] = [
+    ("weekly", 7, (6, 8)),
+    ("biweekly", 14, (12, 16)),
+    ("monthly", 30, (26, 35)),
+]
+MIN_OCCURRENCES = {"weekly": 3, "biweekly": 2, "monthly": 2}
+
+# Rails and channel words that say how money moved, not who it went to
+CHANNEL_WORDS = {
+    "ACH", "NACH", "TP", "IMPS", "NEFT", "RTGS", "MOB", "RIB", "POS", "VISA", "MASTERCARD", "DEBIT", "CREDIT",
+    "CARD", "PURCHASE", "DIRECT", "NETBANK", "BPAY", "PMT", "PAYMENT", "AUTOPAY", "ONLINE", "TRANSFER", "TRF",
+    "FUND", "FT", "INW", "BILLPAY", "DD", "SO", "REF", "TO", "FROM", "THE",
+}
+DEBT_KEYWORDS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"MORTGAGE|HOME ?LOAN"), "mortgage"),
+    (re.compile(r"\bAUTO\b|CAR LOAN|MOTOR FIN"), "auto loan"),
+    (re.compile(r"STUDENT|NAVIENT|SALLIE"), "student loan"),
+    (re.compile(r"CREDIT CARD|CARD ?SERVICES|AMEX|AMERICAN EXPRESS|CAPITAL ONE|DISCOVER"), "credit card"),
+    (re.compile(r"\bLOAN|\bEMI\b|FINAN|LENDING|CREDIT UNION"), "loan"),
+]
+
+
+class RecurringSeries:
+    def __init__(self, merchant: str, description: str, direction: str, period: str,
+                 dates: List[date], amounts: List[float]):
+        self.merchant = merchant
+        self.description = description
+        self.direction = direction  # "credit" or "debit"
+        self.period = period
+        self.dates = dates
+        self.amounts = amounts
+
+    @property
+    def typical_amount(self) -> float:
+        return round(float(np.median(self.amounts)), 2)
+
+    @property
+    def total_amount(self) -> float:
+        return round(float(sum(self.amounts)), 2)
+
+    @property
+    def liability_type(self) -> Optional[str]:
+        if self.direction != "debit":
+            return None
+        text = f"{self.merchant} {self.description.upper()}"
+        for pattern, kind in DEBT_KEYWORDS:
+            if pattern.search(text):
+                return kind
+        return None
+
+    def next_expected(self) -> date:
+        nominal = dict((name, days) for name, days, _ in PERIODS)[self.period]
+        return self.dates[-1] + timedelta(days=nominal)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "description": self.description,
+            "merchant": self.merchant,
+            "direction": self.direction,
+            "frequency": self.period,
+            "occurrences": len(self.dates),
+            "amount": self.typical_amount,
+            "total_amount": self.total_amount,
+            "first_date": self.dates[0].isoformat(),
+            "last_date": self.dates[-1].isoformat(),
+            "next_expected": self.next_expected().isoformat(),
+        }
+
+
+class RecurringDetector:
+    """
+    Finds payments and income that repeat on a weekly, biweekly or monthly
+    cadence. Merchant strings are normalized and bucketed in a hash index
+    (O(n)); each bucket is sorted by date (O(n log n) overall) and its
+    intervals and amounts are checked against the period bands.
+    """
+
+    def __init__(self, amount_tolerance: float = 0.1, min_amount_slack: float = 1.0):
+        self.amount_tolerance = amount_tolerance
+        self.min_amount_slack = min_amount_slack
+        self._cleaner = PreprocessingService()
+        self._cleaner.debug = False
+
+    def merchant_key(self, description: str) -> str:
+        """
+        'NACH/TP ACH Bajaj Finanac/88551679' -> 'BAJAJ FINANAC'. Separators
+        become spaces before clean_description, then reference numbers and
+        channel words are dropped.
+        """
+        cleaned = self._cleaner.clean_description(re.sub(r"[/\\*#_:|-]", " ", description))
+        tokens = [token.strip("-.") for token in cleaned.split()]
+        tokens = [token for token in tokens if token and not any(c.isdigit() for c in token)]
+        named = [token for token in tokens if token not in CHANNEL_WORDS and len(token) > 1]
+        return " ".join((named or tokens)[:3]) or cleaned
+
+    def detect(self, table: TransactionTable) -> List[RecurringSeries]:
+        groups: Dict[Tuple[str, bool], List[int]] = {}
+        # Statements repeat descriptions; the detector lives for the process, so this cache doesn't
+        merchants: Dict[str, str] = {}
+        for row in range(len(table)):
+            amount = int(table.amounts[row])
+            if amount == 0:
+                continue
+            description = table.description(row)
+            merchant = merchants.get(description)
+            if merchant is None:
+                merchant = merchants[description] = self.merchant_key(description)
+            key = (merchant, amount > 0)
+            groups.setdefault(key, []).append(row)
+
+        series = []
+        for (merchant, is_credit), rows in groups.items():
+            if len(rows) < 2:
+                continue
+            found = self._periodic(table, merchant, is_credit, rows)
+            if found is not None:
+                series.append(found)
+        series.sort(key=lambda s: (-s.total_amount, s.merchant))
+        return series
+
+    def _periodic(self, table: TransactionTable, merchant: str, is_credit: bool, rows: List[int]) -> Optional[RecurringSeries]:
+        rows = sorted(rows, key=lambda row: int(table.dates[row]))
+        amounts = np.abs(table.amounts[rows]) / 100
+        median = float(np.median(amounts))
+        slack = max(self.amount_tolerance * median, self.min_amount_slack)
+        keep = [row for row, amount in zip(rows, amounts) if abs(amount - median) <= slack]
+
+        # Collapse same-day duplicates (split payments, reversals) before timing
+        days: List[int] = []
+        kept_rows: List[int] = []
+        for row in keep:
+            day = int(table.dates[row])
+            if days and day == days[-1]:
+                continue
+            days.append(day)
+            kept_rows.append(row)
+        if len(days) < 2:
+            return None
+
+        intervals = np.diff(days)
+        median_interval = float(np.median(intervals))
+        for name, _, (low, high) in PERIODS:
+            if not low <= median_interval <= high or len(days) < MIN_OCCURRENCES[name]:
+                continue
+            on_cadence = np.count_nonzero((intervals >= low) & (intervals <= high))
+            if on_cadence * 3 < len(intervals) * 2:
+                return None
+            return RecurringSeries(
+                merchant=merchant,
+                description=table.description(kept_rows[0]),
+                direction="credit" if is_credit else "debit",
+                period=name,
+                dates=[EPOCH + timedelta(days=day) for day in days],
+                amounts=[abs(int(table.amounts[row])) / 100 for row in kept_rows],
+            )
+        return None
+
+    @staticmethod
+    def analysis_fields(series: List[RecurringSeries]) -> Dict[str, Any]:
+        """The recurring lists MaverickAnalyzer's structured analysis carries"""
+        expenses, income, debt, liability_types = [], [], [], []
+        for item in series:
+            if item.direction == "credit":
+                income.append({**item.to_dict(), "description": item.merchant})
+            elif item.liability_type is not None:
+                debt.append({**item.to_dict(), "description": item.merchant})
+                if item.liability_type not in liability_types:
+                    liability_types.append(item.liability_type)
+            else:
+                expenses.append({**item.to_dict(), "description": item.merchant})
+        return {
+            "recurring_expenses": expenses,
+            "regular_sources": income,
+            "recurring_debt_payments": debt,
+            "liability_types": liability_types,
+        }
@@ -0,0 +1,178 @@
+import itertools
+import json
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..api.document_processing.output_generator import health_status
+from ..api.document_processing.scoring import ScoringLlamaService
+from .rules import CompiledRules
+
+
+class ScoringScenario:
+    """A named set of weight/threshold overrides on top of the production defaults"""
+
+    def __init__(self, name: str, weights: Optional[Dict[str, float]] = None,
+                 thresholds: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.service = ScoringLlamaService(weights=weights, thresholds=thresholds)
+        self.service.debug = False
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "scenario": self.name,
+            "weights": self.service.weights,
+            "thresholds": self.service.thresholds,
+            "weight_sum": round(sum(self.service.weights.values()), 6),
+        }
+
+
+def _grid_axes(grid: Dict[str, Dict[str, List[float]]]) -> List[Tuple[str, str, List[float]]]:
+    unknown = set(grid) - {"weights", "thresholds"}
+    if unknown:
+        raise Exception(f"Unknown grid section(s): {', '.join(sorted(unknown))}")
+    return [
+        (section, key, values)
+        for section in ("weights", "thresholds")
+        for key, values in sorted((grid.get(section) or {}).items())
+    ]
+
+
+def grid_size(grid: Dict[str, Dict[str, List[float]]]) -> int:
+    """Number of scenarios expand_grid yields, without building any"""
+    size = 1
+    for _, _, values in _grid_axes(grid):
+        size *= len(values)
+    return size
+
+
+def expand_grid(grid: Dict[str, Dict[str, List[float]]], weights: Optional[Dict[str, float]] = None,
+                thresholds: Optional[Dict[str, float]] = None) -> Iterator[ScoringScenario]:
+    """
+    {"weights": {"cash_flow": [0.3, 0.5]}, "thresholds": {"low_score": [55, 65]}}
+    -> one scenario per combination (4 here), generated lazily; check
+    grid_size first for grids from untrusted input. Fixed
+    `weights`/`thresholds` apply to every scenario; grid values override them.
+    """
+    axes = _grid_axes(grid)
+    if not axes:
+        yield ScoringScenario("what_if", weights, thresholds)
+        return
+
+    for combination in itertools.product(*(values for _, _, values in axes)):
+        overrides = {"weights": dict(weights or {}), "thresholds": dict(thresholds or {})}
+        for (section, key, _), value in zip(axes, combination):
+            overrides[section][key] = value
+        name = ",".join(f"{key}={value}" for (_, key, _), value in zip(axes, combination))
+        yield ScoringScenario(name, overrides["weights"], overrides["thresholds"])
+
+
+class _ScenarioTally:
+    def __init__(self):
+        self.decisions: Counter = Counter()
+        self.flags: Counter = Counter()
+        self.transitions: Counter = Counter()
+        self.score_total = 0.0
+
+
+class RescoreSweep:
+    """
+    Re-scores stored Maverick analyses under what-if scenarios without the
+    LLM, using the live scoring rules. Bucket scores do not depend on
+    weights or thresholds, so they are computed once per analysis and shared
+    by every scenario; each scenario then costs a weighted sum, a band lookup
+    and a flag pass.
+    """
+
+    def __init__(self, scenarios: Iterable[ScoringScenario], rules: Optional[CompiledRules] = None):
+        self.baseline = ScoringScenario("baseline")
+        self.scenarios = list(scenarios)
+        # Pin one rules snapshot so a reload mid-sweep can't mix rule versions
+        rules = rules or self.baseline.service.active_rules
+        for scenario in [self.baseline, *self.scenarios]:
+            scenario.service.rules = rules
+            scenario.service.refresh()
+        self.analyses = 0
+        self.errors = 0
+        self._tallies = {scenario.name: _ScenarioTally() for scenario in [self.baseline, *self.scenarios]}
+
+    def _evaluate(self, scenario: ScoringScenario, analysis: Dict[str, Any],
+                  component_scores: Dict[str, float]) -> Dict[str, Any]:
+        score = round(scenario.service.weighted_score(component_scores), 2)
+        flags = scenario.service._generate_flags(analysis, component_scores)
+        tally = self._tallies[scenario.name]
+        decision = health_status(score)
+        tally.decisions[decision] += 1
+        tally.flags.update(flag["type"] for flag in flags)
+        tally.score_total += score
+        return {"score": score, "decision": decision}
+
+    def rescore(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Score one stored record under the baseline and every scenario. Returns
+        the record's changed decisions, or None when nothing changed.
+        """
+        analysis = record.get("maverick_analysis") or {}
+        try:
+            component_scores = self.baseline.service.bucket_scores(analysis)
+            baseline = self._evaluate(self.baseline, analysis, component_scores)
+            results = {scenario.name: self._evaluate(scenario, analysis, component_scores) for scenario in self.scenarios}
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            # Fallback or truncated analyses cannot be scored; count, don't abort the sweep
+            self.errors += 1
+            print(f"Skipping analysis {record.get('id')}: {str(e)}")
+            return None
+        self.analyses += 1
+
+        changed = {}
+        for name, result in results.items():
+            if result["decision"] != baseline["decision"]:
+                self._tallies[name].transitions[f"{baseline['decision']} -> {result['decision']}"] += 1
+                changed[name] = result
+        if not changed:
+            return None
+        return {
+            "type": "change",
+            "id": record.get("id"),
+            "applicant_id": record.get("applicant_id"),
+            "baseline": baseline,
+            "scenarios": changed,
+        }
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per scenario: decision distribution and flag counts, with deltas against the baseline"""
+        base = self._tallies[self.baseline.name]
+        rows = []
+        for scenario in [self.baseline, *self.scenarios]:
+            tally = self._tallies[scenario.name]
+            decisions = sorted(set(base.decisions) | set(tally.decisions))
+            flags = sorted(set(base.flags) | set(tally.flags))
+            rows.append({
+                "type": "scenario",
+                **scenario.describe(),
+                "analyses": self.analyses,
+                "average_score": round(tally.score_total / self.analyses, 2) if self.analyses else None,
+                "decisions": {name: tally.decisions[name] for name in decisions},
+                "decision_deltas": {name: tally.decisions[name] - base.decisions[name] for name in decisions},
+                "transitions": dict(tally.transitions),
+                "flags": {name: tally.flags[name] for name in flags},
+                "flag_deltas": {name: tally.flags[name] - base.flags[name] for name in flags},
+            })
+        return rows
+
+    def run(self, records: Iterable[Dict[str, Any]], include_changes: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Stream results: a "change" line for each analysis whose decision moves
+        (optional), then one "scenario" line per scenario and a closing "done" line
+        """
+        for record in records:
+            change = self.rescore(record)
+            if change is not None and include_changes:
+                yield change
+        for row in self.summary():
+            yield row
+        yield {"type": "done", "analyses": self.analyses, "errors": self.errors, "scenarios": len(self.scenarios)}
+
+
+def to_ndjson(lines: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for line in lines:
+        yield json.dumps(line, default=str) + "\n"
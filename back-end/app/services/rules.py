@@ -0,0 +1,340 @@
+import ast
+import json
+import keyword
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from ..core import config
+
+# Functions rule expressions may call. field/count/total/contains_any are
+# rewritten into inline Python by the compiler; the rest are the builtins.
+FUNCTIONS = {"field", "count", "total", "contains_any", "min", "max", "abs", "round"}
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.IfExp, ast.Call, ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple,
+)
+RESERVED_NAMES = {"value", "score", "data"}
+SAFE_BUILTINS = {"min": min, "max": max, "abs": abs, "round": round, "len": len, "sum": sum, "any": any}
+
+
+class RulesError(Exception):
+    pass
+
+
+class _Rewriter(ast.NodeTransformer):
+    """Maps rule names onto generated locals and inlines the helper functions"""
+
+    def __init__(self, names: Dict[str, str]):
+        self.names = names
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        return ast.copy_location(ast.Name(id=self.names[node.id], ctx=ast.Load()), node)
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        args = [self.visit(arg) for arg in node.args]
+        name = node.func.id
+        if name == "field":
+            # field("x", default) -> data.get("x", default)
+            func = ast.Attribute(value=ast.Name(id="data", ctx=ast.Load()), attr="get", ctx=ast.Load())
+            return ast.copy_location(ast.Call(func=func, args=args, keywords=[]), node)
+        if name == "count":
+            return ast.copy_location(ast.Call(func=ast.Name(id="len", ctx=ast.Load()), args=args, keywords=[]), node)
+        if name == "total":
+            # total(items, "amount") -> sum(_item["amount"] for _item in items)
+            element = ast.Subscript(value=ast.Name(id="_item", ctx=ast.Load()), slice=args[1], ctx=ast.Load())
+            return ast.copy_location(self._over_items("sum", element, args[0]), node)
+        if name == "contains_any":
+            # contains_any(items, "word") -> any("word" in _item.lower() for _item in items)
+            lowered = ast.Call(
+                func=ast.Attribute(value=ast.Name(id="_item", ctx=ast.Load()), attr="lower", ctx=ast.Load()),
+                args=[], keywords=[]
+            )
+            element = ast.Compare(left=args[1], ops=[ast.In()], comparators=[lowered])
+            return ast.copy_location(self._over_items("any", element, args[0]), node)
+        return ast.copy_location(ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[]), node)
+
+    @staticmethod
+    def _over_items(reducer: str, element: ast.AST, items: ast.AST) -> ast.Call:
+        generator = ast.GeneratorExp(elt=element, generators=[ast.comprehension(
+            target=ast.Name(id="_item", ctx=ast.Store()), iter=items, ifs=[], is_async=0
+        )])
+        return ast.Call(func=ast.Name(id=reducer, ctx=ast.Load()), args=[generator], keywords=[])
+
+
+class _BucketCompiler:
+    """
+    Emits the Python source of one bucket's scoring function. Every rule is
+    resolved at compile time: variables become locals, keyword tables are
+    unrolled into inline `in` checks, and bands become a bisect over a
+    constant tuple plus a score lookup table.
+    """
+
+    def __init__(self, bucket: str, spec: Dict[str, Any], namespace: Dict[str, Any]):
+        self.bucket = bucket
+        self.spec = spec
+        self.namespace = namespace
+        self.lines: List[str] = []
+        self.variables: Dict[str, str] = {}
+        self._counter = 0
+
+    def _fresh(self, prefix: str) -> str:
+        self._counter += 1
+        return f"_{prefix}_{self.bucket}_{self._counter}"
+
+    def _constant(self, value: Any) -> str:
+        name = self._fresh("k")
+        self.namespace[name] = value
+        return name
+
+    def expr(self, source: Any, where: str, scope: Optional[Dict[str, str]] = None) -> str:
+        if isinstance(source, bool) or not isinstance(source, (int, float, str)):
+            raise RulesError(f"{where}: expected a number or an expression, got {source!r}")
+        if not isinstance(source, str):
+            return repr(source)
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise RulesError(f"{where}: invalid expression {source!r}: {e.msg}")
+        names = {**self.variables, **(scope or {})}
+        for node in ast.walk(tree):
+            if not isinstance(node, ALLOWED_NODES):
+                raise RulesError(f"{where}: {type(node).__name__} is not allowed in {source!r}")
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                    raise RulesError(f"{where}: only {', '.join(sorted(FUNCTIONS))} may be called in {source!r}")
+                if node.func.id in ("total", "contains_any", "field") and len(node.args) != 2:
+                    raise RulesError(f"{where}: {node.func.id}() takes two arguments in {source!r}")
+            elif isinstance(node, ast.Name) and node.id not in names and node.id not in FUNCTIONS:
+                raise RulesError(f"{where}: unknown name {node.id!r} in {source!r}")
+            elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str, type(None))):
+                raise RulesError(f"{where}: unsupported constant in {source!r}")
+        rewritten = ast.fix_missing_locations(_Rewriter(names).visit(tree))
+        return f"({ast.unparse(rewritten.body)})"
+
+    def emit(self, line: str, indent: int):
+        self.lines.append("    " * indent + line)
+
+    def node(self, spec: Any, target: str, indent: int, where: str, scope: Optional[Dict[str, str]] = None):
+        """Emit code that assigns the score node `spec` to `target`"""
+        if not isinstance(spec, dict):
+            self.emit(f"{target} = {self.expr(spec, where, scope)}", indent)
+        elif "cases" in spec:
+            cases = spec["cases"]
+            if not isinstance(cases, list) or not cases or "default" not in spec:
+                raise RulesError(f"{where}: cases needs a non-empty list and a default")
+            for i, case in enumerate(cases):
+                if not isinstance(case, dict) or set(case) != {"when", "score"}:
+                    raise RulesError(f"{where}.cases[{i}]: expected exactly 'when' and 'score'")
+                keyword_ = "if" if i == 0 else "elif"
+                self.emit(f"{keyword_} {self.expr(case['when'], f'{where}.cases[{i}].when', scope)}:", indent)
+                self.node(case["score"], target, indent + 1, f"{where}.cases[{i}].score", scope)
+            self.emit("else:", indent)
+            self.node(spec["default"], target, indent + 1, f"{where}.default", scope)
+        elif "bands" in spec:
+            self.bands(spec["bands"], target, indent, f"{where}.bands", scope)
+        elif "adjust" in spec:
+            self.node(spec["adjust"], target, indent, f"{where}.adjust", scope)
+            rules = spec.get("rules") or []
+            inner = {**(scope or {}), "score": target}
+            for i, rule in enumerate(rules):
+                if not isinstance(rule, dict) or set(rule) != {"when", "score"}:
+                    raise RulesError(f"{where}.rules[{i}]: expected exactly 'when' and 'score'")
+                keyword_ = "if" if i == 0 else "elif"
+                self.emit(f"{keyword_} {self.expr(rule['when'], f'{where}.rules[{i}].when', inner)}:", indent)
+                self.emit(f"{target} = {self.expr(rule['score'], f'{where}.rules[{i}].score', inner)}", indent + 1)
+        else:
+            raise RulesError(f"{where}: expected a number, an expression, cases, bands or adjust")
+
+    def bands(self, spec: Dict[str, Any], target: str, indent: int, where: str, scope: Optional[Dict[str, str]]):
+        below, scores = spec.get("below"), spec.get("scores")
+        if not isinstance(below, list) or not all(isinstance(b, (int, float)) and not isinstance(b, bool) for b in below):
+            raise RulesError(f"{where}.below: expected a list of numbers")
+        if any(a >= b for a, b in zip(below, below[1:])):
+            raise RulesError(f"{where}.below: bounds must be strictly increasing")
+        if not isinstance(scores, list) or len(scores) != len(below) + 1:
+            raise RulesError(f"{where}.scores: expected {len(below) + 1} scores for {len(below)} bounds")
+
+        value = self._fresh("value")
+        index = self._fresh("band")
+        inner = {**(scope or {}), "value": value}
+        self.emit(f"{value} = {self.expr(spec.get('of'), f'{where}.of', scope)}", indent)
+        self.emit(f"{index} = _bisect({self._constant(tuple(below))}, {value})", indent)
+
+        # Constant scores come from a lookup table; expression scores get a branch each
+        table = tuple(score if isinstance(score, (int, float)) and not isinstance(score, bool) else None for score in scores)
+        computed = [(i, score) for i, score in enumerate(scores) if table[i] is None]
+        for n, (i, score) in enumerate(computed):
+            self.emit(f"{'if' if n == 0 else 'elif'} {index} == {i}:", indent)
+            self.emit(f"{target} = {self.expr(score, f'{where}.scores[{i}]', inner)}", indent + 1)
+        if len(computed) < len(scores):
+            lookup = f"{target} = {self._constant(table)}[{index}]"
+            if computed:
+                self.emit("else:", indent)
+                self.emit(lookup, indent + 1)
+            else:
+                self.emit(lookup, indent)
+
+    def text(self, spec: Dict[str, Any], target: str, where: str):
+        keywords = spec.get("keywords") or {}
+        if not isinstance(keywords, dict):
+            raise RulesError(f"{where}.keywords: expected a mapping of keyword -> weight")
+        for name in ("base", "scale", "min", "max"):
+            if not isinstance(spec.get(name), (int, float)) or isinstance(spec.get(name), bool):
+                raise RulesError(f"{where}.{name}: expected a number")
+        self.emit('_summary = data.get("summary", "").lower()', 1)
+        terms = []
+        for word, weight in keywords.items():
+            if not isinstance(weight, (int, float)) or isinstance(weight, bool):
+                raise RulesError(f"{where}.keywords.{word}: expected a number")
+            terms.append(f"({weight!r} if {str(word).lower()!r} in _summary else 0)")
+        adjustment = " + ".join(terms) or "0"
+        self.emit(f"{target} = max({spec['min']!r}, min({spec['max']!r}, {spec['base']!r} + ({adjustment}) * {spec['scale']!r}))", 1)
+
+    def compile(self) -> str:
+        spec = self.spec
+        where = f"buckets.{self.bucket}"
+        if not isinstance(spec, dict) or "numeric" not in spec or "text" not in spec:
+            raise RulesError(f"{where}: needs 'numeric' and 'text'")
+        for name in ("numeric_weight", "text_weight"):
+            if not isinstance(spec.get(name), (int, float)) or isinstance(spec.get(name), bool):
+                raise RulesError(f"{where}.{name}: expected a number")
+
+        self.emit(f"def _score_{self.bucket}(data):", 0)
+        for name, source in (spec.get("variables") or {}).items():
+            if not str(name).isidentifier() or keyword.iskeyword(name) or name in RESERVED_NAMES or name in FUNCTIONS:
+                raise RulesError(f"{where}.variables: {name!r} is not a usable variable name")
+            code = self.expr(source, f"{where}.variables.{name}")
+            self.variables[name] = f"v_{name}"
+            self.emit(f"v_{name} = {code}", 1)
+        self.node(spec["numeric"], "_numeric", 1, f"{where}.numeric")
+        self.text(spec["text"], "_text", f"{where}.text")
+        self.emit(
+            f"return round(min(100, max(0, _numeric * {spec['numeric_weight']!r} + _text * {spec['text_weight']!r})))", 1
+        )
+        return "\n".join(self.lines)
+
+
+class CompiledRules:
+    """
+    A loaded rules file compiled into one generated function per bucket and a
+    `bucket_scores` entry point. Immutable once built, so a reload is a single
+    reference swap and in-flight requests keep the rules they started with.
+    """
+
+    def __init__(self, spec: Dict[str, Any], origin: str = "<rules>"):
+        if not isinstance(spec, dict):
+            raise RulesError("rules file must be a mapping")
+        buckets = spec.get("buckets")
+        weights = spec.get("weights")
+        if not isinstance(buckets, dict) or not buckets:
+            raise RulesError("'buckets' must be a non-empty mapping")
+        if not isinstance(weights, dict) or set(weights) != set(buckets):
+            raise RulesError("'weights' must have exactly one entry per bucket")
+        for name in buckets:
+            if not str(name).isidentifier():
+                raise RulesError(f"buckets: {name!r} is not a valid bucket name")
+        thresholds = spec.get("thresholds") or {}
+        for name, value in [*weights.items(), *thresholds.items()]:
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise RulesError(f"{name}: expected a number, got {value!r}")
+
+        self.version = spec.get("version")
+        self.origin = origin
+        self.weights: Dict[str, float] = dict(weights)
+        self.thresholds: Dict[str, float] = dict(thresholds)
+        self.bucket_names: Tuple[str, ...] = tuple(buckets)
+
+        namespace: Dict[str, Any] = {"__builtins__": SAFE_BUILTINS, "_bisect": bisect_right}
+        sources = [_BucketCompiler(name, buckets[name], namespace).compile() for name in self.bucket_names]
+        sources.append("def bucket_scores(analysis):\n    return {\n" + "".join(
+            f"        {name!r}: _score_{name}(analysis[{name!r}]),\n" for name in self.bucket_names
+        ) + "    }")
+        self.source = "\n\n".join(sources)
+        exec(compile(self.source, f"<scoring rules {origin}>", "exec"), namespace)
+        self.bucket_scores: Callable[[Dict[str, Any]], Dict[str, float]] = namespace["bucket_scores"]
+        self._scorers = {name: namespace[f"_score_{name}"] for name in self.bucket_names}
+
+    def score_bucket(self, bucket: str, data: Dict[str, Any]) -> float:
+        return self._scorers[bucket](data)
+
+
+def load_rules(path: str) -> CompiledRules:
+    """Read a YAML (or .json) rules file and compile it"""
+    with open(path) as f:
+        spec = json.load(f) if path.endswith(".json") else yaml.safe_load(f)
+    return CompiledRules(spec, origin=path)
+
+
+class RulesRegistry:
+    """
+    Holds the live CompiledRules for a file. The file's mtime/size is checked
+    at most every `reload_interval` seconds; a changed file is compiled off to
+    the side and swapped in only if it compiles, so a bad edit never takes
+    scoring down.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._rules: Optional[CompiledRules] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> CompiledRules:
+        now = time.monotonic()
+        if self._rules is None or now - self._checked >= self.reload_interval:
+            self._refresh(now)
+        return self._rules
+
+    def reload(self) -> CompiledRules:
+        """Check the file now, regardless of the interval"""
+        self._refresh(time.monotonic(), force=True)
+        return self._rules
+
+    def _refresh(self, now: float, force: bool = False):
+        with self._lock:
+            if not force and self._rules is not None and now - self._checked < self.reload_interval:
+                return  # another thread just checked
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                if self._rules is None:
+                    raise RulesError(f"Scoring rules not found at {self.path}: {e}")
+                print(f"Keeping previous scoring rules; cannot stat {self.path}: {e}")
+                return
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamp and self._rules is not None:
+                return
+            try:
+                rules = load_rules(self.path)
+            except Exception as e:
+                if self._rules is None:
+                    raise RulesError(f"Scoring rules at {self.path} failed to load: {e}")
+                print(f"Keeping previous scoring rules; {self.path} failed to load: {e}")
+                self._stamp = stamp  # don't retry until the file changes again
+                return
+            self._rules, self._stamp = rules, stamp
+            print(f"Loaded scoring rules from {self.path} (version {rules.version})")
+
+
+_registry: Optional[RulesRegistry] = None
+
+
+def get_rules_registry() -> RulesRegistry:
+    global _registry
+    if _registry is None:
+        _registry = RulesRegistry(config.SCORING_RULES_PATH, config.SCORING_RULES_RELOAD_INTERVAL)
+    return _registry
+
+
+def get_scoring_rules() -> CompiledRules:
+    return get_rules_registry().current()
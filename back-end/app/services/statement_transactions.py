@@ -0,0 +1,115 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models.transaction_table import TransactionTable, TransactionTableBuilder
+from ..utils.date_inference import parse_dates
+from ..utils.textract_index import TextractTable
+
+AMOUNT_TOKEN = re.compile(r"^\(?(-)?\$?\s?([\d,]+\.\d{2})\)?\s?(CR|DR|Cr|Dr)?(-)?$")
+YEAR = re.compile(r"\b(19|20)\d{2}\b")
+BALANCE_ROW = re.compile(r"opening balance|closing balance|brought forward|carried forward|balance b/?f", re.IGNORECASE)
+
+
+def parse_amount_cents(token: str) -> Optional[Tuple[int, Optional[str]]]:
+    """'$1,234.56 CR' -> (123456, 'CR'); parentheses and minus signs make it negative"""
+    match = AMOUNT_TOKEN.match(token.strip())
+    if not match:
+        return None
+    cents = int(match.group(2).replace(",", "").replace(".", ""))
+    if match.group(1) or match.group(4) or token.strip().startswith("("):
+        cents = -cents
+    marker = match.group(3).upper() if match.group(3) else None
+    return cents, marker
+
+
+def _markdown_tables(content: str) -> List[List[List[str]]]:
+    """Pipe tables in LlamaParse markdown, as grids (separator rows removed)"""
+    tables, grid = [], []
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("|") and line.endswith("|"):
+            cells = [cell.strip() for cell in line.strip("|").split("|")]
+            if not all(re.fullmatch(r":?-{2,}:?", cell) for cell in cells if cell):
+                grid.append(cells)
+        elif grid:
+            tables.append(grid)
+            grid = []
+    if grid:
+        tables.append(grid)
+    return tables
+
+
+def _raw_rows(parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rows as {date, description, amounts} from text-layer tables and OCR markdown"""
+    rows = []
+    for document in parsed_data.get("documents", []):
+        if document.get("tables"):
+            for table in document["tables"]:
+                rows.extend(table.get("rows", []))
+            continue
+        for grid in _markdown_tables(document.get("content", "")):
+            width = max(len(row) for row in grid)
+            grid = [row + [""] * (width - len(row)) for row in grid]
+            for record in TextractTable(0, None, grid, header_rows=[0]).records():
+                amounts = [record["amount"]] + ([record["balance"]] if record.get("balance") else [])
+                rows.append({"date": record["date"], "description": record["description"], "amounts": amounts})
+    return rows
+
+
+def _default_year(dates: List[str]) -> Optional[int]:
+    for value in dates:
+        match = YEAR.search(value)
+        if match:
+            return int(match.group(0))
+    return None
+
+
+def transactions_from_parsed(parsed_data: Dict[str, Any]) -> TransactionTable:
+    """
+    Rebuild signed transactions from DocumentParser output. When a row has a
+    running balance, the sign comes from the balance movement; otherwise from
+    CR/DR markers, defaulting to a debit. Opening/closing balance rows and
+    rows with unparseable dates or amounts are skipped.
+    """
+    rows = _raw_rows(parsed_data)
+    date_strings = [row.get("date", "") for row in rows]
+    dates = parse_dates(date_strings, default_year=_default_year(date_strings))
+    epoch_days = dates.epoch_days()
+
+    builder = TransactionTableBuilder()
+    previous_balance: Optional[int] = None
+    previous_day: Optional[int] = None
+    for index, row in enumerate(rows):
+        parsed = [parse_amount_cents(token) for token in row.get("amounts", [])]
+        parsed = [value for value in parsed if value is not None]
+        if not parsed:
+            continue
+        if BALANCE_ROW.search(row.get("description", "")):
+            previous_balance = parsed[-1][0]
+            continue
+        if not dates.valid[index]:
+            continue
+
+        amount, marker = parsed[0]
+        balance = parsed[-1][0] if len(parsed) > 1 else None
+        if balance is not None and parsed[-1][1] == "DR":
+            balance = -abs(balance)
+        if balance is not None and previous_balance is not None and abs(abs(balance - previous_balance) - abs(amount)) <= 1:
+            amount = balance - previous_balance
+        elif marker == "CR":
+            amount = abs(amount)
+        elif amount > 0:
+            amount = -amount
+        if balance is not None:
+            previous_balance = balance
+
+        day = int(epoch_days[index])
+        if previous_day is not None and previous_day - day > 180 and not YEAR.search(date_strings[index]):
+            day += 365  # "01 Jan" after "31 Dec" on a statement that only prints the year once
+        previous_day = day
+
+        builder.append(
+            day, row.get("description", "").strip(), amount,
+            "credit" if amount > 0 else "debit", balance or 0
+        )
+    return builder.build()
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by one slot per window of fast successes and
+    halves on failures or when latency overshoots the target.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: Optional[float] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.latency_target = latency_target
+        self._in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def slot(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+        started = time.monotonic()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self._record(succeeded, time.monotonic() - started)
+            async with condition:
+                self._in_flight -= 1
+                condition.notify_all()
+
+    def _record(self, succeeded: bool, latency: float):
+        slow = self.latency_target is not None and latency > self.latency_target
+        if succeeded and not slow:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        else:
+            self.limit = max(self.minimum, self.limit / 2)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ..core import config
+from .metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter("result_cache_requests_total", "Result cache lookups by namespace and outcome")
+
+
+def content_key(*parts: str) -> str:
+    """Stable key for content-addressed entries"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Namespaced cache for JSON-serializable pipeline results"""
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any):
+        raise NotImplementedError
+
+    def _record(self, namespace: str, hit: bool):
+        CACHE_REQUESTS.inc(namespace=namespace, outcome="hit" if hit else "miss")
+
+
+class MemoryCache(ResultCache):
+    """
+    In-process LRU. Values are stored serialized so callers can mutate what
+    they get back without corrupting the cache.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry_key = f"{namespace}:{key}"
+        with self._lock:
+            raw = self._entries.get(entry_key)
+            if raw is not None:
+                self._entries.move_to_end(entry_key)
+        self._record(namespace, raw is not None)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, namespace: str, key: str, value: Any):
+        raw = json.dumps(value)
+        with self._lock:
+            self._entries[f"{namespace}:{key}"] = raw
+            self._entries.move_to_end(f"{namespace}:{key}")
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache(ResultCache):
+    """
+    Cache in a local SQLite file in WAL mode, shared by every worker process
+    on the host: a page parsed or a chunk analyzed by one worker is a hit for
+    the others. Oldest entries are pruned past `max_entries`.
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock, self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_cache_stored_at ON cache_entries (stored_at)")
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        self._record(namespace, row is not None)
+        return json.loads(zlib.decompress(row[0])) if row is not None else None
+
+    def set(self, namespace: str, key: str, value: Any):
+        blob = zlib.compress(json.dumps(value).encode("utf-8"), 6)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?)", (namespace, key, blob, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self):
+        excess = self._connection.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM cache_entries WHERE stored_at <= "
+                "(SELECT stored_at FROM cache_entries ORDER BY stored_at LIMIT 1 OFFSET ?)", (excess - 1,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Process-wide cache: in memory for a single worker, in the shared SQLite
+    file when several workers serve the app (RESULT_CACHE_BACKEND=auto)
+    """
+    global _result_cache
+    if _result_cache is None:
+        backend = config.RESULT_CACHE_BACKEND
+        if backend == "auto":
+            backend = "sqlite" if config.WEB_CONCURRENCY > 1 else "memory"
+        if backend == "sqlite":
+            _result_cache = SQLiteCache(config.RESULT_CACHE_PATH, config.RESULT_CACHE_MAX_ENTRIES)
+        else:
+            _result_cache = MemoryCache(config.RESULT_CACHE_MAX_ENTRIES)
+    return _result_cache
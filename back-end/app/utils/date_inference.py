@@ -0,0 +1,267 @@
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MONTHS = {name: i + 1 for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+)}
+NAT = np.datetime64("NaT", "D")
+_DIGITS_TO_SPACE = bytes(c if 48 <= c <= 57 else 32 for c in range(256))
+
+
+class DateFormat:
+    """
+    One date layout: a compiled regex with named groups y/m/d (or `mon` for
+    month names). Day-first and month-first numeric layouts are separate
+    formats that share a shape; inference decides between them.
+    """
+
+    def __init__(self, name: str, pattern: str, day_first: Optional[bool] = None):
+        self.name = name
+        self.regex = re.compile(f"^{pattern}$")
+        # One match per line over the joined column: the layout, or any text
+        self.column_regex = re.compile(rf"^[ \t]*(?:{pattern})[ \t]*$|^.*$", re.MULTILINE)
+        self.day_first = day_first
+        self.has_year = "?P<y>" in pattern
+        self.year_digits = (4,) if r"(?P<y>\d{4})" in pattern else (2, 4)
+        self.numeric = "?P<mon>" not in pattern
+        self.field_order = [name for name, _ in sorted(self.regex.groupindex.items(), key=lambda item: item[1])
+                            if name in ("y", "m", "d")]
+
+    def fields(self, value: str) -> Optional[Tuple[int, int, int]]:
+        """(year, month, day) or None; year is 0 when the layout has none"""
+        match = self.regex.match(value)
+        if not match:
+            return None
+        groups = match.groupdict()
+        if groups.get("mon") is not None:
+            month = MONTHS.get(groups["mon"][:3].lower())
+            if month is None:
+                return None
+        else:
+            month = int(groups["m"])
+        year = int(groups["y"]) if groups.get("y") else 0
+        if groups.get("y") and len(groups["y"]) == 2:
+            year += 2000 if year < 69 else 1900  # strptime's %y pivot
+        return year, month, int(groups["d"])
+
+    def numeric_column_fields(self, values: Sequence[str]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Fast path for all-numeric columns where every row has the same
+        separators (the common case for one statement): the joined column is
+        checked by its separator skeleton and parsed by np.fromstring with no
+        per-row Python work. Rows whose digit counts the layout would not
+        match come back as zeros, as in `column_fields`. None when the column
+        does not qualify.
+        """
+        if not self.numeric or not values or not all(values):
+            return None
+        text = "\n".join(values).encode("ascii", "replace")
+        skeleton = text.translate(None, b"0123456789 \t")
+        first = values[0].encode("ascii", "replace").translate(None, b"0123456789 \t")
+        if not first or skeleton != b"\n".join([first] * len(values)):
+            return None
+        per_row = len(first) + 1
+        if per_row not in (2, 3) or (per_row == 3) != self.has_year:
+            return None
+        numbers = np.fromstring(text.translate(_DIGITS_TO_SPACE), dtype=np.int64, sep=" ")
+        if numbers.size != per_row * len(values):
+            return None
+        numbers = numbers.reshape(len(values), per_row)
+        # Length of every digit run, in the same order as `numbers`
+        digit = np.frombuffer(text, dtype=np.uint8)
+        digit = np.concatenate(([False], (digit >= 48) & (digit <= 57), [False]))
+        edges = np.flatnonzero(digit[1:] != digit[:-1])
+        lengths = (edges[1::2] - edges[::2]).reshape(len(values), per_row)
+
+        order = self.field_order if per_row == 3 else [name for name in self.field_order if name != "y"]
+        fields = {name: numbers[:, position] for position, name in enumerate(order)}
+        digits = {name: lengths[:, position] for position, name in enumerate(order)}
+        matched = (digits["m"] <= 2) & (digits["d"] <= 2)
+        years = fields.get("y", np.zeros(len(values), dtype=np.int64))
+        if "y" in digits:
+            matched &= np.isin(digits["y"], self.year_digits)
+            years = np.where(digits["y"] == 2, years + np.where(years < 69, 2000, 1900), years)
+        return tuple(np.where(matched, column, 0) for column in (years, fields["m"], fields["d"]))
+
+    def column_fields(self, values: Sequence[str]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Vectorized `fields` for a whole column: a single findall over the
+        joined text (one C-level pass), then integer conversion in NumPy.
+        Rows that do not match come back as zeros. None if the column cannot
+        be joined line-for-line (embedded newlines).
+        """
+        text = "\n".join(value or "" for value in values)
+        found = self.column_regex.findall(text)
+        if len(found) != len(values):
+            return None
+        if not found:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        columns = np.array(found, dtype=str).reshape(len(found), -1)
+        index = {name: position - 1 for name, position in self.column_regex.groupindex.items()}
+
+        def numbers(name: str) -> np.ndarray:
+            column = columns[:, index[name]]
+            return np.where(column == "", "0", column).astype(np.int64)
+
+        days = numbers("d")
+        if "mon" in index:
+            names, inverse = np.unique(np.char.lower(columns[:, index["mon"]]), return_inverse=True)
+            lookup = np.array([MONTHS.get(name[:3], 0) for name in names], dtype=np.int64)
+            months = lookup[inverse]
+        else:
+            months = numbers("m")
+        if "y" in index:
+            years = numbers("y")
+            short = np.char.str_len(columns[:, index["y"]]) == 2
+            years = np.where(short, years + np.where(years < 69, 2000, 1900), years)
+        else:
+            years = np.zeros(len(found), dtype=np.int64)
+        return years, months, days
+
+    def __repr__(self) -> str:
+        return f"DateFormat({self.name!r})"
+
+
+_NUMERIC = r"(?P<{a}>\d{{1,2}})(?P<sep>[/.-])(?P<{b}>\d{{1,2}})(?:(?P=sep)(?P<y>\d{{4}}|\d{{2}}))?"
+FORMATS: List[DateFormat] = [
+    DateFormat("YYYY-MM-DD", r"(?P<y>\d{4})[/.-](?P<m>\d{1,2})[/.-](?P<d>\d{1,2})"),
+    DateFormat("MM/DD/YYYY", _NUMERIC.format(a="m", b="d"), day_first=False),
+    DateFormat("DD/MM/YYYY", _NUMERIC.format(a="d", b="m"), day_first=True),
+    DateFormat("DD Mon YYYY", r"(?P<d>\d{1,2})[ -](?P<mon>[A-Za-z]{3,9})\.?(?:[ -]+(?P<y>\d{4}|\d{2}))?", day_first=True),
+    DateFormat("Mon DD, YYYY", r"(?P<mon>[A-Za-z]{3,9})\.? (?P<d>\d{1,2})(?:,? (?P<y>\d{4}))?", day_first=False),
+]
+
+
+class DateParseResult:
+    def __init__(self, dates: np.ndarray, date_format: Optional[DateFormat], unparseable: List[Tuple[int, str]]):
+        self.dates = dates  # datetime64[D], NaT where unparseable
+        self.format = date_format
+        self.unparseable = unparseable  # (row index, raw value)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def valid(self) -> np.ndarray:
+        return ~np.isnat(self.dates)
+
+    def epoch_days(self) -> np.ndarray:
+        """int64 days since 1970-01-01; unparseable rows are the NaT sentinel"""
+        return self.dates.astype(np.int64)
+
+    def date(self, row: int) -> Optional[date]:
+        value = self.dates[row]
+        return None if np.isnat(value) else value.astype(date)
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "format": self.format.name if self.format else None,
+            "parsed": int(self.valid.sum()),
+            "unparseable": len(self.unparseable),
+        }
+
+
+def _plausible(fields: Optional[Tuple[int, int, int]]) -> bool:
+    return fields is not None and 1 <= fields[1] <= 12 and 1 <= fields[2] <= 31
+
+
+def _order_violations(fields: List[Tuple[int, int, int]]) -> int:
+    """Statements run in date order; count steps that go backwards"""
+    keys = [(y, m, d) for y, m, d in fields]
+    return sum(1 for a, b in zip(keys, keys[1:]) if b < a)
+
+
+def infer_format(values: Sequence[str], sample_size: int = 200) -> Optional[DateFormat]:
+    """
+    Pick the one layout that fits a column. Scores each candidate on an evenly
+    spaced sample; day-first vs month-first ties (every day <= 12) go to the
+    reading that keeps the sample in chronological order, then month-first.
+    """
+    present = [value.strip() for value in values if value and value.strip()]
+    if not present:
+        return None
+    step = max(1, len(present) // sample_size)
+    sample = present[::step][:sample_size]
+
+    best, best_key = None, None
+    for position, candidate in enumerate(FORMATS):
+        fields = [candidate.fields(value) for value in sample]
+        hits = [f for f in fields if _plausible(f)]
+        if not hits:
+            continue
+        key = (len(hits), -_order_violations(hits), -position)
+        if best_key is None or key > best_key:
+            best, best_key = candidate, key
+    return best
+
+
+def _to_datetime64(years: np.ndarray, months: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Vectorized (y, m, d) -> datetime64[D]; impossible dates become NaT"""
+    month_start = (years - 1970) * 12 + (months - 1)
+    first = month_start.astype("datetime64[M]").astype("datetime64[D]")
+    next_first = (month_start + 1).astype("datetime64[M]").astype("datetime64[D]")
+    month_length = (next_first - first).astype(np.int64)
+    ok = (months >= 1) & (months <= 12) & (days >= 1) & (days <= month_length)
+    result = first + (days - 1).astype("timedelta64[D]")
+    result[~ok] = NAT
+    return result
+
+
+def parse_dates(
+    values: Sequence[str],
+    date_format: Optional[DateFormat] = None,
+    default_year: Optional[int] = None
+) -> DateParseResult:
+    """
+    Parse a whole date column with one inferred (or given) format. The column
+    is matched in one pass by a precompiled regex; validation and the
+    conversion to datetime64 run over NumPy arrays. Rows that do not parse are
+    reported in `unparseable` rather than dropped.
+    """
+    date_format = date_format or infer_format(values)
+    count = len(values)
+    if date_format is None:
+        return DateParseResult(np.full(count, NAT), None, [(i, v) for i, v in enumerate(values)])
+
+    columns = date_format.numeric_column_fields(values)
+    if columns is None:
+        columns = date_format.column_fields(values)
+    if columns is None:
+        years = np.zeros(count, dtype=np.int64)
+        months = np.zeros(count, dtype=np.int64)
+        days = np.zeros(count, dtype=np.int64)
+        for i, value in enumerate(values):
+            fields = date_format.fields(value.strip()) if value else None
+            if fields is not None:
+                years[i], months[i], days[i] = fields
+    else:
+        years, months, days = columns
+
+    # Layouts without a year (e.g. "01 Dec") take the statement year
+    years = np.where(years == 0, default_year or datetime.now().year, years)
+    dates = _to_datetime64(years, months, days)
+    unparseable = [(int(i), values[i]) for i in np.flatnonzero(np.isnat(dates))]
+    return DateParseResult(dates, date_format, unparseable)
+
+
+def parse_date_value(value: str, hint: Optional[DateFormat] = None) -> Tuple[Optional[date], Optional[DateFormat]]:
+    """
+    Single-value parse that reuses the caller's last format before inferring
+    a new one. Returns (date or None, format to pass as the next hint).
+    """
+    value = value.strip()
+    candidates = [hint] if hint is not None else []
+    candidates.append(None)  # placeholder: infer only if the hint misses
+    for candidate in candidates:
+        candidate = candidate or infer_format([value])
+        fields = candidate.fields(value) if candidate is not None else None
+        if fields is not None:
+            try:
+                return date(fields[0] or datetime.now().year, fields[1], fields[2]), candidate
+            except ValueError:
+                pass
+    return None, hint
@@ -0,0 +1,84 @@
+from typing import List, Optional, Tuple
+
+
+class JSONSectionStream:
+    """
+    Incremental scanner for a streamed JSON object. `feed` takes the next
+    piece of text and returns (key, raw value text) for every top-level member
+    whose value was closed by it, so each section can be parsed and used
+    before the rest of the document has arrived. Text before the opening
+    brace (prose, ``` fences) is skipped. Every character is scanned once.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        self._text += text
+        closed = []
+        text, i = self._text, self._position
+        while i < len(text) and not self.done:
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None and self._key is None and self._value_start is None:
+                        self._key = text[self._key_start + 1:i]
+                i += 1
+                continue
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                i += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._key is not None and self._value_start is not None:
+                    # An object/array section is complete at its closing bracket
+                    closed.append((self._key, text[self._value_start:i + 1].strip()))
+                    self._key = self._key_start = self._value_start = None
+            elif char == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+
+            # A member ends at a comma or the closing brace at the top level
+            if self._depth == 1 and char == "," or self._depth == 0:
+                if self._key is not None and self._value_start is not None:
+                    raw = text[self._value_start:i].strip()
+                    if raw:
+                        closed.append((self._key, raw))
+                self._key = self._key_start = self._value_start = None
+                if self._depth == 0:
+                    self.done = True
+            i += 1
+
+        # Drop text no open member can still need
+        keep = min(p for p in (self._key_start, self._value_start, i) if p is not None)
+        self._text = text[keep:]
+        self._position = i - keep
+        if self._key_start is not None:
+            self._key_start -= keep
+        if self._value_start is not None:
+            self._value_start -= keep
+        return closed
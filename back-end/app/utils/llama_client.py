@@ -1,59 +1,415 @@
-from typing import Dict, Any, Optional
-import os
-import aiohttp
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+import asyncio
+import time
 import json
+import aiohttp
 from fastapi import HTTPException
-from dotenv import load_dotenv
+from ..core import config
+from .llm_backends import BackendError, CompletionBackend, get_completion_backend
+from .model_router import STAGE_ANALYSIS, ModelRouter, StageRoute, get_model_router, record_route
+from .token_accounting import (
+    LLM_PROMPT_BUDGET,
+    TokenReservation,
+    compact_prompt,
+    current_ledger,
+    prompt_tokens,
+    record_usage,
+)
+from .request_profiler import profile_span
+from .tracing import SPAN_KIND_CLIENT, current_span, get_tracer
+from .rate_limiter import (
+    PRIORITY_ANALYSIS,
+    get_admission_controller,
+    parse_retry_after,
+)
+from .retry_policy import (
+    LatencyTracker,
+    RetryableError,
+    RetryPolicy,
+    get_latency_tracker,
+    hedge_delay,
+    hedged,
+    is_retryable_status,
+)
+
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a financial analyst expert. Analyze the provided financial data and return structured "
+    "JSON responses with detailed insights and numerical scores."
+)
+
+
+class LlamaRateLimitError(HTTPException):
+    """Raised when the provider keeps answering 429 after all backoff attempts"""
+
+    def __init__(self, retry_after: float, detail: str):
+        super().__init__(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+        self.retry_after = retry_after
 
-load_dotenv()
 
 class LlamaClient:
-    def __init__(self):
-        self.api_key = os.getenv("LLAMA_API_KEY")
-        self.api_base_url = "https://api.llama-api.com/chat/completions"
-        self.maverick_model = "llama4-maverick"  
+    def __init__(self, backend: Optional[CompletionBackend] = None, router: Optional[ModelRouter] = None):
+        self._backend = backend
+        self.router = router or get_model_router()
+        self.maverick_model = self.router.route(STAGE_ANALYSIS).model
+        self.admission = get_admission_controller()
+        self.retry_policy = RetryPolicy.from_config()
+
+    @property
+    def backend(self) -> CompletionBackend:
+        # Resolved per call so a swapped process-wide backend is picked up
+        return self._backend or get_completion_backend()
         
-    async def get_maverick_completion(self, prompt: str) -> Dict[str, Any]:
+    async def get_maverick_completion(
+        self,
+        prompt: str,
+        priority: int = PRIORITY_ANALYSIS,
+        system: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get completion from Llama-4-Maverick model (the analysis stage route)"""
+        return await self.get_completion(prompt, STAGE_ANALYSIS, priority, system)
+
+    async def get_completion(
+        self,
+        prompt: str,
+        stage: str = STAGE_ANALYSIS,
+        priority: int = PRIORITY_ANALYSIS,
+        system: Optional[str] = None
+    ) -> str:
         """
-        Get completion from Llama-4-Maverick model
+        Completion for one pipeline stage, on the model its route picks.
+        `system` is the static prompt prefix (see app/services/prompts.py);
+        `prompt` is the per-request part sent after it.
+
+        Calls go through the shared admission controller and the retry policy:
+        transient failures are retried with jittered backoff, 429s wait out the
+        Retry-After window, and the whole call is bounded by a deadline. When
+        the stage has a fallback model, the primary only gets the stage's
+        latency budget and no 429 waits: running over or being rate limited
+        moves the call to the fallback for the rest of the deadline.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
+        route = self.router.route(stage)
+        model, reason = self.router.choose(route)
+        fallback = route.fallback_model if model == route.model else None
+        started = time.monotonic()
+
+        with get_tracer().span("LlamaClient.get_completion", SPAN_KIND_CLIENT, attributes={
+            "llm.stage": stage, "llm.retry_count": 0, "llm.fallback_used": False
+        }) as span:
+            try:
+                content = await self._complete_within(
+                    prompt, system, route, model, priority,
+                    timeout=min(route.latency_budget, self.retry_policy.deadline) if fallback else self.retry_policy.deadline,
+                    wait_out_rate_limits=fallback is None
+                )
+            except HTTPException as e:
+                if fallback is None or e.status_code not in (429, 504):
+                    raise
+                reason = "rate_limited" if e.status_code == 429 else "over_budget"
+                print(f"Routing {stage} to {fallback} ({reason}): {e.detail}")
+                model = fallback
+                span.set_attribute("llm.fallback_used", True)
+                content = await self._complete_within(
+                    prompt, system, route, model, priority,
+                    timeout=max(0.0, self.retry_policy.deadline - (time.monotonic() - started))
+                )
+            span.set_attribute("llm.model", model)
+            span.set_attribute("llm.route_reason", reason)
+
+        record_route(stage, model, reason, time.monotonic() - started)
+        return content
+
+    async def _complete_within(
+        self,
+        prompt: str,
+        system: Optional[str],
+        route: StageRoute,
+        model: str,
+        priority: int,
+        timeout: float,
+        wait_out_rate_limits: bool = True
+    ) -> str:
+        payload = self._payload(prompt, model, route.max_tokens, system)
+        compacted, reservation = self._guard_prompt(route, payload)
+        estimated_tokens = self._estimate_tokens(payload, route)
+        try:
+            return await asyncio.wait_for(
+                self._complete_with_retries(
+                    payload, estimated_tokens, priority, wait_out_rate_limits, route.stage, compacted, reservation
+                ),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Llama API call exceeded its {timeout:.0f}s deadline"
+            )
+        finally:
+            if reservation is not None:
+                reservation.release()
+
+    def _payload(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> Dict[str, Any]:
         payload = {
-            "model": self.maverick_model,
+            "model": model or self.maverick_model,
             "messages": [
-                {"role": "system", "content": "You are a financial analyst expert. Analyze the provided financial data and return structured JSON responses with detailed insights and numerical scores."},
+                {"role": "system", "content": system or DEFAULT_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.2,  # Lower temperature for more consistent, analytical responses
             "response_format": {"type": "json_object"}  # Ensure JSON response
         }
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    def _estimate_tokens(self, payload: Dict[str, Any], route: StageRoute) -> int:
+        return prompt_tokens(payload) + min(route.max_tokens, config.LLM_EXPECTED_COMPLETION_TOKENS)
 
+    def _guard_prompt(self, route: StageRoute, payload: Dict[str, Any]) -> Tuple[bool, Optional[TokenReservation]]:
+        """
+        Budget guard, run before anything is sent: an oversized prompt has its
+        per-request part compacted (the static prefix is left alone) or is
+        refused with a 413, as is a call past the request's token budget.
+        Returns whether the prompt was compacted and the call's reservation
+        on the request's token ledger (None without a ledger), which the
+        caller must release when the call ends.
+        """
+        tokens = prompt_tokens(payload)
+        compacted = False
+        limit = route.max_prompt_tokens
+        if limit and tokens > limit:
+            if config.LLM_PROMPT_BUDGET_ACTION == "compact":
+                message = payload["messages"][-1]
+                message["content"] = compact_prompt(message["content"])
+                compacted = True
+                tokens = prompt_tokens(payload)
+            if tokens > limit:
+                LLM_PROMPT_BUDGET.inc(stage=route.stage, outcome="aborted")
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{route.stage} prompt of ~{tokens} tokens exceeds its {limit} token budget"
+                )
+            LLM_PROMPT_BUDGET.inc(stage=route.stage, outcome="compacted")
+            print(f"Compacted {route.stage} prompt to ~{tokens} tokens (budget {limit})")
+        ledger = current_ledger()
+        if ledger is None:
+            return compacted, None
+        return compacted, ledger.check_budget(route.stage, tokens + min(route.max_tokens, config.LLM_EXPECTED_COMPLETION_TOKENS))
+
+    async def stream_maverick_completion(
+        self,
+        prompt: str,
+        priority: int = PRIORITY_ANALYSIS,
+        stage: str = STAGE_ANALYSIS,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streamed variant of get_completion: yields content deltas as the model
+        produces them. Admission, 429 handling and retries match the blocking
+        call, except that a stream which already produced output is not
+        retried (the caller has consumed it); it fails with a 502 instead.
+        A 429 before any output moves the stream to the stage's fallback model.
+        Each chunk must arrive within the attempt timeout and the whole stream
+        within the deadline.
+        """
+        route = self.router.route(stage)
+        model, reason = self.router.choose(route)
+        payload = {**self._payload(prompt, model, route.max_tokens, system), "stream": True}
+        compacted, reservation = self._guard_prompt(route, payload)
+        estimated_tokens = self._estimate_tokens(payload, route)
+        tracker = get_latency_tracker(model)
+        started_stream = time.monotonic()
+        deadline = started_stream + self.retry_policy.deadline
+        # Not made current: the caller's code runs between our yields
+        span = get_tracer().start_span("LlamaClient.stream_maverick_completion", SPAN_KIND_CLIENT, attributes={
+            "llm.stage": stage, "llm.retry_count": 0, "llm.fallback_used": False
+        })
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_base_url}",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_detail = await response.text()
+            for attempt in range(self.retry_policy.max_retries + 1):
+                produced = False
+                try:
+                    async with self.admission.admit(estimated_tokens, priority, payload["model"]):
+                        started = time.monotonic()
+                        usage = None
+                        received = []
+                        chunks = self.backend.stream(payload).__aiter__()
+                        while True:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                raise HTTPException(
+                                    status_code=504,
+                                    detail=f"Llama API call exceeded its {self.retry_policy.deadline:.0f}s deadline"
+                                )
+                            try:
+                                chunk = await asyncio.wait_for(
+                                    chunks.__anext__(),
+                                    timeout=min(self.retry_policy.attempt_timeout, remaining)
+                                )
+                            except StopAsyncIteration:
+                                break
+                            usage = chunk.get("usage") or usage
+                            for choice in chunk.get("choices") or []:
+                                content = (choice.get("delta") or {}).get("content")
+                                if content:
+                                    produced = True
+                                    received.append(content)
+                                    yield content
+                        tracker.record(time.monotonic() - started)
+                        self.admission.reconcile(estimated_tokens, (usage or {}).get("total_tokens"))
+                        prompt_used, completion_used = record_usage(
+                            stage, payload, usage, "".join(received), compacted, reservation
+                        )
+                        record_route(stage, payload["model"], reason, time.monotonic() - started_stream)
+                        span.add("gen_ai.usage.input_tokens", prompt_used)
+                        span.add("gen_ai.usage.output_tokens", completion_used)
+                        span.set_attribute("llm.model", payload["model"])
+                        span.set_attribute("llm.route_reason", reason)
+                        return
+                except (HTTPException, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    failure = self._classify_failure(e, payload["model"])
+                    if (
+                        not produced and isinstance(failure, RetryableError) and failure.status_code == 429
+                        and route.fallback_model and payload["model"] == route.model
+                    ):
+                        print(f"Routing {stage} stream to {route.fallback_model} (rate_limited): {failure.detail}")
+                        payload["model"], reason = route.fallback_model, "rate_limited"
+                        span.set_attribute("llm.fallback_used", True)
+                        tracker = get_latency_tracker(route.fallback_model)
+                        continue
+                    if produced or not isinstance(failure, RetryableError):
+                        if isinstance(failure, RetryableError):
+                            raise HTTPException(status_code=502, detail=f"Llama API stream interrupted: {failure.detail}")
+                        raise failure
+                    if attempt >= self.retry_policy.max_retries:
                         raise HTTPException(
-                            status_code=response.status,
-                            detail=f"Llama API error: {error_detail}"
+                            status_code=failure.status_code,
+                            detail=f"Llama API error after {attempt + 1} attempts: {failure.detail}"
                         )
-                    
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"]
-                    
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error calling Llama API: {str(e)}"
+                    backoff = 0 if failure.status_code == 429 else self.retry_policy.backoff(attempt)
+                    print(f"Retrying Llama API stream in {backoff:.2f}s (attempt {attempt + 1}): {failure.detail}")
+                    span.add("llm.retry_count")
+                    await asyncio.sleep(backoff)
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            if reservation is not None:
+                reservation.release()
+            span.end()
+
+    def _classify_failure(self, e: Exception, model: Optional[str] = None) -> Exception:
+        """Map a backend/transport failure to RetryableError or a terminal HTTPException"""
+        if isinstance(e, BackendError):
+            if e.status_code == 429:
+                retry_after = parse_retry_after(e.retry_after, config.LLM_DEFAULT_RETRY_AFTER)
+                # Rate limits are per model: the window only holds back calls to this one
+                self.admission.penalize(retry_after, model)
+                return RetryableError(429, e.detail, retry_after)
+            if is_retryable_status(e.status_code):
+                return RetryableError(e.status_code, e.detail)
+            return HTTPException(
+                status_code=e.status_code,
+                detail=f"Llama API error: {e.detail}"
             )
+        if isinstance(e, asyncio.TimeoutError):
+            return RetryableError(504, f"attempt timed out after {self.retry_policy.attempt_timeout:.0f}s")
+        if isinstance(e, aiohttp.ClientError):
+            return RetryableError(502, f"connection error: {str(e)}")
+        return HTTPException(
+            status_code=500,
+            detail=f"Error calling Llama API: {str(e)}"
+        )
+
+    async def _complete_with_retries(
+        self,
+        payload: Dict[str, Any],
+        estimated_tokens: int,
+        priority: int,
+        wait_out_rate_limits: bool = True,
+        stage: str = STAGE_ANALYSIS,
+        compacted: bool = False,
+        reservation: Optional[TokenReservation] = None
+    ) -> str:
+        """Retry loop around (optionally hedged) completion attempts"""
+        tracker = get_latency_tracker(payload["model"])
+
+        for attempt in range(self.retry_policy.max_retries + 1):
+            # Never hedge into an active rate-limit window
+            delay = None if self.admission.is_rate_limited(payload["model"]) else hedge_delay(tracker)
+            try:
+                return await hedged(
+                    lambda: self._attempt_completion(
+                        payload, estimated_tokens, priority, tracker, stage, compacted, reservation
+                    ),
+                    delay=delay,
+                    is_valid=lambda content: isinstance(content, str) and bool(content.strip())
+                )
+            except RetryableError as e:
+                if attempt >= self.retry_policy.max_retries or (e.status_code == 429 and not wait_out_rate_limits):
+                    if e.status_code == 429:
+                        raise LlamaRateLimitError(
+                            e.retry_after or config.LLM_DEFAULT_RETRY_AFTER,
+                            f"Llama API rate limit exceeded: {e.detail}"
+                        )
+                    raise HTTPException(
+                        status_code=e.status_code,
+                        detail=f"Llama API error after {attempt + 1} attempts: {e.detail}"
+                    )
+                # 429s are already paced by the admission controller's Retry-After window
+                backoff = 0 if e.status_code == 429 else self.retry_policy.backoff(attempt)
+                print(f"Retrying Llama API call in {backoff:.2f}s (attempt {attempt + 1}): {e.detail}")
+                current_span().add("llm.retry_count")
+                await asyncio.sleep(backoff)
+
+    async def _attempt_completion(
+        self,
+        payload: Dict[str, Any],
+        estimated_tokens: int,
+        priority: int,
+        tracker: LatencyTracker,
+        stage: str = STAGE_ANALYSIS,
+        compacted: bool = False,
+        reservation: Optional[TokenReservation] = None
+    ) -> str:
+        """Single backend attempt, bounded by the per-attempt timeout"""
+        async with self.admission.admit(estimated_tokens, priority, payload["model"]):
+            started = time.monotonic()
+            try:
+                with profile_span("llm_request"):
+                    result = await asyncio.wait_for(
+                        self.backend.complete(payload),
+                        timeout=self.retry_policy.attempt_timeout
+                    )
+
+            except (HTTPException, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                raise self._classify_failure(e, payload["model"])
+
+            tracker.record(time.monotonic() - started)
+            usage = result.get("usage") or {}
+            self.admission.reconcile(estimated_tokens, usage.get("total_tokens"))
+            content = result["choices"][0]["message"]["content"]
+            # Every attempt that completes is billed, even a hedge whose result is dropped
+            prompt_used, completion_used = record_usage(stage, payload, usage, content, compacted, reservation)
+            span = current_span()
+            span.add("gen_ai.usage.input_tokens", prompt_used)
+            span.add("gen_ai.usage.output_tokens", completion_used)
+            return content
 
     async def validate_and_clean_response(self, response: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from ..core import config
+
+
+class BackendError(Exception):
+    """Non-200 answer from a completion backend"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[str] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class CompletionBackend:
+    """Transport for OpenAI-style chat completion payloads"""
+
+    name = "base"
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the full chat completion body (choices, usage, ...)"""
+        raise NotImplementedError
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield OpenAI-style `chat.completion.chunk` bodies (choices[0].delta,
+        and usage on the last one). Backends without streaming send the whole
+        completion as a single chunk.
+        """
+        result = await self.complete({k: v for k, v in payload.items() if k not in ("stream", "stream_options")})
+        yield {
+            "choices": [{"index": 0, "delta": {"content": result["choices"][0]["message"]["content"]}, "finish_reason": "stop"}],
+            "usage": result.get("usage"),
+        }
+
+    async def close(self):
+        pass
+
+
+class OpenAICompatibleBackend(CompletionBackend):
+    """
+    Any server exposing POST {base_url}/chat/completions: the hosted Llama API,
+    or a local vLLM / llama.cpp server.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str, api_key: Optional[str]):
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Pooled connections are reused across calls, but a session is bound to its loop
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession()
+            self._session_loop = loop
+        return self._session
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        async with self._get_session().post(self.url, headers=headers, json=payload) as response:
+            if response.status != 200:
+                raise BackendError(
+                    response.status,
+                    await response.text(),
+                    response.headers.get("Retry-After")
+                )
+            return await response.json()
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Server-sent events: one `data: {json}` line per chunk, ended by `data: [DONE]`"""
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+
+        async with self._get_session().post(self.url, headers=headers, json=payload) as response:
+            if response.status != 200:
+                raise BackendError(
+                    response.status,
+                    await response.text(),
+                    response.headers.get("Retry-After")
+                )
+            async for line in response.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue  # comments / keep-alives / event names
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    return
+                yield json.loads(data)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+def fixture_key(payload: Dict[str, Any]) -> str:
+    """Stable key for a request: model and messages only"""
+    canonical = json.dumps(
+        {"model": payload.get("model"), "messages": payload.get("messages")},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ReplayBackend(CompletionBackend):
+    """
+    Serves recorded completions from `<fixture_dir>/<fixture_key>.json`.
+    With a `record_to` backend, misses are forwarded and saved for next time.
+    """
+
+    name = "replay"
+
+    def __init__(self, fixture_dir: str, record_to: Optional[CompletionBackend] = None):
+        self.fixture_dir = fixture_dir
+        self.record_to = record_to
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        path = os.path.join(self.fixture_dir, f"{fixture_key(payload)}.json")
+        recorded = await asyncio.to_thread(self._load, path)
+        if recorded is not None:
+            return recorded
+
+        if self.record_to is None:
+            raise BackendError(404, f"No recorded completion for this prompt ({os.path.basename(path)})")
+
+        result = await self.record_to.complete(payload)
+        await asyncio.to_thread(self._save, path, result)
+        return result
+
+    def _load(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, path: str, result: Dict[str, Any]):
+        os.makedirs(self.fixture_dir, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+
+    async def close(self):
+        if self.record_to is not None:
+            await self.record_to.close()
+
+
+FAKE_ANALYSIS = {
+    "Cash Flow Analysis": {
+        "total_inflows": 18250.00,
+        "total_outflows": 16420.50,
+        "beginning_balance": 4210.35,
+        "ending_balance": 6039.85,
+        "summary": "Consistent and positive cash flow with a healthy surplus over the period."
+    },
+    "Expense Analysis": {
+        "major_expenses": [{"description": "Equipment purchase", "amount": 3200.00}],
+        "recurring_expenses": [
+            {"description": "Office rent", "amount": 2500.00},
+            {"description": "Payroll service", "amount": 840.00}
+        ],
+        "summary": "Expenses are manageable and mostly essential."
+    },
+    "Income Analysis": {
+        "regular_income_sources": [{"description": "Client ACH deposits", "total_amount": 16000.00}],
+        "additional_irregular_income": [{"description": "Refund", "amount": 250.00}],
+        "summary": "Stable and reliable income from recurring client deposits."
+    },
+    "Debt and Credit": {
+        "recurring_debt_payments": [{"description": "Auto loan", "amount": 410.00}],
+        "inferred_liability_types": "auto loan",
+        "summary": "Manageable debt with consistent payments."
+    }
+}
+
+FAKE_NARRATIVE = {
+    "summary": {
+        "overall_health": "The business shows stable income and positive cash flow.",
+        "key_findings": [
+            "Positive net cash flow over the period",
+            "Ending balance above starting balance",
+            "Single auto loan with consistent payments"
+        ]
+    },
+    "component_analysis": {
+        component: {
+            "summary": f"{component.replace('_', ' ').title()} is in good shape.",
+            "strengths": ["Consistent pattern"],
+            "concerns": []
+        }
+        for component in ("cash_flow", "debt_credit", "expenses", "income")
+    },
+    "recommendations": {"flags": []}
+}
+
+
+class FakeBackend(CompletionBackend):
+    """
+    Offline stand-in with realistic timing: latency is drawn from a log-normal
+    distribution around `latency_ms`, and `error_rate` injects 503s.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        stream_chunk_chars: int = 64
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.stream_chunk_chars = stream_chunk_chars
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.jitter_ms <= 0:
+            return self.latency_ms / 1000.0
+        sigma = min(1.5, self.jitter_ms / self.latency_ms)
+        return self._random.lognormvariate(0, sigma) * self.latency_ms / 1000.0
+
+    def _content(self, payload: Dict[str, Any]) -> str:
+        prompt = "".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        return json.dumps(FAKE_NARRATIVE if "component_analysis" in prompt else FAKE_ANALYSIS)
+
+    async def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self._latency())
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise BackendError(503, "Injected fake backend failure")
+
+        content = self._content(payload)
+        return {
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": self._usage(payload, content)
+        }
+
+    def _usage(self, payload: Dict[str, Any], content: str) -> Dict[str, int]:
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in payload.get("messages", []))
+        prompt_tokens = max(1, prompt_chars // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """The same content as `complete`, with the latency spread evenly over the chunks"""
+        self.calls += 1
+        content = self._content(payload)
+        pieces = [content[i:i + self.stream_chunk_chars] for i in range(0, len(content), self.stream_chunk_chars)]
+        per_piece = self._latency() / max(1, len(pieces))
+        if self.error_rate and self._random.random() < self.error_rate:
+            await asyncio.sleep(per_piece)
+            raise BackendError(503, "Injected fake backend failure")
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(per_piece)
+            last = index == len(pieces) - 1
+            yield {
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": "stop" if last else None}],
+                "usage": self._usage(payload, content) if last else None,
+            }
+
+
+def create_backend(kind: Optional[str] = None) -> CompletionBackend:
+    """Build the backend selected by LLM_BACKEND (http, replay or fake)"""
+    kind = (kind or config.LLM_BACKEND).lower()
+    if kind == "http":
+        return OpenAICompatibleBackend(config.LLM_BASE_URL, config.LLM_API_KEY)
+    if kind == "replay":
+        record_to = None
+        if config.LLM_REPLAY_RECORD:
+            record_to = OpenAICompatibleBackend(config.LLM_BASE_URL, config.LLM_API_KEY)
+        return ReplayBackend(config.LLM_REPLAY_DIR, record_to=record_to)
+    if kind == "fake":
+        return FakeBackend(
+            latency_ms=config.LLM_FAKE_LATENCY_MS,
+            jitter_ms=config.LLM_FAKE_JITTER_MS,
+            error_rate=config.LLM_FAKE_ERROR_RATE
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {kind}")
+
+
+_completion_backend: Optional[CompletionBackend] = None
+
+
+def get_completion_backend() -> CompletionBackend:
+    """Process-wide backend so HTTP connections are pooled across clients"""
+    global _completion_backend
+    if _completion_backend is None:
+        _completion_backend = create_backend()
+    return _completion_backend
+
+
+def set_completion_backend(backend: Optional[CompletionBackend]):
+    """Swap the process-wide backend (benchmarks, tests); None resets to config"""
+    global _completion_backend
+    _completion_backend = backend
@@ -0,0 +1,149 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from ..core import config
+from .metrics import REGISTRY
+
+LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the loop heartbeat was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_LAG_MAX = REGISTRY.gauge("event_loop_lag_max_seconds", "Largest loop lag observed since start")
+LOOP_BLOCKED = REGISTRY.counter("event_loop_blocked_total", "Loop stalls longer than the blocking threshold")
+
+
+class BlockingEvent:
+    def __init__(self, started_at: float, task: Optional[str], stack: List[str]):
+        self.started_at = started_at
+        self.task = task
+        self.stack = stack
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 2),
+            "task": self.task,
+            "stack": self.stack,
+        }
+
+
+class LoopMonitor:
+    """
+    Heartbeat coroutine that measures loop lag, plus a watchdog thread that
+    samples the loop thread's stack while the heartbeat is overdue. The
+    sample points at the code holding the loop (sync file I/O, requests,
+    boto3, ...), not at the coroutine that happened to be awaiting.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, history: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.events: Deque[BlockingEvent] = deque(maxlen=history)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._current: Optional[BlockingEvent] = None
+        self._lag_samples: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - due)
+            self._last_beat = now
+            self._lag_samples.append(lag)
+            LOOP_LAG.observe(lag)
+            if lag > LOOP_LAG_MAX.value():
+                LOOP_LAG_MAX.set(lag)
+
+    def _watch(self):
+        poll = min(self.threshold / 4, 0.025)
+        while not self._stopping.wait(poll):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue > self.threshold:
+                if self._current is None:
+                    self._current = self._capture(overdue)
+                    self.events.append(self._current)
+                    LOOP_BLOCKED.inc()
+                self._current.duration = overdue
+            elif self._current is not None:
+                self._current = None
+
+    def _capture(self, overdue: float) -> BlockingEvent:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        task_name = None
+        try:
+            # Reads the loop's current-task slot; safe enough for a diagnostic
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = f"{task.get_name()} {task.get_coro()!r}"
+        except RuntimeError:
+            pass
+        return BlockingEvent(time.time() - overdue, task_name, [line.rstrip() for line in stack])
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = sorted(self._lag_samples)
+
+        def pct(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(1000 * samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 3)
+
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"p50": pct(50), "p99": pct(99), "max": round(1000 * LOOP_LAG_MAX.value(), 3)},
+            "blocked_total": int(LOOP_BLOCKED.value()),
+            "recent_blocking_events": [event.to_dict() for event in reversed(self.events)],
+        }
+
+
+_loop_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor(
+            interval=config.LOOP_MONITOR_INTERVAL,
+            threshold=config.LOOP_MONITOR_THRESHOLD
+        )
+    return _loop_monitor
@@ -0,0 +1,141 @@
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core import config
+from .metrics import REGISTRY
+from .rate_limiter import AdmissionController, get_admission_controller
+from .retry_policy import get_latency_tracker
+
+STAGE_ANALYSIS = "analysis"
+STAGE_NARRATIVE = "narrative"
+
+ROUTED_CALLS = REGISTRY.counter("llm_routed_calls_total", "LLM calls by pipeline stage, serving model and routing reason")
+STAGE_LATENCY = REGISTRY.histogram("llm_stage_seconds", "LLM latency per pipeline stage, including any fallback")
+
+# Per-request list of {"stage", "model", "reason", "seconds"}; see start_route_log
+_route_log: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_route_log", default=None)
+# Model that served the latest call in the current task; see last_served_model
+_served_model: ContextVar[Optional[str]] = ContextVar("llm_served_model", default=None)
+
+
+class StageRoute:
+    """What a pipeline stage asks of the LLM: model, prompt/output caps and latency budget"""
+
+    def __init__(
+        self,
+        stage: str,
+        model: str,
+        max_tokens: int,
+        latency_budget: float,
+        fallback_model: Optional[str] = None,
+        max_prompt_tokens: int = 0
+    ):
+        self.stage = stage
+        self.model = model
+        self.max_tokens = max_tokens
+        self.latency_budget = latency_budget
+        self.fallback_model = fallback_model if fallback_model and fallback_model != model else None
+        self.max_prompt_tokens = max_prompt_tokens
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "model": self.model,
+            "fallback_model": self.fallback_model,
+            "max_tokens": self.max_tokens,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "latency_budget": self.latency_budget,
+        }
+
+
+class ModelRouter:
+    """
+    Picks the model for each stage. A stage with a fallback is sent to it
+    up front when its primary is inside a Retry-After window or the
+    primary's recent p95 latency no longer fits the stage budget.
+    """
+
+    def __init__(self, routes: Dict[str, StageRoute], admission: Optional[AdmissionController] = None,
+                 min_samples: int = 10):
+        self.routes = routes
+        self.admission = admission or get_admission_controller()
+        self.min_samples = min_samples
+
+    def route(self, stage: str) -> StageRoute:
+        route = self.routes.get(stage)
+        if route is None:
+            raise Exception(f"No model route for stage '{stage}'")
+        return route
+
+    def choose(self, route: StageRoute) -> Tuple[str, str]:
+        """(model, reason) for the next call on this route"""
+        if route.fallback_model is None:
+            return route.model, "primary"
+        if self.admission.is_rate_limited(route.model):
+            return route.fallback_model, "rate_limited"
+        tracker = get_latency_tracker(route.model)
+        if len(tracker) >= self.min_samples and tracker.percentile(95) > route.latency_budget:
+            return route.fallback_model, "over_budget"
+        return route.model, "primary"
+
+    @classmethod
+    def from_config(cls) -> "ModelRouter":
+        return cls(
+            {
+                STAGE_ANALYSIS: StageRoute(
+                    STAGE_ANALYSIS,
+                    config.LLM_ANALYSIS_MODEL,
+                    config.LLM_ANALYSIS_MAX_TOKENS,
+                    config.LLM_ANALYSIS_LATENCY_BUDGET,
+                    config.LLM_ANALYSIS_FALLBACK_MODEL,
+                    config.LLM_ANALYSIS_MAX_PROMPT_TOKENS
+                ),
+                STAGE_NARRATIVE: StageRoute(
+                    STAGE_NARRATIVE,
+                    config.LLM_NARRATIVE_MODEL,
+                    config.LLM_NARRATIVE_MAX_TOKENS,
+                    config.LLM_NARRATIVE_LATENCY_BUDGET,
+                    config.LLM_NARRATIVE_FALLBACK_MODEL,
+                    config.LLM_NARRATIVE_MAX_PROMPT_TOKENS
+                ),
+            },
+            min_samples=config.LLM_ROUTE_MIN_SAMPLES
+        )
+
+
+def start_route_log() -> List[Dict[str, Any]]:
+    """
+    Start collecting which model served each stage for the current request.
+    Tasks spawned afterwards share the returned list.
+    """
+    log: List[Dict[str, Any]] = []
+    _route_log.set(log)
+    return log
+
+
+def record_route(stage: str, model: str, reason: str, seconds: float):
+    ROUTED_CALLS.inc(stage=stage, model=model, reason=reason)
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    _served_model.set(model)
+    log = _route_log.get()
+    if log is not None:
+        log.append({"stage": stage, "model": model, "reason": reason, "seconds": round(seconds, 3)})
+
+
+def last_served_model() -> Optional[str]:
+    """
+    Model that served the last completion awaited in the current task
+    (concurrent tasks each see their own), for callers that must not
+    cache a fallback model's answer as the primary's
+    """
+    return _served_model.get()
+
+
+_model_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter.from_config()
+    return _model_router
@@ -1,51 +1,47 @@
 from datetime import datetime
 from decimal import Decimal
 import re
+from .date_inference import parse_dates
+from .textract_index import BlockIndex
 
 class StatementParser:
     def __init__(self, textract_response):
         self.blocks = textract_response.get('Blocks', [])
+        self.rejected_rows = []
 
     def extract_table_data(self):
-        """Extract table data from Textract response"""
+        """
+        Extract table data from Textract response. Each table is rebuilt as
+        its own grid from the block relationships, and columns are mapped to
+        date/description/amount by header or content rather than position.
+        """
         rows = []
-        current_row = {}
-        
-        for block in self.blocks:
-            if block['BlockType'] == 'CELL':
-                row_index = block.get('RowIndex')
-                col_index = block.get('ColumnIndex')
-                
-                if block.get('EntityTypes', []) == ['COLUMN_HEADER']:
-                    continue
-                
-                if 'Text' in block:
-                    text = block['Text'].strip()
-                    
-                    # Assuming standard bank statement format:
-                    # Col 1: Date, Col 2: Description, Col 3: Amount
-                    if col_index == 1:  # Date
-                        current_row = {'date': text}
-                    elif col_index == 2:  # Description
-                        current_row['description'] = text
-                    elif col_index == 3:  # Amount
-                        current_row['amount'] = text
-                        rows.append(current_row.copy())
+        for table in BlockIndex(self.blocks).tables():
+            records = table.records()
+            if not records:
+                print(f"Skipping non-transaction table on page {table.page} ({table.n_rows}x{table.n_cols})")
+            rows.extend(records)
         
         return self.clean_transactions(rows)
 
     def clean_transactions(self, raw_rows):
-        """Clean and format the extracted transactions"""
+        """
+        Clean and format the extracted transactions. The date column is
+        parsed in one pass with a per-document inferred format; rows that
+        cannot be cleaned are kept in `self.rejected_rows` with a reason.
+        """
         cleaned = []
+        self.rejected_rows = []
+        dates = parse_dates([row.get('date', '') for row in raw_rows])
+        if raw_rows:
+            print(f"Statement dates: {dates.summary()}")
         
-        for row in raw_rows:
+        for index, row in enumerate(raw_rows):
             try:
                 # Clean date
-                date_str = row.get('date', '')
-                try:
-                    # Adjust this pattern based on your date format
-                    date = datetime.strptime(date_str, '%m/%d/%Y')
-                except ValueError:
+                date = dates.date(index)
+                if date is None:
+                    self.rejected_rows.append({'row': row, 'reason': f"unparseable date {row.get('date', '')!r}"})
                     continue
 
                 # Clean amount
@@ -53,6 +49,7 @@ class StatementParser:
                 try:
                     amount = Decimal(amount_str)
                 except:
+                    self.rejected_rows.append({'row': row, 'reason': f"unparseable amount {row.get('amount', '')!r}"})
                     continue
 
                 cleaned.append({
@@ -63,6 +60,9 @@ class StatementParser:
                 
             except Exception as e:
                 print(f"Error cleaning row {row}: {e}")
+                self.rejected_rows.append({'row': row, 'reason': str(e)})
                 continue
-                
-        return cleaned
\ No newline at end of file
+
+        if self.rejected_rows:
+            print(f"Rejected {len(self.rejected_rows)} of {len(raw_rows)} rows")
+        return cleaned
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..core import config
+
+# Priority lanes: lower value is admitted first
+PRIORITY_ANALYSIS = 0
+PRIORITY_NARRATIVE = 1
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+            self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.refill_per_second
+
+    def consume(self, amount: float):
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class AdmissionController:
+    """
+    Gate for outbound LLM completions: caps in-flight calls, paces requests and
+    tokens per minute, admits waiters strictly by priority lane and honours
+    provider Retry-After windows.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_concurrency = max_concurrency
+        self._clock = clock
+        self._request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0, clock)
+        self._token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0, clock)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._model_blocked_until: Dict[str, float] = {}
+        self._waiters: List[Tuple[int, int, int, Optional[str], asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def is_rate_limited(self, model: Optional[str] = None) -> bool:
+        return self._blocked_for(model) > 0
+
+    def _blocked_for(self, model: Optional[str]) -> float:
+        until = max(self._blocked_until, self._model_blocked_until.get(model, 0.0) if model else 0.0)
+        return until - self._clock()
+
+    @asynccontextmanager
+    async def admit(self, estimated_tokens: int, priority: int = PRIORITY_ANALYSIS, model: Optional[str] = None):
+        """Hold an admission slot for the duration of one completion"""
+        await self.acquire(estimated_tokens, priority, model)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    async def acquire(self, estimated_tokens: int, priority: int = PRIORITY_ANALYSIS, model: Optional[str] = None):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), estimated_tokens, model, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before cancellation; give it back
+                self.release()
+            else:
+                self._waiters = [w for w in self._waiters if w[4] is not future]
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def penalize(self, retry_after: float, model: Optional[str] = None):
+        """
+        Pause admissions after the provider signalled a rate limit: for one
+        model when given (other models keep flowing), otherwise for all
+        """
+        until = self._clock() + retry_after
+        if model:
+            self._model_blocked_until[model] = max(self._model_blocked_until.get(model, 0.0), until)
+        else:
+            self._blocked_until = max(self._blocked_until, until)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Return over-estimated tokens to the bucket once real usage is known"""
+        if actual_tokens is not None and actual_tokens < estimated_tokens:
+            self._token_bucket.refund(estimated_tokens - actual_tokens)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._waiters and self._in_flight < self.max_concurrency:
+            _, _, tokens, model, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            blocked = self._blocked_for(model)
+            if blocked > 0 and self._model_blocked_until:
+                # A model in its own Retry-After window must not hold up the others
+                waiter = self._next_unblocked()
+                if waiter is not None:
+                    tokens, future = waiter[2], waiter[4]
+                    blocked = 0.0
+            wait = max(
+                blocked,
+                self._request_bucket.wait_time(1),
+                self._token_bucket.wait_time(tokens)
+            )
+            if wait > 0:
+                # Head of the queue keeps its place; lower lanes never jump it
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            if future is self._waiters[0][4]:
+                heapq.heappop(self._waiters)
+            else:
+                self._waiters = [w for w in self._waiters if w[4] is not future]
+                heapq.heapify(self._waiters)
+            self._request_bucket.consume(1)
+            self._token_bucket.consume(tokens)
+            self._in_flight += 1
+            future.set_result(None)
+
+
+    def _next_unblocked(self) -> Optional[Tuple[int, int, int, Optional[str], asyncio.Future]]:
+        """Highest-priority live waiter whose model is outside any rate-limit window"""
+        for waiter in sorted(self._waiters, key=lambda w: (w[0], w[1])):
+            if not waiter[4].done() and self._blocked_for(waiter[3]) <= 0:
+                return waiter
+        return None
+
+
+def parse_retry_after(value: Optional[str], default: float) -> float:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Process-wide controller shared by every LlamaClient. With several
+    workers each takes an equal share of the deployment's limits.
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        workers = config.WEB_CONCURRENCY
+        _admission_controller = AdmissionController(
+            max_concurrency=max(1, config.LLM_MAX_CONCURRENCY // workers),
+            requests_per_minute=max(1, config.LLM_REQUESTS_PER_MINUTE // workers),
+            tokens_per_minute=max(1, config.LLM_TOKENS_PER_MINUTE // workers)
+        )
+    return _admission_controller
@@ -0,0 +1,251 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Iterable
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from ..core import config
+from .metrics import REGISTRY
+
+REQUEST_QUEUE_SECONDS = REGISTRY.histogram(
+    "request_queue_seconds",
+    "Time admitted requests waited for a slot, by gate",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+REQUEST_REJECTIONS = REGISTRY.counter("request_rejections_total", "Requests turned away by gate and reason")
+REQUEST_ACTIVE = REGISTRY.gauge("request_gate_active", "Requests holding a slot, by gate")
+REQUEST_QUEUED = REGISTRY.gauge("request_gate_queued", "Requests waiting for a slot, by gate")
+
+
+class RequestRejected(HTTPException):
+    """Fast refusal under load; Retry-After says when a slot is likely to be free"""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        self.retry_after = retry_after
+
+
+class GateTicket:
+    """A held slot. `release` is idempotent, so streaming paths can call it from several places."""
+
+    def __init__(self, gate: "RequestGate", client: str, admitted: float):
+        self.gate = gate
+        self.client = client
+        self.admitted = admitted
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.gate._release(self)
+
+
+class RequestGate:
+    """
+    Admission for incoming requests: at most `max_active` run at once, up to
+    `max_queue` more wait in FIFO order for at most `max_wait` seconds, and
+    one client holds at most `per_client` of the running and waiting places.
+    Anything beyond that is refused at once (429 for a client over its cap,
+    503 when the server is saturated) with a Retry-After estimated from
+    recent service times, so overload shows up as queueing and fast retries
+    rather than every request timing out.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_active: int,
+        max_queue: int,
+        max_wait: float,
+        per_client: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.max_active = max(1, max_active)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.per_client = max(1, per_client)
+        self._clock = clock
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._clients: Dict[str, int] = {}
+        self._service_time = 1.0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def retry_after(self) -> float:
+        """Seconds until the queue ahead of a new request has likely drained"""
+        return self._service_time * (self.queued + 1) / self.max_active
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        ticket = await self.acquire(client)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    async def acquire(self, client: str) -> GateTicket:
+        if self._clients.get(client, 0) >= self.per_client:
+            self._reject("client_limit")
+            raise RequestRejected(
+                429, self.retry_after(), f"Too many concurrent {self.name} requests from this client"
+            )
+        started = self._clock()
+        if self._active < self.max_active and not self.queued:
+            self._admit(client)
+            REQUEST_QUEUE_SECONDS.observe(0.0, gate=self.name)
+            return GateTicket(self, client, started)
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+            raise RequestRejected(503, self.retry_after(), f"Server busy: {self.name} queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self._publish()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._leave_queue(client)
+            self._reject("queue_timeout")
+            raise RequestRejected(503, self.retry_after(), f"Server busy: no {self.name} slot within {self.max_wait:.0f}s")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the client went away; hand the slot on
+                GateTicket(self, client, started).release()
+            else:
+                self._leave_queue(client)
+            raise
+        admitted = self._clock()
+        REQUEST_QUEUE_SECONDS.observe(admitted - started, gate=self.name)
+        return GateTicket(self, client, admitted)
+
+    def _admit(self, client: str):
+        self._active += 1
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self._publish()
+
+    def _leave_queue(self, client: str):
+        self._waiters = deque(waiter for waiter in self._waiters if not waiter.done())
+        self._forget(client)
+        self._publish()
+
+    def _forget(self, client: str):
+        remaining = self._clients.get(client, 0) - 1
+        if remaining > 0:
+            self._clients[client] = remaining
+        else:
+            self._clients.pop(client, None)
+
+    def _release(self, ticket: GateTicket):
+        elapsed = self._clock() - ticket.admitted
+        self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+        self._forget(ticket.client)
+        # The slot passes straight to the next live waiter (its client count was taken when it queued)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+        else:
+            self._active -= 1
+        self._publish()
+
+    def _reject(self, reason: str):
+        REQUEST_REJECTIONS.inc(gate=self.name, reason=reason)
+
+    def _publish(self):
+        REQUEST_ACTIVE.set(self._active, gate=self.name)
+        REQUEST_QUEUED.set(self.queued, gate=self.name)
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware that holds request bodies on `paths` to UPLOAD_MAX_BYTES
+    (plus room for the multipart framing) before the form is parsed: a
+    larger Content-Length is refused at once, and a body without one is cut
+    off with a 413 as soon as it runs over. Checking `UploadFile.size` in the
+    route is too late; by then the whole body has been received and spooled.
+    """
+
+    MULTIPART_OVERHEAD = 64 * 1024
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        limit = config.UPLOAD_MAX_BYTES + self.MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            REQUEST_REJECTIONS.inc(gate="upload", reason="too_large")
+            response = JSONResponse({"detail": _too_large()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    REQUEST_REJECTIONS.inc(gate="upload", reason="too_large")
+                    # FastAPI passes HTTPExceptions raised while reading the body through unchanged
+                    raise HTTPException(status_code=413, detail=_too_large())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _too_large() -> str:
+    return f"File is larger than the {config.UPLOAD_MAX_BYTES} byte upload limit"
+
+
+def client_key(request: Request) -> str:
+    """
+    Who a request counts against: the peer address, or the X-Client-Id a
+    trusted proxy (config.TRUSTED_PROXIES) set for it
+    """
+    peer = request.client.host if request.client else "unknown"
+    if peer in config.TRUSTED_PROXIES:
+        return request.headers.get("x-client-id") or peer
+    return peer
+
+
+_request_gates: Dict[str, RequestGate] = {}
+
+
+def get_request_gate(name: str) -> RequestGate:
+    """Per-process gates for the "upload" and "analyze" endpoints, sized from config"""
+    gate = _request_gates.get(name)
+    if gate is None:
+        prefix = name.upper()
+        gate = RequestGate(
+            name,
+            max_active=getattr(config, f"{prefix}_MAX_ACTIVE"),
+            max_queue=getattr(config, f"{prefix}_MAX_QUEUE"),
+            max_wait=getattr(config, f"{prefix}_MAX_QUEUE_WAIT"),
+            per_client=getattr(config, f"{prefix}_MAX_PER_CLIENT")
+        )
+        _request_gates[name] = gate
+    return gate
@@ -0,0 +1,332 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from ..core import config
+from .metrics import REGISTRY
+from .rate_limiter import TokenBucket
+
+PROFILES = REGISTRY.counter("request_profiles_total", "Profiling requests, by outcome")
+
+# Threads other than the event loop are only sampled while they run our code
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_BACKEND_DIR = os.path.dirname(os.path.dirname(_APP_DIR))
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+_span_depth: ContextVar[int] = ContextVar("request_profile_span_depth", default=0)
+
+Frame = Tuple[str, str, int]
+
+
+class RequestProfile:
+    """
+    Wall-clock spans and stack samples for one request. A daemon thread
+    samples every `interval` seconds: the event loop thread always (idle
+    samples, in the selector, are time spent waiting on the network or the
+    model), other threads only while they run app code (thread-pool parsing
+    and hashing). Samples are process-wide, so work of concurrent requests
+    can show up too; the spans belong to this request only.
+    """
+
+    def __init__(self, name: str, interval: float = 0.005, max_seconds: float = 300.0,
+                 skipped: Optional[str] = None, retry_after: float = 0.0):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.skipped = skipped
+        self.retry_after = retry_after
+        self.started_at = time.time()
+        self.truncated = False
+        self.spans: List[Dict[str, Any]] = []
+        self.frames: List[Frame] = []
+        self._frame_index: Dict[Frame, int] = {}
+        # (stack as frame indexes, weight in ms); consecutive equal stacks are merged
+        self.samples: List[List[Any]] = []
+        self._origin = time.perf_counter()
+        self._ended: Optional[float] = None
+        self._loop_thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> bool:
+        return self.skipped is None and self._ended is None
+
+    def start(self):
+        if self.skipped is None:
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._ended is None:
+            self._ended = time.perf_counter()
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+
+    def elapsed_ms(self) -> float:
+        return round(((self._ended or time.perf_counter()) - self._origin) * 1000, 3)
+
+    def add_span(self, name: str, started: float, ended: float, depth: int):
+        self.spans.append({
+            "name": name,
+            "start_ms": round((started - self._origin) * 1000, 3),
+            "duration_ms": round((ended - started) * 1000, 3),
+            "depth": depth,
+        })
+
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        deadline = last + self.max_seconds
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now > deadline:
+                self.truncated = True
+                return
+            self.sample((now - last) * 1000, skip={own})
+            last = now
+
+    def sample(self, weight_ms: float, skip=()):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in skip:
+                continue
+            stack = []
+            in_app = thread_id == self._loop_thread_id
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                in_app = in_app or code.co_filename.startswith(_APP_DIR)
+                frame = frame.f_back
+            if not in_app:
+                continue
+            root = "event loop" if thread_id == self._loop_thread_id else f"thread {names.get(thread_id, thread_id)}"
+            indexes = [self._index((root, "", 0))] + [self._index(entry) for entry in reversed(stack)]
+            if self.samples and self.samples[-1][0] == indexes:
+                self.samples[-1][1] += weight_ms
+            else:
+                self.samples.append([indexes, weight_ms])
+
+    def _index(self, frame: Frame) -> int:
+        index = self._frame_index.get(frame)
+        if index is None:
+            index = self._frame_index[frame] = len(self.frames)
+            self.frames.append(frame)
+        return index
+
+    def _frame_name(self, index: int) -> str:
+        name, filename, line = self.frames[index]
+        if not filename:
+            return name
+        return f"{name} ({os.path.relpath(filename, _BACKEND_DIR) if filename.startswith(_APP_DIR) else os.path.basename(filename)}:{line})"
+
+    def summary(self) -> Dict[str, Any]:
+        if self.skipped is not None:
+            return {"skipped": self.skipped, "retry_after": round(self.retry_after, 1)}
+        totals: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            total = totals.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+            total["count"] += 1
+            total["total_ms"] = round(total["total_ms"] + span["duration_ms"], 3)
+        return {
+            "profile_id": self.id,
+            "duration_ms": self.elapsed_ms(),
+            "samples": len(self.samples),
+            "truncated": self.truncated,
+            "stages": [span for span in self.spans if span["depth"] == 0],
+            "spans": totals,
+        }
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        """
+        speedscope file: the stack samples as a sampled profile, plus the
+        top-level stages as an evented profile
+        """
+        end = self.elapsed_ms()
+        frames = [{"name": self._frame_name(i), "file": f[1] or None, "line": f[2] or None}
+                  for i, f in enumerate(self.frames)]
+        events = []
+        for span in sorted((s for s in self.spans if s["depth"] == 0), key=lambda s: s["start_ms"]):
+            frames.append({"name": f"stage {span['name']}"})
+            events.append({"type": "O", "frame": len(frames) - 1, "at": span["start_ms"]})
+            events.append({"type": "C", "frame": len(frames) - 1, "at": span["start_ms"] + span["duration_ms"]})
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "bank-statement-analyzer",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{self.name} samples",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": end,
+                    "samples": [indexes for indexes, _ in self.samples],
+                    "weights": [round(weight, 3) for _, weight in self.samples],
+                },
+                {
+                    "type": "evented",
+                    "name": f"{self.name} stages",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": end,
+                    "events": events,
+                },
+            ],
+        }
+
+    def to_collapsed(self) -> str:
+        """Brendan Gregg's collapsed stacks ("a;b;c <microseconds>"), for flamegraph.pl and friends"""
+        totals: Dict[str, float] = {}
+        for indexes, weight in self.samples:
+            key = ";".join(self._frame_name(i).replace(";", ",") for i in indexes)
+            totals[key] = totals.get(key, 0.0) + weight
+        return "".join(f"{stack} {max(1, round(weight * 1000))}\n" for stack, weight in totals.items())
+
+
+@contextmanager
+def profile_span(name: str):
+    """Wall-clock span in the current request's profile; free when the request isn't profiled"""
+    profile = _current_profile.get()
+    if profile is None or not profile.active:
+        yield
+        return
+    depth = _span_depth.get()
+    token = _span_depth.set(depth + 1)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _span_depth.reset(token)
+        profile.add_span(name, started, time.perf_counter(), depth)
+
+
+def profiling_requested(request: Request) -> bool:
+    """`?profile=1` or an `X-Profile: 1` header"""
+    flag = request.query_params.get("profile") or request.headers.get("x-profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+class RequestProfiler:
+    """
+    Hands out request profiles and stores finished ones. Profiling is rate
+    limited (token bucket) and one request at a time per process, so leaving
+    it enabled in production bounds the sampling overhead.
+    """
+
+    def __init__(self, directory: str, interval: float, max_seconds: float, keep: int,
+                 per_minute: float, burst: int, enabled: bool = True):
+        self.directory = directory
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self.enabled = enabled
+        self._bucket = TokenBucket(max(1, burst), max(per_minute, 0.001) / 60.0)
+        self._lock = threading.Lock()
+        self._running: Optional[RequestProfile] = None
+
+    def start(self, name: str) -> RequestProfile:
+        """Starts profiling the calling request; a refused profile is inert and only reports why"""
+        skipped, retry_after = None, 0.0
+        with self._lock:
+            if not self.enabled:
+                skipped = "disabled"
+            elif self._running is not None:
+                skipped, retry_after = "busy", 1.0
+            elif self._bucket.wait_time(1) > 0:
+                skipped, retry_after = "rate_limited", self._bucket.wait_time(1)
+            profile = RequestProfile(name, self.interval, self.max_seconds, skipped, retry_after)
+            if skipped is None:
+                self._bucket.consume(1)
+                self._running = profile
+        PROFILES.inc(outcome=skipped or "started")
+        _current_profile.set(profile)
+        profile.start()
+        return profile
+
+    def finish(self, profile: RequestProfile) -> Dict[str, Any]:
+        """Stops sampling and stores the profile; returns the summary for the response"""
+        if profile.skipped is not None:
+            return profile.summary()
+        profile.stop()
+        with self._lock:
+            if self._running is profile:
+                self._running = None
+        try:
+            self._save(profile)
+        except OSError as e:
+            print(f"Error saving request profile: {str(e)}")
+            return {**profile.summary(), "stored": False}
+        return profile.summary()
+
+    def _save(self, profile: RequestProfile):
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(os.path.join(self.directory, f"{profile.id}.speedscope.json"), json.dumps(profile.to_speedscope()))
+        self._write(os.path.join(self.directory, f"{profile.id}.collapsed.txt"), profile.to_collapsed())
+        self._prune()
+
+    def _write(self, path: str, text: str):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _prune(self):
+        profiles = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(".speedscope.json"):
+                profiles[name.split(".")[0]] = os.path.getmtime(os.path.join(self.directory, name))
+        for profile_id in sorted(profiles, key=profiles.get)[:max(0, len(profiles) - self.keep)]:
+            for suffix in (".speedscope.json", ".collapsed.txt"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def load(self, profile_id: str, format: str = "speedscope") -> Optional[str]:
+        """A stored profile's text ("speedscope" JSON or "collapsed" stacks), or None"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        suffix = ".collapsed.txt" if format == "collapsed" else ".speedscope.json"
+        try:
+            with open(os.path.join(self.directory, profile_id + suffix)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+_request_profiler: Optional[RequestProfiler] = None
+
+
+def get_request_profiler() -> RequestProfiler:
+    global _request_profiler
+    if _request_profiler is None:
+        _request_profiler = RequestProfiler(
+            config.PROFILE_DIR,
+            interval=config.PROFILE_SAMPLE_INTERVAL,
+            max_seconds=config.PROFILE_MAX_SECONDS,
+            keep=config.PROFILE_KEEP,
+            # Per worker process, like the LLM admission limits
+            per_minute=config.PROFILE_RATE_PER_MINUTE / config.WEB_CONCURRENCY,
+            burst=config.PROFILE_BURST,
+            enabled=config.PROFILING_ENABLED
+        )
+    return _request_profiler
@@ -0,0 +1,133 @@
+import asyncio
+import random
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from ..core import config
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+class RetryableError(Exception):
+    """Transient failure of one attempt; `retry_after` overrides the backoff when set"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        attempt_timeout: float,
+        deadline: float
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (0-based) retry"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @classmethod
+    def from_config(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=config.LLM_MAX_RETRIES,
+            base_delay=config.LLM_RETRY_BASE_DELAY,
+            max_delay=config.LLM_RETRY_MAX_DELAY,
+            attempt_timeout=config.LLM_ATTEMPT_TIMEOUT,
+            deadline=config.LLM_DEADLINE
+        )
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies used to pick hedge delays"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+_latency_trackers: Dict[str, LatencyTracker] = {}
+
+
+def get_latency_tracker(key: str) -> LatencyTracker:
+    tracker = _latency_trackers.get(key)
+    if tracker is None:
+        tracker = _latency_trackers[key] = LatencyTracker()
+    return tracker
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    is_valid: Callable[[T], bool] = lambda result: True
+) -> T:
+    """
+    Run `call`; if it has not produced a valid result after `delay` seconds,
+    start a duplicate and return whichever valid result arrives first.
+    """
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first
+
+    pending = {first}
+    hedge_started = False
+    last_error: Optional[BaseException] = None
+    try:
+        while pending:
+            timeout = None if hedge_started else delay
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done and not hedge_started:
+                pending.add(asyncio.ensure_future(call()))
+                hedge_started = True
+                continue
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                elif is_valid(task.result()):
+                    return task.result()
+            if not pending and not hedge_started:
+                # Primary failed before the hedge delay: leave backoff to the retry loop
+                break
+        if last_error is not None:
+            raise last_error
+        raise RetryableError(502, "No valid response from hedged attempts")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def hedge_delay(tracker: LatencyTracker) -> Optional[float]:
+    """p95-based hedge delay, or None while there are too few samples to trust"""
+    if not config.LLM_HEDGE_ENABLED or len(tracker) < config.LLM_HEDGE_MIN_SAMPLES:
+        return None
+    p95 = tracker.percentile(95)
+    return max(config.LLM_HEDGE_MIN_DELAY, p95)
+
+
+def is_retryable_status(status: int) -> bool:
+    return status in RETRYABLE_STATUSES
+
@@ -0,0 +1,215 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DATE_LIKE = re.compile(r"^\s*(\d{1,4}[/.-]\d{1,2}([/.-]\d{2,4})?|\d{1,2}[ -][A-Za-z]{3,9}([ -]\d{2,4})?|[A-Za-z]{3,9}\.? \d{1,2}(,? \d{4})?)\s*$")
+AMOUNT_LIKE = re.compile(r"^\s*\(?-?\$?\s?\d{1,3}(,?\d{3})*(\.\d{2})?\)?\s*(CR|DR|Cr|Dr)?-?\s*$")
+
+HEADER_ROLES: List[Tuple[str, re.Pattern]] = [
+    ("balance", re.compile(r"balance", re.IGNORECASE)),
+    ("debit", re.compile(r"debit|withdrawal|paid out|money out", re.IGNORECASE)),
+    ("credit", re.compile(r"credit|deposit|paid in|money in", re.IGNORECASE)),
+    ("amount", re.compile(r"amount", re.IGNORECASE)),
+    ("date", re.compile(r"date|posted", re.IGNORECASE)),
+    ("description", re.compile(r"description|details|transaction|particulars|narrative|memo|payee|reference", re.IGNORECASE)),
+]
+
+
+class TextractTable:
+    """One reconstructed table: a dense grid of cell text plus column roles"""
+
+    def __init__(self, page: int, table_id: Optional[str], grid: List[List[str]], header_rows: Iterable[int]):
+        self.page = page
+        self.table_id = table_id
+        self.grid = grid
+        self.header_rows = sorted(set(header_rows))
+        self.roles = detect_column_roles(self.header(), self.body_rows())
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.grid)
+
+    @property
+    def n_cols(self) -> int:
+        return len(self.grid[0]) if self.grid else 0
+
+    def header(self) -> List[str]:
+        if not self.header_rows:
+            return []
+        return [
+            " ".join(self.grid[row][col] for row in self.header_rows if self.grid[row][col]).strip()
+            for col in range(self.n_cols)
+        ]
+
+    def body_rows(self) -> List[List[str]]:
+        skip = set(self.header_rows)
+        return [row for index, row in enumerate(self.grid) if index not in skip]
+
+    def records(self) -> List[Dict[str, str]]:
+        """
+        Transaction rows keyed by role. Rows with neither a date nor an amount
+        continue the previous row's description (wrapped text).
+        """
+        columns = {role: col for col, role in self.roles.items()}
+        if "date" not in columns or not ({"amount", "debit", "credit"} & set(columns)):
+            return []
+
+        def cell(row: List[str], role: str) -> str:
+            return row[columns[role]].strip() if role in columns else ""
+
+        records: List[Dict[str, str]] = []
+        for row in self.body_rows():
+            date = cell(row, "date")
+            amount = cell(row, "amount")
+            if not amount:
+                credit, debit = cell(row, "credit"), cell(row, "debit")
+                if credit:
+                    amount = credit
+                elif debit:
+                    amount = debit if debit.startswith("-") else f"-{debit}"
+            description = cell(row, "description")
+            if not date and not amount:
+                if records and description:
+                    records[-1]["description"] = f"{records[-1]['description']} {description}".strip()
+                continue
+            record = {"date": date, "description": description, "amount": amount}
+            if "balance" in columns:
+                record["balance"] = cell(row, "balance")
+            records.append(record)
+        return records
+
+
+def detect_column_roles(header: List[str], body: List[List[str]]) -> Dict[int, str]:
+    """
+    Column -> role. Header keywords win; unlabeled columns fall back to their
+    content: the most date-like column is the date, numeric columns are
+    amounts (the right-most of several is the running balance) and the
+    widest text column is the description.
+    """
+    roles: Dict[int, str] = {}
+    for col, text in enumerate(header):
+        for role, pattern in HEADER_ROLES:
+            if text and pattern.search(text) and role not in roles.values():
+                roles[col] = role
+                break
+
+    n_cols = max((len(row) for row in body), default=len(header))
+    unlabeled = [col for col in range(n_cols) if col not in roles]
+    if not unlabeled or not body:
+        return roles
+
+    def share(col: int, pattern: re.Pattern) -> float:
+        values = [row[col] for row in body if col < len(row) and row[col].strip()]
+        return sum(1 for value in values if pattern.match(value)) / len(values) if values else 0.0
+
+    if "date" not in roles.values():
+        best = max(unlabeled, key=lambda col: share(col, DATE_LIKE))
+        if share(best, DATE_LIKE) >= 0.5:
+            roles[best] = "date"
+            unlabeled.remove(best)
+
+    if not {"amount", "debit", "credit"} & set(roles.values()):
+        numeric = [col for col in unlabeled if share(col, AMOUNT_LIKE) >= 0.5]
+        if len(numeric) >= 2 and "balance" not in roles.values():
+            roles[numeric[-1]] = "balance"
+            numeric = numeric[:-1]
+        if numeric:
+            roles[numeric[-1]] = "amount"
+        unlabeled = [col for col in unlabeled if col not in roles]
+
+    if "description" not in roles.values() and unlabeled:
+        def width(col: int) -> float:
+            values = [len(row[col]) for row in body if col < len(row)]
+            return sum(values) / len(values) if values else 0.0
+        roles[max(unlabeled, key=width)] = "description"
+    return roles
+
+
+class BlockIndex:
+    """
+    Single-pass index over a Textract block list: id -> block, and page ->
+    tables in reading order. Tables are rebuilt from their CHILD relationships
+    into (row, col) grids, so every block is touched a constant number of
+    times no matter how many pages or tables the result has.
+    """
+
+    def __init__(self, blocks: List[Dict[str, Any]]):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.tables_by_page: Dict[int, List[str]] = {}
+        self._orphan_cells: Dict[int, List[Dict[str, Any]]] = {}
+        has_tables = False
+
+        for block in blocks:
+            block_id = block.get("Id")
+            if block_id is not None:
+                self.by_id[block_id] = block
+            kind = block.get("BlockType")
+            if kind == "TABLE":
+                has_tables = True
+                self.tables_by_page.setdefault(block.get("Page", 1), []).append(block_id)
+            elif kind == "CELL":
+                self._orphan_cells.setdefault(block.get("Page", 1), []).append(block)
+
+        if has_tables:
+            # Cells belong to tables through relationships; only legacy
+            # responses without TABLE blocks need the orphan fallback
+            self._orphan_cells = {}
+
+    def children(self, block: Dict[str, Any], block_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        result = []
+        for relationship in block.get("Relationships", []):
+            if relationship.get("Type") != "CHILD":
+                continue
+            for child_id in relationship.get("Ids", []):
+                child = self.by_id.get(child_id)
+                if child is not None and (block_type is None or child.get("BlockType") == block_type):
+                    result.append(child)
+        return result
+
+    def text(self, block: Dict[str, Any]) -> str:
+        if "Text" in block:
+            return block["Text"].strip()
+        words = []
+        for child in self.children(block):
+            if child.get("BlockType") == "WORD":
+                words.append(child.get("Text", ""))
+            elif child.get("BlockType") == "SELECTION_ELEMENT" and child.get("SelectionStatus") == "SELECTED":
+                words.append("X")
+        return " ".join(words).strip()
+
+    def tables(self) -> List[TextractTable]:
+        """All tables, by page and then in the order Textract reported them"""
+        tables = []
+        for page in sorted(set(self.tables_by_page) | set(self._orphan_cells)):
+            for table_id in self.tables_by_page.get(page, []):
+                tables.append(self._build(page, table_id, self.children(self.by_id[table_id], "CELL")))
+            for cells in self._split_orphans(self._orphan_cells.get(page, [])):
+                tables.append(self._build(page, None, cells))
+        return [table for table in tables if table.grid]
+
+    def _split_orphans(self, cells: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Without TABLE blocks, a repeated (row, col) on a page starts a new table"""
+        groups: List[List[Dict[str, Any]]] = []
+        seen: set = set()
+        for cell in cells:
+            position = (cell.get("RowIndex"), cell.get("ColumnIndex"))
+            if not groups or position in seen:
+                groups.append([])
+                seen = set()
+            seen.add(position)
+            groups[-1].append(cell)
+        return groups
+
+    def _build(self, page: int, table_id: Optional[str], cells: List[Dict[str, Any]]) -> TextractTable:
+        n_rows = max((cell.get("RowIndex", 0) + cell.get("RowSpan", 1) - 1 for cell in cells), default=0)
+        n_cols = max((cell.get("ColumnIndex", 0) + cell.get("ColumnSpan", 1) - 1 for cell in cells), default=0)
+        grid = [[""] * n_cols for _ in range(n_rows)]
+        header_rows = []
+        for cell in cells:
+            row, col = cell.get("RowIndex", 0) - 1, cell.get("ColumnIndex", 0) - 1
+            if row < 0 or col < 0:
+                continue
+            # Spanned cells keep their text at the top-left position
+            grid[row][col] = self.text(cell)
+            if "COLUMN_HEADER" in cell.get("EntityTypes", []):
+                header_rows.append(row)
+        return TextractTable(page, table_id, grid, header_rows)
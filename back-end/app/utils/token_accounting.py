@@ -0,0 +1,166 @@
+import re
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .metrics import REGISTRY
+from .rate_limiter import estimate_tokens
+
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "LLM tokens by pipeline stage, model and kind (prompt/completion)")
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "llm_prompt_tokens",
+    "Prompt size per LLM call by pipeline stage",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+)
+LLM_PROMPT_BUDGET = REGISTRY.counter("llm_prompt_budget_total", "Prompts over their stage budget by stage and outcome")
+
+_ledger: ContextVar[Optional["TokenLedger"]] = ContextVar("llm_token_ledger", default=None)
+
+
+class TokenReservation:
+    """
+    Estimated tokens of one in-flight call, held on the ledger so concurrent
+    calls see each other before any of them finishes. Recorded usage settles
+    it; `release` returns whatever is left when the call ends.
+    """
+
+    def __init__(self, ledger: "TokenLedger", tokens: int):
+        self.ledger = ledger
+        self.tokens = tokens
+
+    def settle(self, used: int):
+        settled = min(self.tokens, used)
+        self.tokens -= settled
+        self.ledger.reserved -= settled
+
+    def release(self):
+        self.settle(self.tokens)
+
+
+class TokenLedger:
+    """
+    Token usage of one request, call by call. Calls made by tasks spawned
+    after `start_token_ledger` land in the same ledger.
+    """
+
+    def __init__(self, budget: int = 0):
+        self.budget = budget
+        self.pages: Optional[int] = None
+        self.calls: List[Dict[str, Any]] = []
+        self.reserved = 0  # estimates of calls still in flight
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(call["prompt_tokens"] + call["completion_tokens"] for call in self.calls)
+
+    def record(self, stage: str, model: str, prompt_tokens: int, completion_tokens: int,
+               estimated: bool = False, compacted: bool = False):
+        self.calls.append({
+            "stage": stage,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated": estimated,
+            "compacted": compacted,
+        })
+
+    def check_budget(self, stage: str, estimated_tokens: int) -> TokenReservation:
+        """
+        Refuse a call that would take the request past its token budget,
+        counting calls still in flight; otherwise reserve its estimate
+        """
+        if self.budget and self.total_tokens + self.reserved + estimated_tokens > self.budget:
+            LLM_PROMPT_BUDGET.inc(stage=stage, outcome="request_budget")
+            raise HTTPException(
+                status_code=413,
+                detail=f"Request token budget of {self.budget} exhausted: {self.total_tokens} used, "
+                       f"{self.reserved} reserved, {stage} call needs ~{estimated_tokens}"
+            )
+        self.reserved += estimated_tokens
+        return TokenReservation(self, estimated_tokens)
+
+    def summary(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, Any]] = {}
+        for call in self.calls:
+            stage = stages.setdefault(call["stage"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "models": []})
+            stage["calls"] += 1
+            stage["prompt_tokens"] += call["prompt_tokens"]
+            stage["completion_tokens"] += call["completion_tokens"]
+            if call["model"] not in stage["models"]:
+                stage["models"].append(call["model"])
+        prompt_tokens = sum(stage["prompt_tokens"] for stage in stages.values())
+        completion_tokens = sum(stage["completion_tokens"] for stage in stages.values())
+        summary = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "calls": len(self.calls),
+            "estimated": any(call["estimated"] for call in self.calls),
+            "stages": stages,
+            "budget": self.budget or None,
+        }
+        if self.pages and "analysis" in stages:
+            summary["pages"] = self.pages
+            summary["analysis_prompt_tokens_per_page"] = round(stages["analysis"]["prompt_tokens"] / self.pages, 1)
+        return summary
+
+
+def start_token_ledger(budget: int = 0) -> TokenLedger:
+    ledger = TokenLedger(budget)
+    _ledger.set(ledger)
+    return ledger
+
+
+def current_ledger() -> Optional[TokenLedger]:
+    return _ledger.get()
+
+
+def prompt_tokens(payload: Dict[str, Any]) -> int:
+    return sum(estimate_tokens(str(message.get("content", ""))) for message in payload.get("messages", []))
+
+
+def record_usage(stage: str, payload: Dict[str, Any], usage: Optional[Dict[str, Any]], content: str,
+                 compacted: bool = False, reservation: Optional[TokenReservation] = None) -> Tuple[int, int]:
+    """
+    Account one completed call. Uses the provider's `usage` block, or
+    estimates from the text when the backend did not send one, and settles
+    that much of the call's budget reservation. Returns the (prompt,
+    completion) token counts.
+    """
+    usage = usage or {}
+    estimated = usage.get("prompt_tokens") is None or usage.get("completion_tokens") is None
+    prompt = usage.get("prompt_tokens")
+    completion = usage.get("completion_tokens")
+    prompt = int(prompt) if prompt is not None else prompt_tokens(payload)
+    completion = int(completion) if completion is not None else estimate_tokens(content or "")
+    model = payload.get("model", "")
+
+    LLM_TOKENS.inc(prompt, stage=stage, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion, stage=stage, model=model, kind="completion")
+    LLM_PROMPT_TOKENS.observe(prompt, stage=stage)
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.record(stage, model, prompt, completion, estimated, compacted)
+    if reservation is not None:
+        reservation.settle(prompt + completion)
+    return prompt, completion
+
+
+_TABLE_RULE = re.compile(r"^[ \t]*\|?([ \t]*:?-{3,}:?[ \t]*\|)+[ \t]*:?-*:?[ \t]*(\n|$)", re.MULTILINE)
+_CELL_PADDING = re.compile(r"[ \t]*\|[ \t]*")
+_SPACES = re.compile(r"[ \t]{2,}")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def compact_prompt(text: str) -> str:
+    """
+    Lossless-for-the-model compaction of statement text: drops markdown table
+    rule rows and cell padding, collapses runs of spaces and blank lines.
+    Every number and description survives.
+    """
+    text = _TABLE_RULE.sub("", text)
+    text = _CELL_PADDING.sub("|", text)
+    text = _SPACES.sub(" ", text)
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
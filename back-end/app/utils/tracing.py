@@ -0,0 +1,358 @@
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from ..core import config
+from .metrics import REGISTRY
+
+SPANS_EXPORTED = REGISTRY.counter("trace_spans_exported_total", "Finished spans handed to the trace exporter")
+SPANS_DROPPED = REGISTRY.counter("trace_spans_dropped_total", "Finished spans dropped, by reason")
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class Span:
+    """
+    One timed operation, shaped like an OpenTelemetry span. A span that isn't
+    sampled still carries the trace context (so children and outgoing
+    traceparents stay consistent) but records nothing.
+    """
+
+    def __init__(self, tracer: Optional["Tracer"], name: str, trace_id: str, span_id: str,
+                 parent_span_id: str = "", kind: int = SPAN_KIND_INTERNAL, sampled: bool = True,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = {k: v for k, v in (attributes or {}).items() if v is not None}
+        self.events: List[Dict[str, Any]] = []
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def recording(self) -> bool:
+        return self.sampled and self.end_ns is None and self.tracer is not None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def add(self, key: str, amount: float = 1):
+        """Counter-style attribute: retries, cached chunks, tokens across attempts"""
+        if self.recording:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        if self.recording:
+            self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": dict(attributes or {})})
+
+    def record_exception(self, e: BaseException):
+        self.add_event("exception", {
+            "exception.type": type(e).__name__,
+            "exception.message": str(getattr(e, "detail", "") or e),
+        })
+        self.status_code = STATUS_ERROR
+        self.status_message = str(getattr(e, "detail", "") or e)[:500]
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled and self.tracer is not None:
+                self.tracer._finished(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [
+                {"name": event["name"], "timeUnixNano": str(event["time_ns"]),
+                 "attributes": _otlp_attributes(event["attributes"])}
+                for event in self.events
+            ],
+            "status": {"code": self.status_code, **({"message": self.status_message} if self.status_message else {})},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class SpanExporter:
+    """Receives OTLP/JSON ExportTraceServiceRequest bodies from the export thread"""
+
+    def export(self, request: Dict[str, Any]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class OTLPFileExporter(SpanExporter):
+    """
+    One ExportTraceServiceRequest per line, the layout the OpenTelemetry
+    Collector's file exporter writes and its otlpjsonfile receiver reads.
+    Each batch is a single append, so several workers can share the file.
+    A batch that would take the file past `max_bytes` first rotates it to
+    path.1 (path.1 to path.2, ...), keeping `backups` old files; 0 disables
+    the cap.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = 1):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, request):
+        line = (json.dumps(request, separators=(",", ":")) + "\n").encode()
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if self.max_bytes and size and size + len(line) > self.max_bytes:
+            self._rotate()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _rotate(self):
+        # Another worker may have rotated first; a missing file is fine
+        for index in range(self.backups - 1, 0, -1):
+            try:
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+            except FileNotFoundError:
+                pass
+        try:
+            if self.backups:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class OTLPHTTPExporter(SpanExporter):
+    """POSTs OTLP/JSON to a collector's /v1/traces (e.g. a local collector or Jaeger)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, request):
+        body = json.dumps(request, separators=(",", ":")).encode()
+        http_request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(http_request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """
+    Creates spans and batches finished ones to the exporter from a
+    background thread, so exporting never runs on the event loop. The queue
+    is bounded: under a backlog the oldest spans are dropped (and counted).
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter], service_name: str, sample_ratio: float = 1.0,
+                 export_interval: float = 2.0, max_queue: int = 2048, max_batch: int = 512):
+        self.exporter = exporter
+        self.service_name = service_name
+        self.sample_ratio = sample_ratio
+        self.export_interval = export_interval
+        self.max_batch = max_batch
+        self._queue: Deque[Span] = deque(maxlen=max_queue)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start_span(self, name: str, kind: int = SPAN_KIND_INTERNAL, parent: Optional[Span] = None,
+                   traceparent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """
+        A started span, child of `parent` (default: the current span) or of
+        the remote parent in a W3C `traceparent` header; a new trace otherwise.
+        """
+        parent = parent or _current_span.get()
+        remote = _TRACEPARENT.match(traceparent or "") if parent is None else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        elif remote is not None:
+            trace_id, parent_id, sampled = remote.group(1), remote.group(2), int(remote.group(3), 16) & 1 == 1
+        else:
+            trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", "", random.random() < self.sample_ratio
+        return Span(self, name, trace_id, f"{random.getrandbits(64):016x}", parent_id, kind,
+                    sampled and self.exporter is not None, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, traceparent: Optional[str] = None,
+             attributes: Optional[Dict[str, Any]] = None):
+        """Starts a span, makes it current for the block and ends it; errors mark it failed"""
+        span = self.start_span(name, kind, traceparent=traceparent, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def _finished(self, span: Span):
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                SPANS_DROPPED.inc(reason="queue_full")
+            self._queue.append(span)
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        if len(self._queue) >= self.max_batch:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.export_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Exports everything queued so far; safe to call from any thread"""
+        while self.exporter is not None:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            if not batch:
+                return
+            try:
+                self.exporter.export(self._request(batch))
+                SPANS_EXPORTED.inc(len(batch))
+            except Exception as e:
+                print(f"Error exporting {len(batch)} trace spans: {str(e)}")
+                SPANS_DROPPED.inc(len(batch), reason="export_failed")
+                return
+
+    def shutdown(self):
+        """Stops the export thread after a last flush; a later span starts it again"""
+        with self._lock:
+            self._stopping, thread = True, self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout=self.export_interval + 5)
+        self.flush()
+        with self._lock:
+            self._stopping, self._thread = False, None
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def _request(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({
+                    "service.name": self.service_name,
+                    "process.pid": os.getpid(),
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+
+def current_span() -> Span:
+    """The active span, or a non-recording stand-in outside any trace"""
+    return _current_span.get() or Span(None, "", "0" * 32, "0" * 16, sampled=False)
+
+
+def traced(name: str, kind: int = SPAN_KIND_INTERNAL):
+    """Runs the decorated function (sync or async) inside a span named `name`"""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(name, kind):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name, kind):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_tracer: Optional[Tracer] = None
+
+
+def _exporter_from_config() -> Optional[SpanExporter]:
+    if not config.TRACING_ENABLED or config.TRACE_EXPORTER == "none":
+        return None
+    if config.TRACE_EXPORTER == "otlp_http":
+        return OTLPHTTPExporter(config.TRACE_OTLP_ENDPOINT)
+    if config.TRACE_EXPORTER == "file":
+        return OTLPFileExporter(config.TRACE_FILE_PATH, config.TRACE_FILE_MAX_BYTES, config.TRACE_FILE_BACKUPS)
+    raise Exception(f"Unknown TRACE_EXPORTER {config.TRACE_EXPORTER}: use file, otlp_http or none")
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(
+            _exporter_from_config(),
+            config.TRACE_SERVICE_NAME,
+            sample_ratio=config.TRACE_SAMPLE_RATIO,
+            export_interval=config.TRACE_EXPORT_INTERVAL,
+            max_queue=config.TRACE_MAX_QUEUE
+        )
+    return _tracer
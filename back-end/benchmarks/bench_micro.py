@@ -0,0 +1,207 @@
+"""
+Micro-benchmarks for the CPU-bound pieces of the pipeline.
+
+    python -m benchmarks.bench_micro
+    python -m benchmarks.bench_micro --save-baseline
+    python -m benchmarks.bench_micro --compare
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from .common import compare, environment, load_baseline, save_results, time_call
+
+
+def textract_blocks(lines: int) -> List[Dict[str, Any]]:
+    """Synthetic Textract LINE blocks laid out top to bottom in three columns"""
+    blocks = []
+    for i in range(lines):
+        blocks.append({
+            "BlockType": "LINE",
+            "Text": f"01/{(i % 28) + 1:02d}/2024 CARD PURCHASE #{i} 12.34",
+            "Geometry": {"BoundingBox": {"Left": 0.05 + 0.3 * (i % 3), "Top": i / max(1, lines)}},
+        })
+    return blocks
+
+
+def statement_transactions(rows: int) -> List[Any]:
+    """Synthetic statement rows as Pydantic models (the pre-columnar representation)"""
+    from datetime import datetime, timedelta
+    from decimal import Decimal
+    from app.models.transaction import Transaction
+    start = datetime(2024, 1, 1)
+    return [
+        Transaction(
+            date=start + timedelta(days=i % 365),
+            description=f"CARD PURCHASE MERCHANT {i % 500}",
+            amount=Decimal((i * 7919) % 100000 - 50000) / 100,
+            transaction_type="debit",
+            balance_after=Decimal("1000.00"),
+            category="purchases"
+        )
+        for i in range(rows)
+    ]
+
+
+def textract_statement(pages: int, rows_per_page: int) -> List[Dict[str, Any]]:
+    """Multi-page Textract result: a transaction table and a summary table per page"""
+    from .stubs import textract_table
+    blocks = []
+    for page in range(1, pages + 1):
+        rows = [["Date", "Description", "Withdrawals", "Deposits", "Balance"]]
+        for i in range(rows_per_page):
+            rows.append([f"03/{(i % 28) + 1:02d}/2024", f"CARD PURCHASE {i}", f"{i % 90 + 1}.25", "", "1,000.00"])
+        blocks += textract_table(page, f"p{page}-summary", [["Account", "Number"], ["Checking", "1234"]])
+        blocks += textract_table(page, f"p{page}-transactions", rows)
+    return blocks
+
+
+def statement_dates(rows: int) -> List[str]:
+    """Chronological day-first dates, ~300 rows per day"""
+    from datetime import datetime, timedelta
+    start = datetime(2023, 1, 1)
+    return [(start + timedelta(days=i // 300)).strftime("%d/%m/%Y") for i in range(rows)]
+
+
+def strptime_dates(values: List[str]) -> List[Any]:
+    """The per-value format loop parse_date used before date inference"""
+    from datetime import datetime
+    formats = ['%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%y', '%m-%d-%y', '%Y-%m-%d']
+    parsed = []
+    for value in values:
+        for fmt in formats:
+            try:
+                parsed.append(datetime.strptime(value, fmt))
+                break
+            except ValueError:
+                continue
+    return parsed
+
+
+def maverick_response() -> str:
+    from app.utils.llm_backends import FAKE_ANALYSIS
+    # Reproduce the quirks _clean_json_string exists for: fences, arithmetic, trailing commas
+    body = json.dumps(FAKE_ANALYSIS, indent=2)
+    body = body.replace("18250.0", "12000.00 + 6250.00")
+    body = body.replace("}\n}", "},\n}")
+    return f"Here is the analysis:\n```json\n{body}\n```"
+
+
+def cases(size: str) -> Dict[str, Callable[[], Any]]:
+    from app.api.document_processing.bucket_score_service import BucketScoreService
+    from app.api.document_processing.local_pdf_extractor import count_pages, extract_pages
+    from app.api.document_processing.maverick_analyzer import MaverickAnalyzer
+    from app.models.transaction_table import TransactionTable
+    from app.services.analysis_store import SQLiteAnalysisStore
+    from app.services.llama_classifier import LlamaClassifier
+    from app.services.rescoring import RescoreSweep, expand_grid
+    from app.services.rules import load_rules
+    from app.core import config
+    from app.services.preprocessor import PreprocessingService
+    from app.utils.date_inference import parse_dates
+    from app.utils.llm_backends import FAKE_ANALYSIS
+    from app.utils.parsing import StatementParser
+
+    analyzer = MaverickAnalyzer()
+    structured = analyzer._build_structured_analysis(FAKE_ANALYSIS)
+    raw_response = maverick_response()
+    preprocessor = PreprocessingService()
+    preprocessor.debug = False
+    blocks = textract_blocks(200 if size == "small" else 1000)
+    dates = ["03/15/2024", "2024-03-15", "15-03-2024", "03/15/24"] * 250
+    amounts = ["$1,234.56", "(45.00)", "12.30", "$ 7,000.00"] * 250
+    descriptions = ["  card purchase #123 @ Staples!!  ", "ACH DEPOSIT - ACME CORP."] * 500
+    sample_pdf = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "bs_2.pdf")
+    sample_pages = list(range(count_pages(sample_pdf)))
+    classifier = LlamaClassifier()
+    classifier.debug = False
+    rows = 10_000 if size == "small" else 100_000
+    models = statement_transactions(rows)
+    table = TransactionTable.from_transactions(models)
+
+    textract_pages = 20 if size == "small" else 200
+    textract_result = {"Blocks": textract_statement(textract_pages, 50)}
+    column_dates = statement_dates(100_000)
+    strptime_rows = 10_000 if size == "small" else 100_000
+
+    stored = 1_000 if size == "small" else 10_000
+    store = SQLiteAnalysisStore(":memory:")
+    for i in range(stored):
+        store.save(f"h{i}", f"a{i % 300}", "s.pdf", {}, structured, {"final_score": 70.0}, {})
+    rescore_grid = {"weights": {"cash_flow": [0.3, 0.4, 0.5]}, "thresholds": {"low_score": [55, 60, 65]}}
+
+    def rescore_sweep():
+        return list(RescoreSweep(expand_grid(rescore_grid)).run(store.iter_analyses()))
+
+    rules = load_rules(config.SCORING_RULES_PATH)
+    varied = [dict(structured, cash_flow=dict(structured["cash_flow"], net_flow=float(n - 500) * 10))
+              for n in range(1000)]
+
+    def model_metrics():
+        # The row-at-a-time aggregation extract_metrics used before TransactionTable
+        inflow = sum(t.amount for t in models if t.amount > 0)
+        outflow = abs(sum(t.amount for t in models if t.amount < 0))
+        return inflow, outflow, sum(abs(t.amount) for t in models) / len(models)
+
+    return {
+        "bucket_scores": lambda: BucketScoreService.calculate_bucket_scores(structured),
+        "bucket_scores_x1000": lambda: [BucketScoreService.calculate_bucket_scores(a) for a in varied],
+        "bucket_scores_rules_x1000": lambda: [rules.bucket_scores(a) for a in varied],
+        "clean_json_string": lambda: analyzer._clean_json_string(raw_response),
+        "structure_analysis": lambda: analyzer._structure_analysis(raw_response),
+        "local_pdf_text_layer_9_pages": lambda: extract_pages(sample_pdf, sample_pages),
+        "preprocess_textract_blocks": lambda: preprocessor.textract_blocks_table(blocks),
+        f"metrics_models_{rows}_rows": model_metrics,
+        f"metrics_table_{rows}_rows": lambda: classifier.extract_metrics(table),
+        "dates_inferred_100000_rows": lambda: parse_dates(column_dates),
+        f"dates_strptime_{strptime_rows}_rows": lambda: strptime_dates(column_dates[:strptime_rows]),
+        f"textract_tables_{textract_pages}_pages": lambda: StatementParser(textract_result).extract_table_data(),
+        f"rescore_{stored}_analyses_9_scenarios": rescore_sweep,
+        "preprocess_parse_date_x1000": lambda: [preprocessor.parse_date(d) for d in dates],
+        "preprocess_parse_amount_x1000": lambda: [preprocessor.parse_amount(a) for a in amounts],
+        "preprocess_clean_description_x1000": lambda: [preprocessor.clean_description(d) for d in descriptions],
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--size", choices=["small", "large"], default="small")
+    parser.add_argument("--only", nargs="*", help="run only these cases")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    summary = {}
+    for name, fn in cases(args.size).items():
+        if args.only and name not in args.only:
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = time_call(fn, repeat=args.repeat)
+        summary[name] = stats
+        print(f"{name:<36} p50={stats['p50_ms']:9.3f}ms p95={stats['p95_ms']:9.3f}ms mean={stats['mean_ms']:9.3f}ms")
+
+    results = {"environment": environment(), "settings": {"repeat": args.repeat, "size": args.size}, "summary": summary}
+    print(f"Saved {save_results('micro', results, baseline=args.save_baseline)}")
+
+    if args.compare:
+        baseline = load_baseline("micro")
+        if baseline is None:
+            print("No baseline saved; run with --save-baseline first")
+            return 1
+        regressions = compare(summary, baseline["summary"], {"p50_ms": "lower"}, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
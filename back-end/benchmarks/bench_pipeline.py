@@ -0,0 +1,209 @@
+"""
+End-to-end load test for /upload + /analyze, driven through the ASGI app with
+stubbed LlamaParse and LLM backends.
+
+    python -m benchmarks.bench_pipeline --concurrency 1 4 16
+    python -m benchmarks.bench_pipeline --quick --save-baseline
+    python -m benchmarks.bench_pipeline --quick --compare
+    python -m benchmarks.bench_pipeline --quick --stream   # adds time-to-first-score
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List
+
+# Offline configuration must be in place before the app modules are imported
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "offline-benchmark")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("ANALYSIS_STORE_PATH", ":memory:")
+os.environ.setdefault("JOB_STORE_PATH", ":memory:")
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "64")
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+import httpx
+
+from .common import (
+    LoopLagProbe,
+    compare,
+    environment,
+    load_baseline,
+    peak_rss_mb,
+    save_results,
+    summarize,
+)
+from .stubs import StubDocumentParser
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "b_s1.pdf")
+API_PREFIX = "/api/v1/analyze"
+
+
+def install_stubs(app, args: argparse.Namespace):
+    from app.api.dependencies import get_document_parser
+    from app.utils.llm_backends import FakeBackend, set_completion_backend
+
+    set_completion_backend(FakeBackend(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, seed=1))
+    parser = StubDocumentParser(
+        latency_ms=args.parse_latency_ms,
+        jitter_ms=args.parse_latency_ms * 0.2,
+        transactions=args.transactions
+    )
+    app.dependency_overrides[get_document_parser] = lambda: parser
+
+
+async def one_request(client: httpx.AsyncClient, pdf_bytes: bytes, stream: bool = False) -> Dict[str, float]:
+    filename = f"bench-{uuid.uuid4().hex}.pdf"
+    started = time.perf_counter()
+    upload = await client.post(f"{API_PREFIX}/upload", files={"file": (filename, pdf_bytes, "application/pdf")})
+    uploaded = time.perf_counter()
+    upload.raise_for_status()
+    if not stream:
+        analysis = await client.post(f"{API_PREFIX}/analyze/{filename}")
+        finished = time.perf_counter()
+        analysis.raise_for_status()
+        return {"upload": uploaded - started, "analyze": finished - uploaded, "total": finished - started}
+
+    # ASGITransport buffers the body, so time to first score comes from the
+    # server-side elapsed_ms stamped on each event
+    analysis = await client.post(f"{API_PREFIX}/analyze/{filename}/stream")
+    finished = time.perf_counter()
+    analysis.raise_for_status()
+    events = [json.loads(line) for line in analysis.text.splitlines()]
+    if events[-1]["event"] == "error":
+        raise httpx.HTTPError(events[-1]["detail"])
+    first_score = next((event["elapsed_ms"] for event in events if event["event"] == "bucket"), events[-1]["elapsed_ms"])
+    return {
+        "upload": uploaded - started,
+        "analyze": finished - uploaded,
+        "first_score": first_score / 1000.0,
+        "total": finished - started,
+    }
+
+
+async def run_level(app, pdf_bytes: bytes, concurrency: int, requests: int, stream: bool = False) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: List[Dict[str, float]] = []
+    errors = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        async with semaphore:
+            try:
+                timings.append(await one_request(client, pdf_bytes, stream))
+            except httpx.HTTPError:
+                errors += 1
+
+    probe = LoopLagProbe()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        probe.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        loop_lag = await probe.stop()
+
+    total = summarize([t["total"] for t in timings])
+    level = {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(timings) / elapsed, 3) if elapsed else 0.0,
+        "latency": total,
+        "upload_latency": summarize([t["upload"] for t in timings]),
+        "analyze_latency": summarize([t["analyze"] for t in timings]),
+        "loop_lag": loop_lag,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if stream:
+        level["first_score_latency"] = summarize([t["first_score"] for t in timings])
+    return level
+
+
+def flatten(levels: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    return {
+        f"c{level['concurrency']}": {
+            "throughput_rps": level["throughput_rps"],
+            "p95_ms": level["latency"]["p95_ms"],
+            "p99_ms": level["latency"]["p99_ms"],
+            "loop_lag_p99_ms": level["loop_lag"]["p99_ms"],
+        }
+        for level in levels
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests-per-level", type=int, default=0, help="default: max(8, 2 x concurrency)")
+    parser.add_argument("--parse-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=2500.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=800.0)
+    parser.add_argument("--transactions", type=int, default=120)
+    parser.add_argument("--quick", action="store_true", help="1/10 latencies and fewer levels")
+    parser.add_argument("--stream", action="store_true", help="use the NDJSON endpoint and report time to first bucket score")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="fail on regression against the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own stdout logging")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.concurrency = [1, 4, 16]
+        args.parse_latency_ms /= 10
+        args.llm_latency_ms /= 10
+        args.llm_jitter_ms /= 10
+
+    import main as application
+    install_stubs(application.app, args)
+    with open(SAMPLE_PDF, "rb") as f:
+        pdf_bytes = f.read()
+
+    levels = []
+    for concurrency in args.concurrency:
+        requests = args.requests_per_level or max(8, 2 * concurrency)
+        sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with sink:
+            level = asyncio.run(run_level(application.app, pdf_bytes, concurrency, requests, args.stream))
+        levels.append(level)
+        print(
+            f"c={concurrency:<3} n={requests:<4} {level['throughput_rps']:8.2f} req/s  "
+            f"p50={level['latency']['p50_ms']:8.1f}ms p95={level['latency']['p95_ms']:8.1f}ms "
+            f"p99={level['latency']['p99_ms']:8.1f}ms  lag_p99={level['loop_lag']['p99_ms']:6.1f}ms  "
+            f"rss={level['peak_rss_mb']:.0f}MB errors={level['errors']}"
+            + (f"  first_score_p50={level['first_score_latency']['p50_ms']:.1f}ms" if args.stream else "")
+        )
+
+    results = {
+        "environment": environment(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare", "verbose")},
+        "levels": levels,
+        "summary": flatten(levels),
+    }
+    print(f"Saved {save_results('pipeline', results, baseline=args.save_baseline)}")
+
+    if args.compare:
+        baseline = load_baseline("pipeline")
+        if baseline is None:
+            print("No baseline saved; run with --save-baseline first")
+            return 1
+        regressions = compare(
+            results["summary"],
+            baseline["summary"],
+            {"throughput_rps": "higher", "p95_ms": "lower", "p99_ms": "lower"},
+            args.tolerance
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Time-to-first-token with and without prompt-prefix reuse, against a real
+OpenAI-compatible server (vLLM with --enable-prefix-caching, llama.cpp
+server, or a hosted provider with prompt caching).
+
+Both modes send the same rendered templates with different statements;
+"no_reuse" puts a per-request nonce in front of the system prefix, which is
+what interleaving request data into the instructions used to do.
+
+    python -m benchmarks.bench_prefix_cache --base-url http://localhost:8000/v1 --model meta-llama/Llama-3.1-8B-Instruct
+    python -m benchmarks.bench_prefix_cache --base-url http://localhost:8080/v1 --llama-cpp
+    python -m benchmarks.bench_prefix_cache --dry-run   # plumbing check with the fake backend
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List
+
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "offline-benchmark")
+
+from .common import environment, save_results, summarize
+from .stubs import statement_markdown
+
+
+async def first_token(backend, payload: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    ttft = None
+    usage = None
+    async for chunk in backend.stream(payload):
+        if ttft is None and any((choice.get("delta") or {}).get("content") for choice in chunk.get("choices") or []):
+            ttft = time.perf_counter() - started
+        usage = chunk.get("usage") or usage
+    total = time.perf_counter() - started
+    details = (usage or {}).get("prompt_tokens_details") or {}
+    return {
+        "ttft": ttft if ttft is not None else total,
+        "total": total,
+        "prompt_tokens": (usage or {}).get("prompt_tokens"),
+        "cached_tokens": details.get("cached_tokens"),
+    }
+
+
+def build_payload(prompt, args: argparse.Namespace, reuse: bool) -> Dict[str, Any]:
+    system = prompt.system if reuse else f"Request {uuid.uuid4().hex}\n\n{prompt.system}"
+    payload = {
+        "model": args.model,
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": prompt.user}],
+        "temperature": 0.2,
+        "max_tokens": args.max_tokens,
+    }
+    if args.llama_cpp:
+        payload["cache_prompt"] = True
+    return payload
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.services.prompts import get_prompt_registry
+    from app.utils.llm_backends import FakeBackend, OpenAICompatibleBackend
+
+    backend = (
+        FakeBackend(latency_ms=50, stream_chunk_chars=16)
+        if args.dry_run else OpenAICompatibleBackend(args.base_url, args.api_key)
+    )
+    template = get_prompt_registry().get(args.template)
+    prompts = [
+        template.render(document_content=statement_markdown(args.transactions, seed=i), known_recurring="    - none")
+        for i in range(args.requests)
+    ]
+    samples: Dict[str, List[Dict[str, Any]]] = {"shared_prefix": [], "no_reuse": []}
+    try:
+        # Warm the shared prefix once so every measured call can hit it
+        await first_token(backend, build_payload(prompts[0], args, reuse=True))
+        for prompt in prompts:
+            # Interleave the modes so server-side drift affects both equally
+            samples["shared_prefix"].append(await first_token(backend, build_payload(prompt, args, reuse=True)))
+            samples["no_reuse"].append(await first_token(backend, build_payload(prompt, args, reuse=False)))
+    finally:
+        await backend.close()
+
+    modes = {
+        mode: {
+            "ttft": summarize([s["ttft"] for s in runs]),
+            "total": summarize([s["total"] for s in runs]),
+            "prompt_tokens": runs[-1]["prompt_tokens"],
+            "cached_tokens": next((s["cached_tokens"] for s in reversed(runs) if s["cached_tokens"] is not None), None),
+        }
+        for mode, runs in samples.items()
+    }
+    shared, cold = modes["shared_prefix"]["ttft"]["p50_ms"], modes["no_reuse"]["ttft"]["p50_ms"]
+    return {
+        "template": template.id,
+        "prefix_hash": template.prefix_hash,
+        "modes": modes,
+        "ttft_p50_speedup": round(cold / shared, 3) if shared else None,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("LLM_BASE_URL", "http://localhost:8000/v1"))
+    parser.add_argument("--api-key", default=os.getenv("LLM_API_KEY"))
+    parser.add_argument("--model", default=os.getenv("LLM_MODEL", "llama4-maverick"))
+    parser.add_argument("--template", default="analysis", help="prompt template to render")
+    parser.add_argument("--requests", type=int, default=20, help="statements per mode")
+    parser.add_argument("--transactions", type=int, default=80, help="transactions per synthetic statement")
+    parser.add_argument("--max-tokens", type=int, default=16, help="only the first token matters")
+    parser.add_argument("--llama-cpp", action="store_true", help="send cache_prompt for llama.cpp server")
+    parser.add_argument("--dry-run", action="store_true", help="use the fake backend (no prefix cache)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    for mode, stats in results["modes"].items():
+        print(
+            f"{mode:<14} ttft p50={stats['ttft']['p50_ms']:8.1f}ms p95={stats['ttft']['p95_ms']:8.1f}ms  "
+            f"total p50={stats['total']['p50_ms']:8.1f}ms  prompt_tokens={stats['prompt_tokens']} "
+            f"cached_tokens={stats['cached_tokens']}"
+        )
+    print(f"TTFT p50 speedup from prefix reuse: {results['ttft_p50_speedup']}x ({results['template']}, prefix {results['prefix_hash']})")
+    results.update({
+        "environment": environment(),
+        "settings": {k: v for k, v in vars(args).items() if k != "api_key"},
+    })
+    print(f"Saved {save_results('prefix_cache', results)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Cold-start cost of the API: `import main` in fresh interpreters, measured with
+`python -X importtime`, plus what the first request pays to build the
+pipeline services lazily.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --budget-ms 800
+    python -m benchmarks.bench_startup --save-baseline
+    python -m benchmarks.bench_startup --compare
+
+Fails (exit 1) when the median import time is over --budget-ms, when a module
+listed in --forbid is imported at startup, or with --compare on a regression
+against the saved baseline.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from .common import compare, environment, load_baseline, save_results, summarize
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+# Modules that should only load when a request needs them
+DEFAULT_FORBIDDEN = ["llama_parse", "llama_index", "boto3", "numpy", "pypdf", "aiohttp"]
+
+FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+from app.api.dependencies import preload_dependencies
+preload_dependencies()
+print(time.perf_counter() - started)
+"""
+
+
+def offline_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("LLAMA_CLOUD_API_KEY", "offline-benchmark")
+    env.setdefault("LLM_BACKEND", "fake")
+    env.setdefault("ANALYSIS_STORE_PATH", ":memory:")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every `-X importtime` line"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_main() -> List[Tuple[str, int, int]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=offline_env(), capture_output=True, text=True, check=True
+    )
+    return parse_importtime(completed.stderr)
+
+
+def first_request_seconds() -> float:
+    completed = subprocess.run(
+        [sys.executable, "-c", "import main\n" + FIRST_REQUEST],
+        cwd=BACKEND_DIR, env=offline_env(), capture_output=True, text=True, check=True
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Self time per top-level package, in microseconds"""
+    totals: Dict[str, int] = defaultdict(int)
+    for module, self_us, _ in rows:
+        totals[module.split(".")[0]] += self_us
+    return dict(totals)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import_samples, first_request_samples = [], []
+    packages: Dict[str, List[int]] = defaultdict(list)
+    imported = set()
+    for _ in range(args.runs):
+        rows = import_main()
+        import_samples.append(next(cumulative for module, _, cumulative in rows if module == "main") / 1e6)
+        for package, self_us in by_package(rows).items():
+            packages[package].append(self_us)
+        imported.update(module for module, _, _ in rows)
+        first_request_samples.append(first_request_seconds())
+
+    heaviest = sorted(
+        ((package, sorted(samples)[len(samples) // 2] / 1000) for package, samples in packages.items()),
+        key=lambda item: item[1], reverse=True
+    )[:args.top]
+    return {
+        "import_main": summarize(import_samples),
+        "first_request_build": summarize(first_request_samples),
+        "heaviest_packages_ms": {package: round(ms, 2) for package, ms in heaviest},
+        "forbidden_imported": sorted(
+            name for name in args.forbid
+            if any(module == name or module.startswith(name + ".") for module in imported)
+        ),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="max median `import main` time")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="modules startup must not import")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages to report")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="fail on regression against the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    imports, first = results["import_main"], results["first_request_build"]
+    print(f"import main        p50={imports['p50_ms']:8.1f}ms  max={imports['max_ms']:8.1f}ms  (budget {args.budget_ms:.0f}ms)")
+    print(f"first request build p50={first['p50_ms']:8.1f}ms  max={first['max_ms']:8.1f}ms")
+    for package, ms in results["heaviest_packages_ms"].items():
+        print(f"  {package:<24} {ms:8.1f}ms")
+
+    failures = []
+    if imports["p50_ms"] > args.budget_ms:
+        failures.append(f"import main p50 {imports['p50_ms']:.1f}ms is over the {args.budget_ms:.0f}ms budget")
+    if results["forbidden_imported"]:
+        failures.append(f"startup imports {', '.join(results['forbidden_imported'])}")
+
+    results.update({
+        "environment": environment(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare")},
+        "summary": {"startup": {"import_p50_ms": imports["p50_ms"], "first_request_p50_ms": first["p50_ms"]}},
+    })
+    print(f"Saved {save_results('startup', results, baseline=args.save_baseline)}")
+
+    if args.compare:
+        baseline = load_baseline("startup")
+        if baseline is None:
+            print("No baseline saved; run with --save-baseline first")
+            return 1
+        failures.extend(compare(
+            results["summary"], baseline["summary"], {"import_p50_ms": "lower"}, args.tolerance
+        ))
+    for line in failures:
+        print(f"REGRESSION {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import asyncio
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+MERCHANTS = [
+    ("ACH DEPOSIT ACME CORP PAYROLL", 3250.00),
+    ("OFFICE RENT 221B", -2500.00),
+    ("AUTO LOAN PMT CAPITAL ONE", -410.00),
+    ("CARD PURCHASE STAPLES 0412", -86.15),
+    ("VERIZON WIRELESS AUTOPAY", -120.40),
+    ("STRIPE TRANSFER", 1840.22),
+    ("ATM WITHDRAWAL", -200.00),
+    ("GUSTO PAYROLL SERVICE", -840.00),
+]
+
+
+def statement_markdown(transactions: int = 120, seed: int = 7) -> str:
+    """Synthetic LlamaParse-style markdown for a bank statement"""
+    rng = random.Random(seed)
+    balance = 4210.35
+    start = date(2024, 1, 1)
+    lines = [
+        "# ACME BUSINESS CHECKING",
+        "## Account Summary",
+        f"Beginning Balance: ${balance:,.2f}",
+        "## Transactions",
+        "| Date | Description | Amount | Balance |",
+        "|------|-------------|--------|---------|",
+    ]
+    for i in range(transactions):
+        description, amount = MERCHANTS[i % len(MERCHANTS)]
+        amount = round(amount * rng.uniform(0.9, 1.1), 2)
+        balance += amount
+        day = start + timedelta(days=i * 90 // max(1, transactions))
+        lines.append(f"| {day.strftime('%m/%d/%Y')} | {description} | {amount:,.2f} | {balance:,.2f} |")
+    lines.append(f"Ending Balance: ${balance:,.2f}")
+    return "\n".join(lines)
+
+
+class StubDocument:
+    def __init__(self, text: str, metadata: Optional[Dict[str, Any]] = None):
+        self.text = text
+        self.metadata = metadata or {}
+
+
+class StubDocumentParser:
+    """
+    Stands in for DocumentParser: sleeps like a remote LlamaParse job, then
+    returns the usual {"documents": [...]} structure for a synthetic statement.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, transactions: int = 120, seed: int = 7):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._documents: List[StubDocument] = [StubDocument(statement_markdown(transactions, seed))]
+
+    async def parse_document(self, file_path: str) -> Dict[str, Any]:
+        latency = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, latency) / 1000.0)
+        return self._structure_output(self._documents)
+
+    def _structure_output(self, parsed_data: List[StubDocument]) -> Dict[str, Any]:
+        # Reuse the real structuring step so its CPU cost is part of the measurement
+        from app.api.document_processing.llama_parser import DocumentParser
+        return DocumentParser._structure_output(self, parsed_data)
+
+    def _split_into_sections(self, text: str) -> List[Dict[str, Any]]:
+        from app.api.document_processing.llama_parser import DocumentParser
+        return DocumentParser._split_into_sections(self, text)
+
+
+def textract_table(page, table_id, rows, header=True):
+    """Blocks for one table the way Textract returns them: TABLE -> CELL -> WORD"""
+    blocks, cell_ids = [], []
+    for r, row in enumerate(rows, start=1):
+        for c, text in enumerate(row, start=1):
+            cell_id = f"{table_id}-c{r}-{c}"
+            word_ids = []
+            for w, word in enumerate(text.split()):
+                word_ids.append(f"{cell_id}-w{w}")
+                blocks.append({"Id": word_ids[-1], "BlockType": "WORD", "Text": word, "Page": page})
+            cell = {"Id": cell_id, "BlockType": "CELL", "RowIndex": r, "ColumnIndex": c, "Page": page,
+                    "Relationships": [{"Type": "CHILD", "Ids": word_ids}] if word_ids else []}
+            if header and r == 1:
+                cell["EntityTypes"] = ["COLUMN_HEADER"]
+            blocks.append(cell)
+            cell_ids.append(cell_id)
+    blocks.append({"Id": table_id, "BlockType": "TABLE", "Page": page,
+                   "Relationships": [{"Type": "CHILD", "Ids": cell_ids}]})
+    return blocks
@@ -1,12 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.routes import analyze  # Updated import path
+from app.api.routes import analyses
+from app.api.routes import debug
+from app.api.dependencies import preload_dependencies
+from app.core import config
+from app.utils.loop_monitor import get_loop_monitor
+from app.utils.metrics import REGISTRY
+from app.utils.request_gate import UploadSizeLimit
+from app.utils.tracing import get_tracer
 import os
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    monitor = get_loop_monitor()
+    if config.LOOP_MONITOR_ENABLED:
+        monitor.start()
+    if config.PRELOAD_DEPENDENCIES:
+        # Off the loop, so the monitor doesn't report the imports as a stall
+        await asyncio.to_thread(preload_dependencies)
+    yield
+    await monitor.stop()
+    # Export the spans still queued
+    await asyncio.to_thread(get_tracer().shutdown)
+
+
 app = FastAPI(
     title="Bank Statement Analyzer",
     description="API for analyzing bank statements and making loan decisions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 origins = [
@@ -18,6 +45,9 @@ origins = [
     "https://casca-oa-ten.vercel.app/", 
 ]
 
+# Refuse oversized uploads before their bodies are read (inside CORS, so browsers see the 413)
+app.add_middleware(UploadSizeLimit, paths=["/api/v1/analyze/upload"])
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,11 +60,22 @@ app.add_middleware(
 
 # Include routers
 app.include_router(analyze.router, prefix="/api/v1/analyze", tags=["analyze"])
+app.include_router(analyses.router, prefix="/api/v1/analyses", tags=["analyses"])
+if config.DEBUG_ENDPOINTS_ENABLED:
+    app.include_router(debug.router, prefix="/api/v1/debug", tags=["debug"])
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Bank Statement Analyzer API"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return REGISTRY.render()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if config.WEB_CONCURRENCY > 1:
+        # Worker processes import the app themselves; caches, jobs and uploads are shared on disk
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=config.WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,46 @@
+import os
+
+# Keep the suite offline; routes get a stub parser via app.dependency_overrides
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "offline-tests")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("ANALYSIS_STORE_PATH", ":memory:")
+os.environ.setdefault("JOB_STORE_PATH", ":memory:")
+os.environ.setdefault("RESULT_CACHE_BACKEND", "memory")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+import pytest
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "b_s1.pdf")
+
+
+@pytest.fixture
+def sample_pdf() -> bytes:
+    with open(SAMPLE_PDF, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def backend():
+    """Completion backend behind `client`; parametrize `backend` to swap it"""
+    from app.utils.llm_backends import FakeBackend
+
+    return FakeBackend()
+
+
+@pytest.fixture
+def client(monkeypatch, backend):
+    """API client with the given completion backend and a stub document parser"""
+    from fastapi.testclient import TestClient
+
+    from app.api.dependencies import get_document_parser
+    from app.utils.llm_backends import set_completion_backend
+    from benchmarks.stubs import StubDocumentParser
+    import main
+
+    set_completion_backend(backend)
+    parser = StubDocumentParser()
+    monkeypatch.setitem(main.app.dependency_overrides, get_document_parser, lambda: parser)
+    try:
+        yield TestClient(main.app)
+    finally:
+        set_completion_backend(None)
@@ -0,0 +1,60 @@
+from app.services.analysis_store import SQLiteAnalysisStore
+
+
+def _save(store, score, health, applicant="a-1", content_hash="h1"):
+    return store.save(
+        content_hash, applicant, "statement.pdf",
+        {"documents": [{"content": "x" * 1000}]},
+        {"summary": "ok"},
+        {"final_score": score, "component_scores": {"cash_flow": score}},
+        {"summary": {"overall_score": score, "health_status": health}},
+    )
+
+
+def test_round_trip_and_lookups():
+    store = SQLiteAnalysisStore(":memory:")
+    first = _save(store, 80, "good")
+    second = _save(store, 55, "concerning", content_hash="h2")
+    _save(store, 95, "excellent", applicant="a-2", content_hash="h1")
+
+    record = store.get(first)
+    assert record["parsed_data"]["documents"][0]["content"] == "x" * 1000
+    assert record["final_output"]["summary"]["health_status"] == "good"
+    assert record["component_scores"] == {"cash_flow": 80}
+    assert store.get("missing") is None
+
+    history = store.find(applicant_id="a-1")
+    assert [item["id"] for item in history] == [second, first]
+    assert "parsed_data" not in history[0]
+    assert {item["applicant_id"] for item in store.find(content_hash="h1")} == {"a-1", "a-2"}
+
+
+def test_portfolio_aggregates():
+    store = SQLiteAnalysisStore(":memory:")
+    for score, health in [(80, "good"), (75, "good"), (55, "concerning"), (95, "excellent")]:
+        _save(store, score, health)
+
+    summary = store.portfolio()
+    assert summary["count"] == 4
+    assert summary["score"] == {"average": 76.25, "min": 55, "max": 95}
+    assert summary["decisions"] == {"good": 2, "concerning": 1, "excellent": 1}
+    assert summary["score_bands"] == {"50-59": 1, "70-79": 1, "80-89": 1, "90-99": 1}
+    assert store.portfolio(min_score=70)["count"] == 3
+
+
+def test_analyze_saves_and_serves_record(client, sample_pdf):
+    client.post("/api/v1/analyze/upload", files={"file": ("store-test.pdf", sample_pdf, "application/pdf")})
+    body = client.post("/api/v1/analyze/analyze/store-test.pdf", params={"applicant_id": "applicant-42"}).json()
+
+    record = client.get(f"/api/v1/analyses/{body['analysis_id']}").json()
+    assert record["final_output"] == body["final_output"]
+    assert record["applicant_id"] == "applicant-42"
+
+    history = client.get("/api/v1/analyses/applicants/applicant-42").json()["analyses"]
+    assert history[0]["id"] == body["analysis_id"]
+    assert client.get("/api/v1/analyses/", params={"content_hash": record["content_hash"]}).json()[0]["id"] == body["analysis_id"]
+    assert client.get("/api/v1/analyses/portfolio").json()["count"] >= 1
+    assert client.get("/api/v1/analyses/missing").status_code == 404
+
+    job = client.get(f"/api/v1/analyses/jobs/{body['job_id']}").json()
+    assert (job["status"], job["analysis_id"]) == ("done", body["analysis_id"])
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+
+from app.batch import BatchRunner, Checkpoint, JSONLSink, find_pdfs, main
+from benchmarks.stubs import StubDocumentParser
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "b_s1.pdf")
+
+
+def _archive(tmp_path, names):
+    root = tmp_path / "archive"
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(SAMPLE_PDF, path)
+    (root / "notes.txt").write_text("not a statement")
+    return str(root)
+
+
+def _run(root, output, checkpoint_path):
+    import asyncio
+
+    checkpoint = Checkpoint(checkpoint_path)
+    runner = BatchRunner(root, JSONLSink(output), checkpoint, parse_workers=2, llm_concurrency=2,
+                         parser_factory=StubDocumentParser, applicant_from_dir=True, progress=open(os.devnull, "w"))
+    try:
+        return asyncio.run(runner.run(find_pdfs(root)))
+    finally:
+        checkpoint.close()
+
+
+def test_batch_writes_results_and_resumes(tmp_path):
+    root = _archive(tmp_path, [os.path.join("a-1", "jan.pdf"), os.path.join("a-1", "feb.pdf"), os.path.join("a-2", "jan.pdf")])
+    output, checkpoint = str(tmp_path / "results.jsonl"), str(tmp_path / "run.checkpoint.jsonl")
+    assert find_pdfs(root) == [os.path.join("a-1", "feb.pdf"), os.path.join("a-1", "jan.pdf"), os.path.join("a-2", "jan.pdf")]
+
+    # A previous run finished one file before crashing (mid-write of the next checkpoint line)
+    with open(checkpoint, "w") as f:
+        f.write(json.dumps({"file": os.path.join("a-1", "feb.pdf"), "status": "done"}) + "\n")
+        f.write('{"file": "a-1/ja')
+
+    stats = _run(root, output, checkpoint)
+    assert (stats["files"], stats["skipped"], stats["done"], stats["failed"]) == (3, 1, 2, 0)
+    assert stats["pages"] > 0 and stats["prompt_tokens"] > 0
+
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row["file"] for row in rows) == [os.path.join("a-1", "jan.pdf"), os.path.join("a-2", "jan.pdf")]
+    assert {row["applicant_id"] for row in rows} == {"a-1", "a-2"}
+    assert all(row["final_score"] is not None for row in rows)
+
+    # Nothing left to do on a rerun
+    assert _run(root, output, checkpoint)["skipped"] == 3
+
+
+def test_cli_rejects_unknown_output(tmp_path):
+    root = _archive(tmp_path, ["s.pdf"])
+    assert main([root, "--output", str(tmp_path / "results.csv")]) == 2
+    assert main([str(tmp_path / "missing")]) == 1
+
+
+def test_parse_worker_reuses_its_loop_across_sharded_files(tmp_path, monkeypatch):
+    import io
+    import sys
+
+    from pypdf import PdfReader, PdfWriter
+
+    from app import batch
+    from app.api.document_processing.llama_parser import DocumentParser
+    from app.core import config
+    from app.utils.cache import MemoryCache
+    from benchmarks.stubs import StubDocument
+
+    monkeypatch.setattr(config, "PARSE_PAGES_PER_SHARD", 1)
+    monkeypatch.setattr(config, "PARSE_SHARD_INITIAL_CONCURRENCY", 1)
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(batch, "_worker_loop", None)
+    monkeypatch.setattr(batch, "_worker_parser", None)
+
+    class FakeCloud:
+        async def aload_data(self, file_input, extra_info=None):
+            pages = len(PdfReader(io.BytesIO(file_input) if isinstance(file_input, bytes) else file_input).pages)
+            return [StubDocument(f"OCR {extra_info['file_name']}") for _ in range(pages)]
+
+    def cloud_only_parser():
+        parser = DocumentParser(api_key=None, cache=MemoryCache(100))
+        parser.local_extractor = None
+        parser.parser = FakeCloud()
+        return parser
+
+    source = PdfReader(os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "bs_2.pdf"))
+    paths = []
+    for name, pages in (("one.pdf", [0, 1, 2]), ("two.pdf", [3, 4, 5])):
+        writer = PdfWriter()
+        for index in pages:
+            writer.add_page(source.pages[index])
+        with open(tmp_path / name, "wb") as f:
+            writer.write(f)
+        paths.append(str(tmp_path / name))
+
+    # Three one-page shards behind a limit of one: the shard limiter has to wait in both files
+    batch._init_parse_worker(cloud_only_parser, verbose=False)
+    try:
+        for path in paths:
+            _, parsed, _ = batch._parse_file(path)
+            assert len(parsed["documents"]) == 3
+    finally:
+        batch._worker_loop.close()
@@ -0,0 +1,74 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.services.preprocessor import PreprocessingService
+from app.utils.date_inference import infer_format, parse_dates
+from app.utils.parsing import StatementParser
+
+
+def test_day_first_is_detected_from_any_unambiguous_value():
+    result = parse_dates(["01/02/2024", "05/02/2024", "13/02/2024"])
+    assert result.format.name == "DD/MM/YYYY"
+    assert result.date(0) == date(2024, 2, 1)
+
+
+def test_ambiguous_column_is_resolved_by_chronological_order():
+    # Every day is <= 12. Day-first runs Feb 1 -> Feb 3 -> Mar 2 -> Mar 4;
+    # month-first would go Jan 2 -> Mar 2 -> Feb 3, backwards in time
+    assert infer_format(["01/02/2024", "03/02/2024", "02/03/2024", "04/03/2024"]).name == "DD/MM/YYYY"
+    assert infer_format(["01/02/2024", "01/03/2024", "01/04/2024"]).name == "MM/DD/YYYY"
+
+
+def test_unparseable_rows_are_reported_not_dropped():
+    result = parse_dates(["2024-02-28", "2024-02-30", "", "not a date", "2024-03-01"])
+    assert [row for row, _ in result.unparseable] == [1, 2, 3]
+    assert result.summary() == {"format": "YYYY-MM-DD", "parsed": 2, "unparseable": 3}
+    assert result.date(4) == date(2024, 3, 1)
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["15 Mar 2024", "01 Apr 2024"], date(2024, 3, 15)),
+    (["Mar 15, 2024", "Apr 1, 2024"], date(2024, 3, 15)),
+    (["03/15/24", "04/01/24"], date(2024, 3, 15)),
+    (["15-Mar-2024", "01-Apr-2024"], date(2024, 3, 15)),
+])
+def test_common_statement_layouts(values, expected):
+    assert parse_dates(values).date(0) == expected
+
+
+def test_layout_without_year_uses_statement_year():
+    assert parse_dates(["01 Dec", "15 Dec"], default_year=2023).date(1) == date(2023, 12, 15)
+
+
+def test_fast_path_matches_row_parser_for_mixed_separators():
+    values = ["03/15/2024", "3-16-2024", "03/17/2024"]
+    assert [parse_dates(values).date(i) for i in range(3)] == [date(2024, 3, d) for d in (15, 16, 17)]
+
+
+def test_fast_path_rejects_digit_counts_the_layout_does_not_allow():
+    result = parse_dates(["01/02/2024", "13/02/2024", "01/02/202412"])
+    assert [str(d) for d in result.dates[:2]] == ["2024-02-01", "2024-02-13"]
+    assert result.unparseable == [(2, "01/02/202412")]
+    assert parse_dates(["2024-01-02", "24-01-03"]).unparseable == [(1, "24-01-03")]
+
+
+def test_preprocessor_parse_date_keeps_the_document_format():
+    preprocessor = PreprocessingService()
+    preprocessor.debug = False
+    assert preprocessor.parse_date("15/03/2024") == datetime(2024, 3, 15)
+    assert preprocessor.parse_date("04/03/2024") == datetime(2024, 3, 4)
+    assert preprocessor.parse_date("2024-03-15") == datetime(2024, 3, 15)
+    with pytest.raises(ValueError):
+        preprocessor.parse_date("someday")
+
+
+def test_statement_parser_reports_rejected_rows():
+    parser = StatementParser({"Blocks": []})
+    cleaned = parser.clean_transactions([
+        {"date": "15/03/2024", "description": "Coffee ", "amount": "$4.50"},
+        {"date": "bad", "description": "Unknown", "amount": "1.00"},
+        {"date": "16/03/2024", "description": "Rent", "amount": "n/a"},
+    ])
+    assert cleaned == [{"date": "2024-03-15", "description": "Coffee", "amount": "4.50"}]
+    assert [r["reason"].split()[1] for r in parser.rejected_rows] == ["date", "amount"]
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+from app.api import dependencies
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_app_import_defers_heavy_modules():
+    script = "import sys, main; print(' '.join(m for m in ('llama_parse', 'numpy', 'aiohttp') if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    assert completed.stdout.strip() == ""
+
+
+def test_services_are_built_once_on_first_use(monkeypatch):
+    monkeypatch.setattr(dependencies, "_scoring_service", None)
+    scoring = dependencies.get_scoring_service()
+    assert dependencies.get_scoring_service() is scoring
+
+    parser = dependencies.get_document_parser()
+    assert parser._parser is None
+    assert dependencies.get_document_parser() is parser
@@ -0,0 +1,148 @@
+import asyncio
+import io
+import os
+
+from pypdf import PdfReader, PdfWriter
+
+from app.api.document_processing.llama_parser import DocumentParser
+from app.api.document_processing.maverick_analyzer import MaverickAnalyzer
+from app.api.document_processing.page_splitter import page_fingerprints
+from app.core import config
+from app.utils.cache import MemoryCache
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import FakeBackend
+from benchmarks.stubs import StubDocument
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "bs_2.pdf")
+
+
+def _write_pdf(path, source_pages):
+    reader = PdfReader(SAMPLE_PDF)
+    writer = PdfWriter()
+    for index in source_pages:
+        writer.add_page(reader.pages[index])
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_fingerprints_follow_page_content(tmp_path):
+    first = page_fingerprints(_write_pdf(tmp_path / "a.pdf", [0, 1, 2]))
+    second = page_fingerprints(_write_pdf(tmp_path / "b.pdf", [0, 4, 2]))
+    assert first[0] == second[0] and first[2] == second[2]
+    assert first[1] != second[1]
+
+
+def test_returning_document_only_parses_changed_pages(tmp_path):
+    parser = DocumentParser(api_key=None, cache=MemoryCache(100))
+    parser.local_extractor = None
+    parsed = []
+
+    class FakeCloud:
+        async def aload_data(self, file_input, extra_info=None):
+            pages = len(PdfReader(file_input if isinstance(file_input, str) else io.BytesIO(file_input)).pages)
+            parsed.append(pages)
+            return [StubDocument(f"OCR page {len(parsed)}-{i}") for i in range(pages)]
+
+    parser.parser = FakeCloud()
+    asyncio.run(parser.parse_document(_write_pdf(tmp_path / "v1.pdf", [0, 1, 2])))
+    assert sum(parsed) == 3
+
+    parsed.clear()
+    documents = asyncio.run(parser.parse_document(_write_pdf(tmp_path / "v2.pdf", [0, 1, 2, 3])))["documents"]
+    assert parsed == [1]
+    assert [doc["metadata"]["cached"] for doc in documents] == [True, True, True, False]
+    assert [doc["metadata"]["page"] for doc in documents] == [1, 2, 3, 4]
+
+
+def test_unmapped_ocr_pages_are_not_cached(tmp_path):
+    parser = DocumentParser(api_key=None, cache=MemoryCache(100))
+    parser.local_extractor = None
+    calls = []
+
+    class MergingCloud:
+        async def aload_data(self, file_input, extra_info=None):
+            calls.append(file_input)
+            return [StubDocument("all three pages as one document")]
+
+    parser.parser = MergingCloud()
+    path = _write_pdf(tmp_path / "v1.pdf", [0, 1, 2])
+    documents = asyncio.run(parser.parse_document(path))["documents"]
+    assert documents[0]["content"] == "all three pages as one document"
+    assert all(doc["metadata"]["degraded"] for doc in documents)
+
+    asyncio.run(parser.parse_document(path))
+    assert len(calls) == 2
+
+
+def test_analysis_reuses_unchanged_chunks(monkeypatch):
+    monkeypatch.setattr(config, "ANALYSIS_PAGES_PER_CHUNK", 2)
+    backend = FakeBackend()
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+    analyzer.llama_client = LlamaClient(backend=backend)
+
+    pages = [{"content": f"page {i} transactions"} for i in range(4)]
+    first = asyncio.run(analyzer.analyze_transactions({"documents": pages}))
+    assert backend.calls == len(analyzer._chunk_documents(pages)) > 1
+
+    pages[3] = {"content": "page 3 with a late correction"}
+    calls = backend.calls
+    second = asyncio.run(analyzer.analyze_transactions({"documents": pages}))
+    assert backend.calls == calls + 1
+    assert second["cash_flow"]["total_inflow"] == first["cash_flow"]["total_inflow"]
+
+
+def test_inserted_pages_only_invalidate_neighbouring_chunks(monkeypatch):
+    monkeypatch.setattr(config, "ANALYSIS_PAGES_PER_CHUNK", 3)
+    backend = FakeBackend()
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+    analyzer.llama_client = LlamaClient(backend=backend)
+
+    pages = [{"content": f"page {i} transactions"} for i in range(30)]
+    asyncio.run(analyzer.analyze_transactions({"documents": pages}))
+    assert backend.calls == len(analyzer._chunk_documents(pages)) >= 5
+
+    for edited in ([{"content": "cover letter"}] + pages, pages[:14] + [{"content": "late page"}] + pages[14:]):
+        calls = backend.calls
+        asyncio.run(analyzer.analyze_transactions({"documents": edited}))
+        assert backend.calls - calls <= 2
+
+
+def test_merge_sums_flows_and_dedupes_items():
+    analyzer = MaverickAnalyzer(cache=MemoryCache(10))
+    chunk = lambda inflow, begin, end, salary: {
+        "cash_flow": {"total_inflow": inflow, "total_outflow": 100.0, "beginning_balance": begin,
+                      "ending_balance": end, "summary": "Steady."},
+        "expenses": {"major_expenses": [], "recurring_expenses": [{"description": "Rent", "amount": 900.0}],
+                     "summary": "Rent."},
+        "income": {"regular_sources": [{"description": "Payroll", "total_amount": salary}],
+                   "irregular_sources": [], "summary": "Salary."},
+        "debt_credit": {"recurring_debt_payments": [], "inferred_liability_types": "auto loan", "summary": ""},
+    }
+    merged = analyzer._merge_analyses([chunk(1000.0, 10.0, 20.0, 800.0), chunk(500.0, 20.0, 30.0, 800.0)])
+    assert merged["cash_flow"]["total_inflow"] == 1500.0
+    assert merged["cash_flow"]["net_flow"] == 1300.0
+    assert (merged["cash_flow"]["beginning_balance"], merged["cash_flow"]["ending_balance"]) == (10.0, 30.0)
+    assert merged["expenses"]["recurring_expenses"] == [{"description": "Rent", "amount": 900.0}]
+    assert merged["income"]["regular_sources"] == [{"description": "Payroll", "total_amount": 1600.0}]
+    assert merged["debt_credit"]["inferred_liability_types"] == "auto loan"
+    assert merged["cash_flow"]["summary"] == "Steady."
+
+
+def test_merge_leaves_out_failed_chunks_and_unreported_values():
+    analyzer = MaverickAnalyzer(cache=MemoryCache(10))
+    good = analyzer._structure_analysis(
+        '{"Cash Flow Analysis": {"total_inflows": 1000, "total_outflows": 0, "ending_balance": 300}}'
+    )
+    assert good["cash_flow"]["total_outflow"] == 0.0
+    assert good["cash_flow"]["beginning_balance"] is None
+    failed = analyzer._structure_analysis("not json")
+    assert failed == analyzer._get_fallback_structure()
+
+    merged = analyzer._merge_analyses([failed, good, failed])
+    assert (merged["cash_flow"]["total_inflow"], merged["cash_flow"]["total_outflow"]) == (1000.0, 0.0)
+    assert merged["cash_flow"]["ending_balance"] == 300.0
+    assert merged["cash_flow"]["summary"] == ""
+    # Not reported by any chunk: the neutral default, as for a single-call analysis
+    assert merged["cash_flow"]["beginning_balance"] == 50.0
+    assert analyzer._merge_analyses([failed, failed]) == failed
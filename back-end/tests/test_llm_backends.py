@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import (
+    FAKE_ANALYSIS,
+    BackendError,
+    CompletionBackend,
+    FakeBackend,
+    ReplayBackend,
+    fixture_key,
+)
+from app.utils.retry_policy import RetryPolicy
+
+
+class FlakyBackend(CompletionBackend):
+    def __init__(self, failures, status_code=503):
+        self.failures = failures
+        self.status_code = status_code
+        self.inner = FakeBackend()
+
+    async def complete(self, payload):
+        if self.failures:
+            self.failures -= 1
+            raise BackendError(self.status_code, "boom")
+        return await self.inner.complete(payload)
+
+
+def _client(backend):
+    client = LlamaClient(backend=backend)
+    client.retry_policy = RetryPolicy(max_retries=2, base_delay=0.001, max_delay=0.01, attempt_timeout=5, deadline=10)
+    return client
+
+
+def test_fake_backend_returns_analysis_json():
+    content = asyncio.run(_client(FakeBackend()).get_maverick_completion("analyze this"))
+    assert json.loads(content) == FAKE_ANALYSIS
+
+
+def test_transient_errors_are_retried():
+    backend = FlakyBackend(failures=2)
+    content = asyncio.run(_client(backend).get_maverick_completion("analyze this"))
+    assert json.loads(content) == FAKE_ANALYSIS
+
+
+def test_non_retryable_status_is_raised_immediately():
+    backend = FlakyBackend(failures=1, status_code=400)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(_client(backend).get_maverick_completion("analyze this"))
+    assert excinfo.value.status_code == 400
+    assert backend.failures == 0
+
+
+def test_replay_backend_records_then_replays(tmp_path):
+    recorder = FakeBackend()
+    payload = {"model": "m", "messages": [{"role": "user", "content": "hello"}]}
+
+    recording = ReplayBackend(str(tmp_path), record_to=recorder)
+    first = asyncio.run(recording.complete(payload))
+    assert (tmp_path / f"{fixture_key(payload)}.json").exists()
+
+    replay = ReplayBackend(str(tmp_path))
+    assert asyncio.run(replay.complete(payload)) == first
+    assert recorder.calls == 1
+
+    with pytest.raises(BackendError):
+        asyncio.run(replay.complete({"model": "m", "messages": []}))
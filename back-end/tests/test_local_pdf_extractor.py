@@ -0,0 +1,83 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pypdf import PdfReader, PdfWriter
+
+from app.api.document_processing.llama_parser import DocumentParser
+from app.api.document_processing.local_pdf_extractor import LocalPDFExtractor, extract_tables, has_usable_text
+from app.utils.cache import MemoryCache
+from benchmarks.stubs import StubDocument
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "b_s1.pdf")
+
+PAGE_TEXT = """Statement 29
+Date Transaction Debit Credit Balance
+01 Dec Account Fee 4.00 $804.80 CR
+01 Dec Direct Credit 421520 JESSICA LAING
+JL - Internet 40.00 $844.80 CR
+09-May-2018 09-May-2018 IMPS-MOB/Fund Trf/8129 200.00 209.82
+"""
+
+
+def test_extract_tables_folds_wrapped_rows():
+    tables = extract_tables(PAGE_TEXT)
+    assert len(tables) == 1
+    rows = tables[0]["rows"]
+    assert tables[0]["header"] == "Date Transaction Debit Credit Balance"
+    assert rows[0] == {"date": "01 Dec", "description": "Account Fee", "amounts": ["4.00", "$804.80 CR"]}
+    assert rows[1]["description"] == "Direct Credit 421520 JESSICA LAING JL - Internet"
+    assert rows[2]["value_date"] == "09-May-2018"
+    assert rows[2]["amounts"] == ["200.00", "209.82"]
+
+
+def test_usable_text_threshold():
+    assert not has_usable_text("   \n  ")
+    assert has_usable_text(PAGE_TEXT)
+
+
+def _parser(tmp_path):
+    parser = DocumentParser(api_key=None, cache=MemoryCache(100))
+    parser.local_extractor = LocalPDFExtractor(executor=ThreadPoolExecutor(max_workers=1))
+    return parser
+
+
+def test_digital_pdf_skips_cloud_ocr(tmp_path):
+    parser = _parser(tmp_path)
+
+    class NoCloud:
+        async def aload_data(self, file_path):
+            raise AssertionError("cloud OCR must not run for digital pages")
+
+    parser.parser = NoCloud()
+    result = asyncio.run(parser.parse_document(SAMPLE_PDF))
+    documents = result["documents"]
+    assert [doc["metadata"]["page"] for doc in documents] == [1, 2, 3]
+    assert all(doc["metadata"]["source"] == "text_layer" for doc in documents)
+    assert "OPENING BALANCE" in documents[0]["content"]
+    assert documents[1]["tables"][0]["rows"]
+
+
+def test_only_scanned_pages_go_to_ocr(tmp_path):
+    mixed = tmp_path / "mixed.pdf"
+    writer = PdfWriter()
+    writer.add_page(PdfReader(SAMPLE_PDF).pages[0])
+    writer.add_blank_page(width=612, height=792)
+    with open(mixed, "wb") as f:
+        writer.write(f)
+
+    parser = _parser(tmp_path)
+    calls = []
+
+    class FakeCloud:
+        async def aload_data(self, file_input, extra_info=None):
+            calls.append(len(PdfReader(io.BytesIO(file_input)).pages))
+            return [StubDocument("# Scanned page\nOCR text")]
+
+    parser.parser = FakeCloud()
+    documents = asyncio.run(parser.parse_document(str(mixed)))["documents"]
+    assert calls == [1]
+    assert [doc["metadata"]["source"] for doc in documents] == ["text_layer", "ocr"]
+    assert documents[1]["content"] == "# Scanned page\nOCR text"
+    assert documents[1]["sections"][0]["header"] == "# Scanned page"
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from app.utils.loop_monitor import LoopMonitor
+from app.utils.metrics import MetricsRegistry
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+def test_blocking_call_is_captured_with_stack():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_handler()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(main())
+    snapshot = monitor.snapshot()
+    assert snapshot["blocked_total"] >= 1
+    event = snapshot["recent_blocking_events"][0]
+    assert event["duration_ms"] >= 50
+    assert any("blocking_handler" in line for line in event["stack"])
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs").inc(stage="parse")
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).observe(0.5)
+    text = registry.render()
+    assert 'jobs_total{stage="parse"} 1.0' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert "latency_seconds_count 1" in text
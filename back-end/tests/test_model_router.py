@@ -0,0 +1,112 @@
+import asyncio
+
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import BackendError, FakeBackend
+from app.utils.model_router import (
+    STAGE_ANALYSIS,
+    STAGE_NARRATIVE,
+    ModelRouter,
+    StageRoute,
+    start_route_log,
+)
+
+
+class ModelBackend(FakeBackend):
+    """Fake backend with per-model latency and failures"""
+
+    def __init__(self, latency=None, rate_limited=()):
+        super().__init__()
+        self.latency = latency or {}
+        self.rate_limited = set(rate_limited)
+        self.models = []
+
+    async def complete(self, payload):
+        self.models.append(payload["model"])
+        if payload["model"] in self.rate_limited:
+            raise BackendError(429, "slow down", retry_after="30")
+        await asyncio.sleep(self.latency.get(payload["model"], 0.0))
+        return await super().complete(payload)
+
+
+def _client(backend, name, fallback=True, budget=5.0):
+    primary, small = f"{name}-large", f"{name}-small"
+    router = ModelRouter({
+        STAGE_ANALYSIS: StageRoute(STAGE_ANALYSIS, primary, 4096, budget, small if fallback else None),
+        STAGE_NARRATIVE: StageRoute(STAGE_NARRATIVE, small, 1024, budget),
+    }, min_samples=3)
+    return LlamaClient(backend=backend, router=router), primary, small
+
+
+def test_stages_use_their_own_model_and_are_recorded():
+    backend = ModelBackend()
+    client, primary, small = _client(backend, "stages")
+
+    async def main():
+        log = start_route_log()
+        await client.get_completion("analyze this", STAGE_ANALYSIS)
+        await client.get_completion("component_analysis please", STAGE_NARRATIVE)
+        return log
+
+    log = asyncio.run(main())
+    assert backend.models == [primary, small]
+    assert [(entry["stage"], entry["model"], entry["reason"]) for entry in log] == [
+        (STAGE_ANALYSIS, primary, "primary"),
+        (STAGE_NARRATIVE, small, "primary"),
+    ]
+
+
+def test_rate_limited_primary_falls_back_without_waiting():
+    backend = ModelBackend(rate_limited=["limited-large"])
+    client, primary, small = _client(backend, "limited")
+
+    async def main():
+        log = start_route_log()
+        await client.get_completion("analyze this")
+        await client.get_completion("analyze that")
+        return log
+
+    log = asyncio.run(main())
+    # The second call goes straight to the fallback while the primary's window is open
+    assert backend.models == [primary, small, small]
+    assert [entry["reason"] for entry in log] == ["rate_limited", "rate_limited"]
+
+
+def test_primary_over_budget_falls_back_and_is_avoided_once_slow():
+    backend = ModelBackend(latency={"slow-large": 0.2})
+    client, primary, small = _client(backend, "slow", budget=0.05)
+
+    async def main():
+        log = start_route_log()
+        for _ in range(2):
+            await client.get_completion("analyze this")
+        return log
+
+    log = asyncio.run(main())
+    assert [entry["model"] for entry in log] == [small, small]
+    assert log[0]["reason"] == "over_budget"
+
+    # Once the primary's recorded p95 exceeds the budget it is skipped up front
+    from app.utils.retry_policy import get_latency_tracker
+    for _ in range(3):
+        get_latency_tracker(primary).record(0.2)
+    assert client.router.choose(client.router.route(STAGE_ANALYSIS)) == (small, "over_budget")
+
+
+def test_chunks_served_by_the_fallback_are_not_cached(monkeypatch):
+    from app.api.document_processing.maverick_analyzer import MaverickAnalyzer
+    from app.core import config
+    from app.utils.cache import MemoryCache
+
+    monkeypatch.setattr(config, "ANALYSIS_PAGES_PER_CHUNK", 1)
+    backend = ModelBackend(rate_limited=["cached-large"])
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+    analyzer.llama_client, primary, small = _client(backend, "cached")
+    documents = {"documents": [{"content": "page 0 transactions"}, {"content": "page 1 transactions"}]}
+
+    asyncio.run(analyzer.analyze_transactions(documents))
+    assert backend.models.count(small) == 2
+    assert analyzer.cache._entries == {}
+
+    # Nothing was cached under the primary's key, so a rerun asks again
+    asyncio.run(analyzer.analyze_transactions(documents))
+    assert backend.models.count(small) == 4
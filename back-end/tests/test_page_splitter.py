@@ -0,0 +1,68 @@
+import asyncio
+import io
+import os
+
+from pypdf import PdfReader
+
+from app.api.document_processing.llama_parser import DocumentParser
+from app.api.document_processing.page_splitter import PageSplitter
+from app.utils.adaptive_limiter import AdaptiveLimiter
+from app.utils.cache import MemoryCache
+from benchmarks.stubs import StubDocument
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "bs_2.pdf")
+
+
+def test_split_preserves_page_ranges():
+    shards = PageSplitter(pages_per_shard=4).split(SAMPLE_PDF)
+    assert [shard.page_numbers for shard in shards] == [[1, 2, 3, 4], [5, 6, 7, 8], [9]]
+    assert [len(PdfReader(io.BytesIO(shard.data)).pages) for shard in shards] == [4, 4, 1]
+    assert shards[2].file_name == "pages-9-9.pdf"
+
+
+def test_long_document_is_parsed_in_order_across_shards():
+    parser = DocumentParser(api_key=None, cache=MemoryCache(100))
+    parser.local_extractor = None
+    parser.splitter = PageSplitter(pages_per_shard=2)
+    in_flight, peak = 0, 0
+
+    class FakeCloud:
+        async def aload_data(self, file_input, extra_info=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            first, last = (int(n) for n in extra_info["file_name"][6:-4].split("-"))
+            # Later shards finish first to prove reassembly does not depend on completion order
+            await asyncio.sleep(0.01 * (10 - first))
+            in_flight -= 1
+            return [StubDocument(f"page {page}") for page in range(first, last + 1)]
+
+    parser.parser = FakeCloud()
+    documents = asyncio.run(parser.parse_document(SAMPLE_PDF))["documents"]
+    assert [doc["metadata"]["page"] for doc in documents] == list(range(1, 10))
+    assert [doc["content"] for doc in documents] == [f"page {page}" for page in range(1, 10)]
+    assert peak > 1
+
+
+def test_adaptive_limiter_backs_off_on_failure_and_recovers():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8)
+
+    async def fail():
+        async with limiter.slot():
+            raise RuntimeError("shard failed")
+
+    async def succeed():
+        async with limiter.slot():
+            pass
+
+    async def main():
+        try:
+            await fail()
+        except RuntimeError:
+            pass
+        assert limiter.limit == 2
+        for _ in range(10):
+            await succeed()
+        assert limiter.limit > 2
+
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.api.document_processing.maverick_analyzer import MaverickAnalyzer
+from app.api.document_processing.output_generator import OutputGenerator
+from app.core import config
+from app.services.prompts import PromptRegistry, PromptTemplate, load_prompt_templates, parse_pins
+from app.utils.cache import MemoryCache
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import FakeBackend
+from app.utils.model_router import STAGE_NARRATIVE
+
+
+class RecordingBackend(FakeBackend):
+    def __init__(self):
+        super().__init__()
+        self.payloads = []
+
+    async def complete(self, payload):
+        self.payloads.append(payload)
+        return await super().complete(payload)
+
+
+def test_request_data_only_follows_the_static_prefix():
+    backend = RecordingBackend()
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+    analyzer.llama_client = LlamaClient(backend=backend)
+    for statement in ("ACME PAYROLL 2,100.00 balance 812.44", "RENT -950.00 closing 4,410.10"):
+        asyncio.run(analyzer.analyze_transactions({"documents": [{"content": statement}]}))
+
+    generator = OutputGenerator()
+    generator.llama_client = LlamaClient(backend=backend)
+    scoring = {
+        "final_score": 71.5,
+        "component_scores": {"cash_flow": 70, "expenses": 65, "income": 80, "debt_credit": 72},
+        "metrics": {"cash_flow_metrics": {"net_flow": 120.0}},
+        "flags": [],
+    }
+    for balance in (812.44, 4410.1):
+        context = generator._prepare_context({"cash_flow": {"beginning_balance": 100.0, "ending_balance": balance}}, scoring)
+        asyncio.run(generator.llama_client.get_completion(context.user, stage=STAGE_NARRATIVE, system=context.system))
+
+    analysis, narrative = backend.payloads[:2], backend.payloads[2:]
+    for first, second in (analysis, narrative):
+        assert first["messages"][0] == second["messages"][0]
+        assert first["messages"][1] != second["messages"][1]
+    assert "ACME PAYROLL" in analysis[0]["messages"][1]["content"]
+    assert "$812.44" in narrative[0]["messages"][1]["content"]
+    assert '"component_analysis"' in narrative[0]["messages"][0]["content"]
+
+
+def test_registry_serves_latest_or_pinned_version():
+    templates = [
+        PromptTemplate("summary", 1, "Old instructions.", "Data: {data}"),
+        PromptTemplate("summary", 2, "New instructions.", "Data:\n{data}"),
+    ]
+    assert PromptRegistry(templates).render("summary", data="x").system == "New instructions."
+    pinned = PromptRegistry(templates, parse_pins("summary=1"))
+    assert pinned.get("summary").id == "summary@1"
+    with pytest.raises(Exception):
+        pinned.get("summary", 3)
+    with pytest.raises(Exception):
+        pinned.render("summary")  # missing {data}
+
+
+def test_static_prefix_cannot_take_placeholders():
+    with pytest.raises(Exception):
+        PromptTemplate("bad", 1, "Analyze {document_content}", "{document_content}")
+
+
+def test_shipped_templates_load():
+    registry = PromptRegistry(load_prompt_templates(config.PROMPT_TEMPLATES_PATH))
+    for name in ("analysis", "analysis_known_recurring", "narrative"):
+        assert registry.versions(name)
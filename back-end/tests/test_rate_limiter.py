@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from app.utils.rate_limiter import (
+    PRIORITY_ANALYSIS,
+    PRIORITY_NARRATIVE,
+    AdmissionController,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+def test_token_bucket_wait_time_follows_refill_rate():
+    now = [0.0]
+    bucket = TokenBucket(capacity=10, refill_per_second=2, clock=lambda: now[0])
+    bucket.consume(10)
+    assert bucket.wait_time(4) == 2.0
+    now[0] = 2.0
+    assert bucket.wait_time(4) == 0.0
+
+
+def test_concurrency_is_capped():
+    controller = AdmissionController(max_concurrency=2, requests_per_minute=6000, tokens_per_minute=10**6)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with controller.admit(10):
+            peak = max(peak, controller.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert controller.in_flight == 0
+
+
+def test_analysis_lane_is_admitted_before_narrative():
+    controller = AdmissionController(max_concurrency=1, requests_per_minute=6000, tokens_per_minute=10**6)
+    order = []
+
+    async def call(name, priority):
+        async with controller.admit(10, priority):
+            order.append(name)
+
+    async def main():
+        await controller.acquire(10)
+        narrative = asyncio.create_task(call("narrative", PRIORITY_NARRATIVE))
+        analysis = asyncio.create_task(call("analysis", PRIORITY_ANALYSIS))
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.gather(narrative, analysis)
+
+    asyncio.run(main())
+    assert order == ["analysis", "narrative"]
+
+
+def test_penalize_holds_admissions_for_retry_after():
+    controller = AdmissionController(max_concurrency=4, requests_per_minute=6000, tokens_per_minute=10**6)
+
+    async def main():
+        controller.penalize(0.05)
+        start = time.monotonic()
+        async with controller.admit(10):
+            return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.04
+
+
+def test_model_penalty_does_not_hold_other_models():
+    controller = AdmissionController(max_concurrency=4, requests_per_minute=6000, tokens_per_minute=10**6)
+    order = []
+
+    async def call(model):
+        async with controller.admit(10, PRIORITY_ANALYSIS, model):
+            order.append(model)
+
+    async def main():
+        controller.penalize(0.05, "big-model")
+        await asyncio.gather(call("big-model"), call("small-model"))
+
+    asyncio.run(main())
+    assert order == ["small-model", "big-model"]
+    assert not controller.is_rate_limited("small-model")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3", 1.0) == 3.0
+    assert parse_retry_after(None, 1.5) == 1.5
+    assert parse_retry_after("not a date", 1.5) == 1.5
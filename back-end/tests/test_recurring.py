@@ -0,0 +1,104 @@
+import asyncio
+import os
+from datetime import date, timedelta
+
+from app.api.document_processing.local_pdf_extractor import extract_pages
+from app.api.document_processing.maverick_analyzer import MaverickAnalyzer
+from app.models.transaction_table import TransactionTableBuilder, to_epoch_day
+from app.services.recurring import RecurringDetector
+from app.services.statement_transactions import parse_amount_cents, transactions_from_parsed
+from app.utils.cache import MemoryCache
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import FakeBackend
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "app", "uploads", "bs_2.pdf")
+
+
+def _table(rows):
+    builder = TransactionTableBuilder()
+    for day, description, cents in rows:
+        builder.append(to_epoch_day(day), description, cents, "credit" if cents > 0 else "debit")
+    return builder.build()
+
+
+def _every(start, days, count, description, cents):
+    return [(start + timedelta(days=days * i), description, cents) for i in range(count)]
+
+
+def test_merchant_key_drops_rails_and_reference_numbers():
+    detector = RecurringDetector()
+    assert detector.merchant_key("NACH/TP ACH Bajaj Finanac/88551679") == "BAJAJ FINANAC"
+    assert detector.merchant_key("POS-VISA/KARUN MEDICAL/809414290216") == "KARUN MEDICAL"
+    assert detector.merchant_key("Direct Debit 180247 SGIO MOT563142623171021") == "SGIO"
+
+
+def test_detects_each_cadence_with_amount_tolerance():
+    start = date(2024, 1, 3)
+    rows = (
+        _every(start, 7, 6, "GYM CLUB 0412", -2500)
+        + _every(start, 14, 4, "ACME PAYROLL REF 1", 210000)
+        + _every(start, 30, 3, "AUTO LOAN PMT CAPITAL ONE", -41000)
+        + [(start + timedelta(days=9), "GYM CLUB 0999", -9900)]  # one-off, outside tolerance
+        + [(start + timedelta(days=d), "CORNER CAFE", -450 - d) for d in (1, 4, 23, 40)]
+    )
+    series = {s.merchant: s for s in RecurringDetector().detect(_table(rows))}
+    assert series["GYM CLUB"].period == "weekly"
+    assert len(series["GYM CLUB"].dates) == 6
+    assert series["ACME PAYROLL"].period == "biweekly"
+    assert series["AUTO LOAN CAPITAL"].period == "monthly"
+    assert "CORNER CAFE" not in series
+
+    fields = RecurringDetector.analysis_fields(list(series.values()))
+    assert [item["description"] for item in fields["regular_sources"]] == ["ACME PAYROLL"]
+    assert fields["regular_sources"][0]["total_amount"] == 8400.0
+    assert fields["recurring_debt_payments"][0]["amount"] == 410.0
+    assert fields["liability_types"] == ["auto loan"]
+    assert [item["description"] for item in fields["recurring_expenses"]] == ["GYM CLUB"]
+
+
+def test_amount_tokens_and_signs_from_balance_movement():
+    assert parse_amount_cents("$2,217.29 CR") == (221729, "CR")
+    assert parse_amount_cents("(45.00)") == (-4500, None)
+    assert parse_amount_cents("Balance") is None
+
+    pages = extract_pages(SAMPLE_PDF, list(range(9)))
+    table = transactions_from_parsed({"documents": [{"content": p["text"], "tables": p["tables"]} for p in pages]})
+    rows = list(table.rows())
+    assert rows[1][2] > 0  # "Fund Trf ... 2000" raised the balance
+    assert rows[2][1].startswith("NACH/TP ACH Bajaj") and rows[2][2] < 0
+
+
+def test_analyzer_fills_recurring_fields_and_shrinks_prompt(monkeypatch):
+    pages = extract_pages(SAMPLE_PDF, list(range(9)))
+    parsed = {"documents": [{"content": p["text"], "tables": p["tables"]} for p in pages]}
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+    analyzer.llama_client = LlamaClient(backend=FakeBackend())
+    prompts = []
+    original = analyzer.llama_client.get_maverick_completion
+
+    async def capture(prompt, **kwargs):
+        prompts.append(kwargs["system"] + prompt)
+        return await original(prompt, **kwargs)
+
+    monkeypatch.setattr(analyzer.llama_client, "get_maverick_completion", capture)
+    result = asyncio.run(analyzer.analyze_transactions(parsed))
+
+    assert all('"recurring_expenses"' not in prompt for prompt in prompts)
+    assert all("BAJAJ FINANAC: monthly" in prompt for prompt in prompts)
+    payments = result["debt_credit"]["recurring_debt_payments"]
+    assert [(p["description"], p["frequency"], p["amount"]) for p in payments] == [("BAJAJ FINANAC", "monthly", 1912.0)]
+    assert "loan" in result["debt_credit"]["inferred_liability_types"]
+
+
+def test_recurring_hint_is_stable_as_the_statement_grows():
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+
+    def fields(occurrences, amount):
+        item = {"description": "RENT", "frequency": "monthly", "amount": amount, "occurrences": occurrences}
+        return {"regular_sources": [], "recurring_expenses": [item], "recurring_debt_payments": [], "liability_types": []}
+
+    # One more month changes counts and amounts, but not the chunk prompts (and their cache keys)
+    first = analyzer._build_analysis_prompt("page 1", fields(3, 900.0))
+    second = analyzer._build_analysis_prompt("page 1", fields(4, 925.0))
+    assert first.user == second.user
+    assert "RENT: monthly" in first.user
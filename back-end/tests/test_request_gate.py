@@ -0,0 +1,123 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core import config
+from app.utils import request_gate
+from app.utils.request_gate import RequestGate, RequestRejected
+
+
+def test_queue_is_bounded_and_fifo():
+    gate = RequestGate("test", max_active=1, max_queue=2, max_wait=5.0, per_client=10)
+
+    async def main():
+        order = []
+        first = await gate.acquire("a")
+
+        async def queued(name):
+            async with gate.slot(name):
+                order.append(name)
+
+        waiting = [asyncio.create_task(queued(name)) for name in ("b", "c")]
+        await asyncio.sleep(0)
+        assert (gate.active, gate.queued) == (1, 2)
+        with pytest.raises(RequestRejected) as raised:
+            await gate.acquire("d")
+        assert raised.value.status_code == 503
+        assert int(raised.value.headers["Retry-After"]) >= 1
+
+        first.release()
+        await asyncio.gather(*waiting)
+        return order
+
+    assert asyncio.run(main()) == ["b", "c"]
+    assert (gate.active, gate.queued) == (0, 0)
+
+
+def test_per_client_cap_and_queue_timeout():
+    gate = RequestGate("test", max_active=1, max_queue=5, max_wait=0.05, per_client=2)
+
+    async def main():
+        held = await gate.acquire("greedy")
+        waiter = asyncio.create_task(gate.acquire("greedy"))
+        await asyncio.sleep(0)
+        with pytest.raises(RequestRejected) as raised:
+            await gate.acquire("greedy")
+        assert raised.value.status_code == 429
+
+        with pytest.raises(RequestRejected) as timed_out:
+            await waiter
+        assert timed_out.value.status_code == 503
+        held.release()
+        held.release()  # idempotent
+        assert (gate.active, gate.queued) == (0, 0)
+        # The timed-out waiter gave its place back too
+        tickets = [await gate.acquire("greedy")]
+        tickets.append(asyncio.create_task(gate.acquire("greedy")))
+        await asyncio.sleep(0)
+        tickets[0].release()
+        (await tickets[1]).release()
+
+    asyncio.run(main())
+    assert gate.active == 0
+
+
+def test_endpoints_refuse_fast(monkeypatch, client, sample_pdf):
+    gate = RequestGate("analyze", max_active=4, max_queue=4, max_wait=1.0, per_client=1)
+    monkeypatch.setitem(request_gate._request_gates, "analyze", gate)
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", len(sample_pdf) - 1)
+    too_big = client.post("/api/v1/analyze/upload", files={"file": ("gate-test.pdf", sample_pdf, "application/pdf")})
+    assert too_big.status_code == 413
+
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", len(sample_pdf))
+    client.post("/api/v1/analyze/upload", files={"file": ("gate-test.pdf", sample_pdf, "application/pdf")})
+    # TestClient requests come from peer "testclient"; a made-up X-Client-Id doesn't dodge the cap
+    held = asyncio.run(gate.acquire("testclient"))
+    refused = client.post("/api/v1/analyze/analyze/gate-test.pdf", headers={"X-Client-Id": "someone-else"})
+    assert refused.status_code == 429
+    assert "Retry-After" in refused.headers
+    assert client.post("/api/v1/analyze/analyze/gate-test.pdf/stream").status_code == 429
+
+    held.release()
+    assert client.post("/api/v1/analyze/analyze/gate-test.pdf").status_code == 200
+    assert gate.active == 0
+
+
+def test_client_id_header_is_only_trusted_from_proxies(monkeypatch):
+    from starlette.requests import Request
+
+    def request(peer, client_id):
+        return Request({"type": "http", "client": (peer, 1234), "headers": [(b"x-client-id", client_id.encode())]})
+
+    assert request_gate.client_key(request("203.0.113.7", "spoofed")) == "203.0.113.7"
+    monkeypatch.setattr(config, "TRUSTED_PROXIES", ["10.0.0.2"])
+    assert request_gate.client_key(request("10.0.0.2", "applicant-portal")) == "applicant-portal"
+    assert request_gate.client_key(request("203.0.113.7", "spoofed")) == "203.0.113.7"
+
+
+def test_oversized_uploads_are_cut_off_while_receiving(monkeypatch, tmp_path, client):
+    import io
+
+    from app.api.routes.analyze import _store_upload
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", 1000)
+    limit = 1000 + request_gate.UploadSizeLimit.MULTIPART_OVERHEAD
+    headers = {"Content-Type": "multipart/form-data; boundary=x"}
+
+    declared = client.post("/api/v1/analyze/upload", content=b"x" * (limit + 1), headers=headers)
+    assert declared.status_code == 413
+
+    def chunks():
+        for _ in range(limit // 4096 + 2):
+            yield b"x" * 4096
+
+    # No Content-Length: counted as it arrives
+    streamed = client.post("/api/v1/analyze/upload", content=chunks(), headers=headers)
+    assert streamed.status_code == 413
+
+    with pytest.raises(HTTPException) as raised:
+        _store_upload(io.BytesIO(b"x" * 1001), str(tmp_path / "big.pdf"), max_bytes=1000)
+    assert raised.value.status_code == 413
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,52 @@
+import json
+import time
+
+from app.utils import request_profiler
+from app.utils.request_profiler import RequestProfiler, profile_span
+
+
+def _busy_parse(seconds: float):
+    ended = time.perf_counter() + seconds
+    while time.perf_counter() < ended:
+        pass
+
+
+def test_profile_has_spans_samples_and_both_formats(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), interval=0.002, max_seconds=10, keep=1, per_minute=60, burst=1)
+    profile = profiler.start("unit")
+    with profile_span("parse"):
+        with profile_span("json_repair"):
+            _busy_parse(0.1)
+    summary = profiler.finish(profile)
+
+    assert [stage["name"] for stage in summary["stages"]] == ["parse"]
+    assert summary["spans"]["json_repair"]["count"] == 1
+    assert summary["samples"] > 0
+    speedscope = json.loads(profiler.load(summary["profile_id"]))
+    sampled, stages = speedscope["profiles"]
+    assert len(sampled["samples"]) == len(sampled["weights"])
+    assert [event["type"] for event in stages["events"]] == ["O", "C"]
+    assert "_busy_parse (test_request_profiler.py:" in profiler.load(summary["profile_id"], "collapsed")
+
+    # Bucket of one: the next request runs unprofiled and says why
+    assert profiler.start("again").summary()["skipped"] == "rate_limited"
+    assert profiler.load("../../etc/passwd") is None
+
+
+def test_analyze_with_profile_flag(tmp_path, monkeypatch, client, sample_pdf):
+    profiler = RequestProfiler(str(tmp_path), interval=0.002, max_seconds=10, keep=5, per_minute=60, burst=5)
+    monkeypatch.setattr(request_profiler, "_request_profiler", profiler)
+    client.post("/api/v1/analyze/upload", files={"file": ("profile-test.pdf", sample_pdf, "application/pdf")})
+    response = client.post("/api/v1/analyze/analyze/profile-test.pdf", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    profile = response.json()["profile"]
+    assert [stage["name"] for stage in profile["stages"]] == ["hash", "parse", "maverick", "scoring", "output", "save"]
+    assert profile["spans"]["llm_request"]["count"] >= 1
+
+    stored = client.get(f"/api/v1/analyses/profiles/{profile['profile_id']}")
+    assert stored.json()["$schema"].startswith("https://www.speedscope.app/")
+    collapsed = client.get(f"/api/v1/analyses/profiles/{profile['profile_id']}?format=collapsed")
+    assert collapsed.text.startswith(("event loop", "thread "))
+
+    client.post("/api/v1/analyze/upload", files={"file": ("profile-test.pdf", sample_pdf, "application/pdf")})
+    assert "profile" not in client.post("/api/v1/analyze/analyze/profile-test.pdf").json()
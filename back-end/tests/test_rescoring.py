@@ -0,0 +1,89 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.document_processing.output_generator import health_status
+from app.api.document_processing.scoring import ScoringLlamaService
+from app.services.analysis_store import SQLiteAnalysisStore
+from app.services.rescoring import RescoreSweep, expand_grid
+
+
+def _analysis(net_flow, ending_balance=5500.0):
+    return {
+        "cash_flow": {
+            "total_inflow": 10000.0, "total_outflow": 10000.0 - net_flow, "net_flow": net_flow,
+            "beginning_balance": 5000.0, "ending_balance": ending_balance, "summary": "",
+        },
+        "expenses": {"major_expenses": [], "recurring_expenses": [], "summary": ""},
+        "income": {"regular_sources": [], "irregular_sources": [], "summary": "stable"},
+        "debt_credit": {"recurring_debt_payments": [], "inferred_liability_types": [], "summary": ""},
+    }
+
+
+def _store(*analyses):
+    store = SQLiteAnalysisStore(":memory:")
+    for i, analysis in enumerate(analyses):
+        scoring_result = ScoringLlamaService().calculate_score(analysis)
+        store.save(f"h{i}", f"a{i}", "s.pdf", {}, analysis, scoring_result,
+                   {"summary": {"health_status": health_status(scoring_result["final_score"])}})
+    store.save("broken", None, "s.pdf", {}, {"error": "fallback"}, {}, {})
+    return store
+
+
+def test_unknown_weight_is_rejected():
+    try:
+        ScoringLlamaService(weights={"cashflow": 0.5})
+    except Exception as e:
+        assert "cashflow" in str(e)
+    else:
+        raise AssertionError("expected an error")
+
+
+def test_expand_grid_is_cartesian_over_overrides():
+    scenarios = list(expand_grid({"weights": {"cash_flow": [0.3, 0.5]}, "thresholds": {"low_score": [55, 65]}}, weights={"income": 0.2}))
+    assert [s.name for s in scenarios] == ["cash_flow=0.3,low_score=55", "cash_flow=0.3,low_score=65",
+                                           "cash_flow=0.5,low_score=55", "cash_flow=0.5,low_score=65"]
+    assert all(s.service.weights["income"] == 0.2 for s in scenarios)
+    assert scenarios[-1].service.thresholds["low_score"] == 65
+
+
+def test_baseline_matches_live_scoring_and_deltas_balance():
+    analyses = [_analysis(3000.0), _analysis(600.0), _analysis(-2000.0, ending_balance=3000.0)]
+    store = _store(*analyses)
+    stored = {record["id"]: record["decision"] for record in store.find(limit=10)}
+
+    sweep = RescoreSweep(expand_grid({"weights": {"cash_flow": [0.4, 1.0]}}))
+    lines = list(sweep.run(store.iter_analyses(batch_size=2)))
+
+    done = lines[-1]
+    assert done == {"type": "done", "analyses": 3, "errors": 1, "scenarios": 2}
+    baseline, unchanged, heavy = [line for line in lines if line["type"] == "scenario"]
+    assert sum(baseline["decisions"].values()) == 3
+    assert baseline["decisions"] == dict((d, list(stored.values()).count(d)) for d in baseline["decisions"])
+    assert set(unchanged["decision_deltas"].values()) == {0}
+    assert sum(heavy["decision_deltas"].values()) == 0
+
+    changes = [line for line in lines if line["type"] == "change"]
+    assert sum(heavy["transitions"].values()) == len(changes)
+    for change in changes:
+        assert change["baseline"]["decision"] == stored[change["id"]]
+        assert list(change["scenarios"]) == ["cash_flow=1.0"]
+
+
+def test_rescore_endpoint_streams_ndjson(monkeypatch):
+    from app.services import analysis_store
+    import main
+
+    monkeypatch.setattr(analysis_store, "_analysis_store", _store(_analysis(3000.0), _analysis(-2000.0, ending_balance=3000.0)))
+    client = TestClient(main.app)
+    response = client.post("/api/v1/analyses/rescore", json={"thresholds": {"low_score": 90}, "include_changes": False})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["scenario", "scenario", "done"]
+    assert lines[1]["flag_deltas"]["low_expenses_score"] == 2
+
+    assert client.post("/api/v1/analyses/rescore", json={"weights": {"bogus": 1}}).status_code == 400
+    huge = {f"w{axis}": list(range(10)) for axis in range(8)}
+    refused = client.post("/api/v1/analyses/rescore", json={"grid": {"weights": huge}})
+    assert refused.status_code == 422
+    assert "100000000 scenarios" in refused.json()["detail"]
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.utils.retry_policy import LatencyTracker, RetryableError, RetryPolicy, hedged
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(max_retries=5, base_delay=0.5, max_delay=2.0, attempt_timeout=1, deadline=10)
+    for attempt in range(8):
+        assert 0 <= policy.backoff(attempt) <= min(2.0, 0.5 * 2 ** attempt)
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(95) is None
+    for value in range(1, 101):
+        tracker.record(float(value))
+    assert tracker.percentile(95) == 95.0
+    assert tracker.percentile(50) == 50.0
+
+
+def test_hedge_wins_when_primary_is_slow():
+    delays = [1.0, 0.01]
+
+    async def call():
+        await asyncio.sleep(delays.pop(0))
+        return "ok"
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await hedged(call, delay=0.02)
+        return result, loop.time() - start
+
+    result, elapsed = asyncio.run(main())
+    assert result == "ok"
+    assert elapsed < 0.5
+
+
+def test_hedged_surfaces_primary_error_before_delay():
+    async def call():
+        raise RetryableError(503, "unavailable")
+
+    with pytest.raises(RetryableError):
+        asyncio.run(hedged(call, delay=0.5))
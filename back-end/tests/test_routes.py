@@ -0,0 +1,27 @@
+import os
+
+from app.core import config
+
+
+def test_upload_rejects_non_pdf(client):
+    response = client.post("/api/v1/analyze/upload", files={"file": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+
+
+def test_analyze_unknown_file_is_404(client):
+    assert client.post("/api/v1/analyze/analyze/missing.pdf").status_code == 404
+
+
+def test_upload_then_analyze_offline(client, sample_pdf):
+    upload = client.post("/api/v1/analyze/upload", files={"file": ("test-upload.pdf", sample_pdf, "application/pdf")})
+    assert upload.status_code == 200
+
+    response = client.post("/api/v1/analyze/analyze/test-upload.pdf")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["message"] == "Analysis completed successfully"
+    assert set(body["final_output"]["detailed_analysis"]["components"]) == {"cash_flow", "expenses", "income", "debt_credit"}
+    served = {route["stage"]: route["model"] for route in body["model_routes"]}
+    assert served["narrative"] == config.LLM_NARRATIVE_MODEL
+    assert served.get("analysis", config.LLM_ANALYSIS_MODEL) == config.LLM_ANALYSIS_MODEL  # chunks may be cached
+    assert not os.path.exists(os.path.join("app", "uploads", "test-upload.pdf"))
@@ -0,0 +1,107 @@
+import os
+import random
+
+import pytest
+import yaml
+
+from app.api.document_processing.bucket_score_service import BucketScoreService
+from app.api.document_processing.scoring import ScoringLlamaService
+from app.core import config
+from app.services.rules import CompiledRules, RulesError, RulesRegistry, load_rules
+
+WORDS = [
+    "consistent", "inconsistent", "stable", "unstable", "surplus", "deficit", "overdrawn", "high", "excessive",
+    "within budget", "reliable", "bank", "declining", "multiple", "good standing", "missed payment", "on time",
+    "concerning pattern", "well-managed", "minimal", "irregular", "Healthy", "STRONG",
+]
+
+
+def _random_analysis(rng: random.Random):
+    def money(low, high):
+        return rng.choice([0, 0.0, rng.uniform(low, high), float(rng.randint(low, high))])
+
+    inflow = money(0, 20000)
+    outflow = money(0, 20000)
+    cash_flow = {
+        "total_inflow": inflow,
+        "total_outflow": outflow,
+        "beginning_balance": rng.choice([money(0, 30000), 499.99, 500, 5000]),
+        "ending_balance": rng.choice([money(0, 30000), 500, 3999.99, 6000.01]),
+        "summary": " ".join(rng.sample(WORDS, rng.randint(0, 4))),
+    }
+    if rng.random() < 0.8:
+        cash_flow["net_flow"] = rng.choice([inflow - outflow, -1000, -1000.01, rng.uniform(-5000, 5000)])
+    return {
+        "cash_flow": cash_flow,
+        "expenses": {
+            "major_expenses": [{"amount": money(100, 5000)} for _ in range(rng.randint(0, 6))],
+            "recurring_expenses": [{"amount": money(10, 800)} for _ in range(rng.randint(0, 12))],
+            "summary": " ".join(rng.sample(WORDS, rng.randint(0, 3))),
+        },
+        "income": {
+            "regular_sources": [{"total_amount": money(500, 9000)} for _ in range(rng.randint(0, 3))],
+            "irregular_sources": [{"amount": money(10, 3000)} for _ in range(rng.randint(0, 4))],
+            "summary": " ".join(rng.sample(WORDS, rng.randint(0, 3))),
+        },
+        "debt_credit": {
+            "recurring_debt_payments": [{"amount": money(50, 2000)} for _ in range(rng.randint(0, 3))],
+            "inferred_liability_types": rng.sample(["Mortgage", "auto loan", "credit card", "student loan", "loan", "BNPL"], rng.randint(0, 6)),
+            "summary": " ".join(rng.sample(WORDS, rng.randint(0, 3))),
+        },
+    }
+
+
+def test_shipped_rules_match_hand_written_scores():
+    rules = load_rules(config.SCORING_RULES_PATH)
+    rng = random.Random(40)
+    for _ in range(5000):
+        analysis = _random_analysis(rng)
+        assert rules.bucket_scores(analysis) == BucketScoreService.calculate_bucket_scores(analysis), analysis
+
+
+def test_scoring_service_uses_rules_weights_and_thresholds(tmp_path):
+    with open(config.SCORING_RULES_PATH) as f:
+        spec = yaml.safe_load(f)
+    spec["weights"] = {"cash_flow": 1.0, "expenses": 0.0, "income": 0.0, "debt_credit": 0.0}
+    spec["thresholds"]["low_score"] = 99
+    service = ScoringLlamaService(thresholds={"negative_cash_flow": -10}, rules=CompiledRules(spec))
+    service.debug = False
+    result = service.calculate_score(_random_analysis(random.Random(1)))
+    assert result["final_score"] == result["component_scores"]["cash_flow"]
+    assert service.thresholds["low_score"] == 99 and service.thresholds["negative_cash_flow"] == -10
+    assert sum(flag["type"].startswith("low_") for flag in result["flags"]) == 4
+
+
+@pytest.mark.parametrize("expression", [
+    '__import__("os").system("true")',
+    "data.__class__",
+    "inflow ** 999999",
+    "[x for x in outflow]",
+    "open('/etc/passwd')",
+    "unknown_name + 1",
+])
+def test_expressions_outside_the_whitelist_are_rejected(expression):
+    with open(config.SCORING_RULES_PATH) as f:
+        spec = yaml.safe_load(f)
+    spec["buckets"]["cash_flow"]["numeric"]["cases"][0]["score"] = expression
+    with pytest.raises(RulesError):
+        CompiledRules(spec)
+
+
+def test_registry_reloads_on_change_and_keeps_last_good(tmp_path):
+    path = tmp_path / "rules.yaml"
+    with open(config.SCORING_RULES_PATH) as f:
+        spec = yaml.safe_load(f)
+    path.write_text(yaml.safe_dump(spec, sort_keys=False))
+    registry = RulesRegistry(str(path), reload_interval=0)
+    first = registry.current()
+    assert registry.current() is first  # unchanged file is not recompiled
+
+    spec["weights"]["cash_flow"] = 0.5
+    path.write_text(yaml.safe_dump(spec, sort_keys=False))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    second = registry.current()
+    assert second is not first and second.weights["cash_flow"] == 0.5
+
+    path.write_text("buckets: [not, a, mapping]\n")
+    assert registry.current() is second
@@ -0,0 +1,39 @@
+from app.api.document_processing.bucket_score_service import BucketScoreService
+from app.api.document_processing.scoring import ScoringLlamaService
+
+
+def _analysis(**cash_flow):
+    base = {
+        "total_inflow": 10000.0,
+        "total_outflow": 8000.0,
+        "net_flow": 2000.0,
+        "beginning_balance": 5000.0,
+        "ending_balance": 5500.0,
+        "summary": "",
+    }
+    base.update(cash_flow)
+    return {
+        "cash_flow": base,
+        "expenses": {"major_expenses": [], "recurring_expenses": [], "summary": ""},
+        "income": {"regular_sources": [], "irregular_sources": [], "summary": ""},
+        "debt_credit": {"recurring_debt_payments": [], "inferred_liability_types": "", "summary": ""},
+    }
+
+
+def test_low_balance_overrides_cash_flow_ratio():
+    assert BucketScoreService.score_cash_flow(_analysis(beginning_balance=100)["cash_flow"]) == 44
+
+
+def test_summary_keywords_move_text_score():
+    neutral = BucketScoreService.score_cash_flow(_analysis()["cash_flow"])
+    positive = BucketScoreService.score_cash_flow(_analysis(summary="healthy surplus")["cash_flow"])
+    negative = BucketScoreService.score_cash_flow(_analysis(summary="overdrawn deficit")["cash_flow"])
+    assert negative < neutral < positive
+
+
+def test_calculate_score_weights_and_flags():
+    result = ScoringLlamaService().calculate_score(_analysis(net_flow=-50.0))
+    scores = result["component_scores"]
+    expected = 0.4 * scores["cash_flow"] + 0.2 * scores["expenses"] + 0.3 * scores["income"] + 0.1 * scores["debt_credit"]
+    assert result["final_score"] == round(expected, 2)
+    assert any(flag["type"] == "negative_cash_flow" for flag in result["flags"])
@@ -0,0 +1,52 @@
+import io
+import os
+import subprocess
+import sys
+
+from app.api.routes.analyze import _store_upload
+from app.services.job_store import SQLiteJobStore
+from app.utils.cache import SQLiteCache
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_sqlite_cache_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    script = (
+        "import sys; from app.utils.cache import SQLiteCache; "
+        "SQLiteCache(sys.argv[1], 100).set('parse', 'page-1', {'text': 'from another worker'})"
+    )
+    subprocess.run([sys.executable, "-c", script, path], cwd=BACKEND_DIR, check=True)
+
+    cache = SQLiteCache(path, 100)
+    assert cache.get("parse", "page-1") == {"text": "from another worker"}
+    assert cache.get("parse", "page-2") is None
+
+
+def test_sqlite_cache_prunes_oldest_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteCache, "PRUNE_EVERY", 5)
+    cache = SQLiteCache(str(tmp_path / "cache.db"), 3)
+    for i in range(10):
+        cache.set("analysis", str(i), i)
+    assert cache.get("analysis", "0") is None
+    assert cache.get("analysis", "9") == 9
+
+
+def test_upload_is_renamed_into_place(tmp_path):
+    target = tmp_path / "statement.pdf"
+    _store_upload(io.BytesIO(b"%PDF-1.4 body"), str(target))
+    assert target.read_bytes() == b"%PDF-1.4 body"
+    assert os.listdir(tmp_path) == ["statement.pdf"]
+
+
+def test_job_of_a_dead_worker_is_abandoned(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    job_id = store.start("statement.pdf", "a-1")
+    assert store.get(job_id)["status"] == "running"
+
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    store._connection.execute("UPDATE jobs SET worker_pid = ? WHERE id = ?", (int(dead.stdout), job_id))
+    assert store.get(job_id)["status"] == "abandoned"
+
+    store.fail(job_id, "boom")
+    assert store.get(job_id)["status"] == "failed"
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.document_processing.maverick_analyzer import SECTION_BUCKETS, MaverickAnalyzer
+from app.api.document_processing.scoring import ScoringLlamaService
+from app.core import config
+from app.utils.cache import MemoryCache
+from app.utils.json_stream import JSONSectionStream
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import FAKE_ANALYSIS, FakeBackend
+
+
+@pytest.mark.parametrize("step", [1, 3, 17, 100000])
+def test_section_stream_emits_each_member_once_closed(step):
+    document = dict(FAKE_ANALYSIS, note='braces } ] { and "quotes" \\ inside', count=3, flag=None)
+    text = "Here is the analysis:\n```json\n" + json.dumps(document, indent=2) + "\n```\nDone."
+    parser = JSONSectionStream()
+    sections = []
+    for start in range(0, len(text), step):
+        sections.extend(parser.feed(text[start:start + step]))
+    assert parser.done
+    assert [key for key, _ in sections] == list(document)
+    assert {key: json.loads(raw) for key, raw in sections} == document
+
+
+class CountingBackend(FakeBackend):
+    """Records how many deltas had been sent when each section callback ran"""
+
+    def __init__(self):
+        super().__init__(stream_chunk_chars=16)
+        self.sent = 0
+        self.total = 0
+
+    async def stream(self, payload):
+        async for chunk in super().stream(payload):
+            self.sent += 1
+            yield chunk
+        self.total = self.sent
+
+
+def test_buckets_are_scored_before_the_analysis_completes(monkeypatch):
+    monkeypatch.setattr(config, "ANALYSIS_PAGES_PER_CHUNK", 2)
+    monkeypatch.setattr(config, "LLM_STREAMING", True)
+    backend = CountingBackend()
+    analyzer = MaverickAnalyzer(cache=MemoryCache(100))
+    analyzer.llama_client = LlamaClient(backend=backend)
+    scoring = ScoringLlamaService()
+    scoring.debug = False
+    arrivals = {}
+
+    async def on_section(bucket, data):
+        arrivals[bucket] = (backend.sent, scoring.score_bucket(bucket, data))
+
+    pages = [{"content": f"page {i} transactions"} for i in range(4)]
+    analysis = asyncio.run(analyzer.analyze_transactions({"documents": pages}, on_section=on_section))
+
+    assert set(arrivals) == set(SECTION_BUCKETS.values())
+    assert arrivals["cash_flow"][0] < backend.total
+    final = scoring.calculate_score(analysis)["component_scores"]
+    assert {bucket: score for bucket, (_, score) in arrivals.items()} == final
+
+    # A cached re-run delivers every bucket without calling the model
+    arrivals.clear()
+    asyncio.run(analyzer.analyze_transactions({"documents": pages}, on_section=on_section))
+    assert {bucket: score for bucket, (_, score) in arrivals.items()} == final
+
+
+@pytest.mark.parametrize("backend", [FakeBackend(stream_chunk_chars=32)])
+def test_stream_endpoint_sends_buckets_then_result(client, sample_pdf):
+    assert client.post("/api/v1/analyze/analyze/missing.pdf/stream").status_code == 404
+    client.post("/api/v1/analyze/upload", files={"file": ("stream-test.pdf", sample_pdf, "application/pdf")})
+    response = client.post("/api/v1/analyze/analyze/stream-test.pdf/stream")
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    kinds = [event["event"] for event in events]
+    assert kinds == ["parsed", "bucket", "bucket", "bucket", "bucket", "scored", "result"]
+    buckets = {event["bucket"]: event["score"] for event in events if event["event"] == "bucket"}
+    assert buckets == events[5]["component_scores"]
+    assert events[-1]["final_output"]["summary"]["overall_score"] == events[5]["final_score"]
@@ -0,0 +1,59 @@
+from app.utils.parsing import StatementParser
+from app.utils.textract_index import BlockIndex, detect_column_roles
+from benchmarks.stubs import textract_table
+
+
+CHECKING = [
+    ["Date", "Transaction Details", "Withdrawals", "Deposits", "Balance"],
+    ["03/01/2024", "ACME PAYROLL", "", "2,500.00", "3,000.00"],
+    ["03/02/2024", "CARD PURCHASE", "45.10", "", "2,954.90"],
+    ["", "STAPLES #123", "", "", ""],
+]
+SUMMARY = [["Account", "Number"], ["Checking", "1234"]]
+PAGE_TWO = [
+    ["Posted", "Description", "Amount"],
+    ["03/05/2024", "RENT", "-1,200.00"],
+]
+
+
+def test_tables_are_rebuilt_per_page_without_interleaving():
+    # Page 2 blocks arrive first and tables interleave in the block list
+    blocks = textract_table(2, "t3", PAGE_TWO) + textract_table(1, "t1", CHECKING) + textract_table(1, "t2", SUMMARY)
+    tables = BlockIndex(blocks).tables()
+    assert [(t.page, t.table_id) for t in tables] == [(1, "t1"), (1, "t2"), (2, "t3")]
+    assert tables[0].grid[2] == ["03/02/2024", "CARD PURCHASE", "45.10", "", "2,954.90"]
+    assert tables[0].roles == {0: "date", 1: "description", 2: "debit", 3: "credit", 4: "balance"}
+    assert tables[1].records() == []
+
+
+def test_debit_credit_columns_and_wrapped_rows_become_records():
+    table = BlockIndex(textract_table(1, "t1", CHECKING)).tables()[0]
+    assert table.records() == [
+        {"date": "03/01/2024", "description": "ACME PAYROLL", "amount": "2,500.00", "balance": "3,000.00"},
+        {"date": "03/02/2024", "description": "CARD PURCHASE STAPLES #123", "amount": "-45.10", "balance": "2,954.90"},
+    ]
+
+
+def test_roles_inferred_from_content_without_header():
+    body = [["STARBUCKS", "01/03/2024", "4.50", "95.50"], ["PAYROLL", "01/04/2024", "100.00", "195.50"]]
+    assert detect_column_roles([], body) == {1: "date", 3: "balance", 2: "amount", 0: "description"}
+
+
+def test_statement_parser_uses_the_index():
+    blocks = textract_table(1, "t1", CHECKING) + textract_table(2, "t3", PAGE_TWO)
+    parser = StatementParser({"Blocks": blocks})
+    assert parser.extract_table_data() == [
+        {"date": "2024-03-01", "description": "ACME PAYROLL", "amount": "2500.00"},
+        {"date": "2024-03-02", "description": "CARD PURCHASE STAPLES #123", "amount": "-45.10"},
+        {"date": "2024-03-05", "description": "RENT", "amount": "-1200.00"},
+    ]
+
+
+def test_cells_without_table_blocks_still_parse():
+    cells = []
+    for r, row in enumerate([["03/01/2024", "COFFEE", "4.50"], ["03/02/2024", "LUNCH", "12.00"]], start=1):
+        for c, text in enumerate(row, start=1):
+            cells.append({"BlockType": "CELL", "RowIndex": r, "ColumnIndex": c, "Text": text})
+    assert StatementParser({"Blocks": cells}).extract_table_data()[1] == {
+        "date": "2024-03-02", "description": "LUNCH", "amount": "12.00"
+    }
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.analysis_store import SQLiteAnalysisStore
+from app.utils.llama_client import LlamaClient
+from app.utils.llm_backends import FakeBackend
+from app.utils.model_router import STAGE_ANALYSIS, STAGE_NARRATIVE, ModelRouter, StageRoute
+from app.utils.token_accounting import compact_prompt, start_token_ledger
+
+TABLE = "\n".join(
+    ["| Date       | Description          |   Amount   |", "|------------|----------------------|------------|"]
+    + [f"| 2024-01-{day:02d} | GROCERY STORE #{day:<5} |{-day * 3.25:>11.2f} |" for day in range(1, 29)]
+)
+
+
+class UsageBackend(FakeBackend):
+    """Fake backend that reports provider usage like a hosted API"""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    async def complete(self, payload):
+        self.prompts.append(payload["messages"][-1]["content"])
+        response = await super().complete(payload)
+        response["usage"] = {"prompt_tokens": 1000, "completion_tokens": 200}
+        return response
+
+
+def _client(backend, max_prompt_tokens=0):
+    router = ModelRouter({
+        STAGE_ANALYSIS: StageRoute(STAGE_ANALYSIS, "tokens-large", 4096, 30.0, max_prompt_tokens=max_prompt_tokens),
+        STAGE_NARRATIVE: StageRoute(STAGE_NARRATIVE, "tokens-small", 1024, 30.0),
+    })
+    return LlamaClient(backend=backend, router=router)
+
+
+def test_ledger_rolls_up_per_stage():
+    client = _client(UsageBackend())
+
+    async def main():
+        ledger = start_token_ledger()
+        ledger.pages = 2
+        await asyncio.gather(
+            client.get_completion("analyze page 1", STAGE_ANALYSIS),
+            client.get_completion("analyze page 2", STAGE_ANALYSIS),
+        )
+        await client.get_completion("component_analysis please", STAGE_NARRATIVE)
+        return ledger.summary()
+
+    summary = asyncio.run(main())
+    assert summary["calls"] == 3
+    assert summary["estimated"] is False
+    assert summary["prompt_tokens"] == 3000
+    assert summary["total_tokens"] == 3600
+    assert summary["stages"][STAGE_ANALYSIS] == {
+        "calls": 2, "prompt_tokens": 2000, "completion_tokens": 400, "models": ["tokens-large"]
+    }
+    assert summary["stages"][STAGE_NARRATIVE]["models"] == ["tokens-small"]
+    assert summary["analysis_prompt_tokens_per_page"] == 1000.0
+
+
+def test_oversized_prompt_is_compacted_or_refused(monkeypatch):
+    backend = UsageBackend()
+    client = _client(backend, max_prompt_tokens=350)
+
+    async def main(prompt):
+        ledger = start_token_ledger()
+        await client.get_completion(prompt, STAGE_ANALYSIS)
+        return ledger.calls[0]
+
+    call = asyncio.run(main(TABLE))
+    assert call["compacted"] is True
+    assert "---" not in backend.prompts[-1] and "GROCERY STORE #7|" in backend.prompts[-1]
+
+    monkeypatch.setattr("app.core.config.LLM_PROMPT_BUDGET_ACTION", "abort")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(main(TABLE))
+    assert raised.value.status_code == 413
+    assert len(backend.prompts) == 1
+
+
+def test_request_budget_stops_further_calls():
+    backend = UsageBackend()
+    client = _client(backend)
+
+    async def main():
+        start_token_ledger(budget=2500)
+        await client.get_completion("analyze this", STAGE_ANALYSIS)
+        await client.get_completion("and this", STAGE_ANALYSIS)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(main())
+    assert raised.value.status_code == 413
+    assert backend.calls == 1
+
+
+def test_request_budget_holds_for_concurrent_calls():
+    backend = UsageBackend()
+    client = _client(backend)
+    route = client.router.route(STAGE_ANALYSIS)
+    estimate = client._estimate_tokens(client._payload("analyze page 0", "tokens-large", route.max_tokens), route)
+
+    async def main():
+        ledger = start_token_ledger(budget=2 * estimate)
+        results = await asyncio.gather(
+            *(client.get_completion(f"analyze page {i}", STAGE_ANALYSIS) for i in range(5)),
+            return_exceptions=True
+        )
+        return ledger, results
+
+    ledger, results = asyncio.run(main())
+    refused = [r for r in results if isinstance(r, HTTPException)]
+    assert len(refused) == 3 and all(r.status_code == 413 for r in refused)
+    assert backend.calls == 2
+    assert ledger.reserved == 0
+
+
+def test_compaction_keeps_every_amount():
+    compacted = compact_prompt(TABLE)
+    assert len(compacted) < len(TABLE) * 0.75
+    for day in range(1, 29):
+        assert f"-{day * 3.25:.2f}" in compacted
+
+
+def test_store_totals_per_applicant():
+    store = SQLiteAnalysisStore(":memory:")
+    usage = {
+        "prompt_tokens": 3000,
+        "completion_tokens": 600,
+        "stages": {
+            STAGE_ANALYSIS: {"calls": 2, "prompt_tokens": 2500, "completion_tokens": 400},
+            STAGE_NARRATIVE: {"calls": 1, "prompt_tokens": 500, "completion_tokens": 200},
+        },
+    }
+    for applicant, token_usage in [("a-1", usage), ("a-1", usage), ("a-2", usage), ("a-1", None)]:
+        store.save("h", applicant, "s.pdf", {}, {}, {"final_score": 70}, {}, token_usage)
+
+    totals = store.token_usage("a-1")
+    assert totals["analyses"] == 3 and totals["accounted_analyses"] == 2
+    assert totals["total_tokens"] == 7200
+    assert totals["average_tokens"] == 3600.0
+    assert totals["stages"][STAGE_ANALYSIS] == {"calls": 4, "prompt_tokens": 5000, "completion_tokens": 800}
+    assert store.token_usage()["prompt_tokens"] == 9000
+    assert store.find(applicant_id="a-2")[0]["prompt_tokens"] == 3000
@@ -0,0 +1,94 @@
+import json
+import os
+
+from app.utils import tracing
+from app.utils.tracing import OTLPFileExporter, SpanExporter, Tracer, traced
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        self.requests = []
+
+    def export(self, request):
+        self.requests.append(request)
+
+    def spans(self):
+        return [
+            span
+            for request in self.requests
+            for resource in request["resourceSpans"]
+            for scope in resource["scopeSpans"]
+            for span in scope["spans"]
+        ]
+
+
+def _attributes(span):
+    return {item["key"]: next(iter(item["value"].values())) for item in span["attributes"]}
+
+
+def test_spans_nest_and_export_as_otlp_json(tmp_path, monkeypatch):
+    path = str(tmp_path / "traces.jsonl")
+    tracer = Tracer(OTLPFileExporter(path), "test-service")
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+
+    @traced("child")
+    def child():
+        tracing.current_span().add("retries")
+        raise ValueError("bad statement")
+
+    traceparent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+    with tracer.span("root", tracing.SPAN_KIND_SERVER, traceparent=traceparent) as root:
+        try:
+            child()
+        except ValueError:
+            pass
+    tracer.shutdown()
+
+    with open(path) as f:
+        (request,) = [json.loads(line) for line in f]
+    resource = request["resourceSpans"][0]
+    assert {"key": "service.name", "value": {"stringValue": "test-service"}} in resource["resource"]["attributes"]
+    failed, finished = resource["scopeSpans"][0]["spans"]
+    assert finished["traceId"] == failed["traceId"] == "a" * 32
+    assert finished["parentSpanId"] == "b" * 16
+    assert failed["parentSpanId"] == root.span_id
+    assert failed["status"]["code"] == tracing.STATUS_ERROR
+    assert failed["events"][0]["name"] == "exception"
+    assert _attributes(failed) == {"retries": "1"}
+
+
+def test_analyze_is_traced_end_to_end(monkeypatch, client, sample_pdf):
+    exporter = MemoryExporter()
+    tracer = Tracer(exporter, "test-service")
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    client.post("/api/v1/analyze/upload", files={"file": ("trace-test.pdf", sample_pdf, "application/pdf")})
+    response = client.post("/api/v1/analyze/analyze/trace-test.pdf")
+    assert response.status_code == 200
+    tracer.flush()
+
+    spans = {span["name"]: span for span in exporter.spans()}
+    root = spans["analyze_statement"]
+    assert root["traceId"] == response.json()["trace_id"]
+    assert {span["traceId"] for span in spans.values()} == {root["traceId"]}
+    for name in ("MaverickAnalyzer.analyze_transactions", "ScoringLlamaService.calculate_score",
+                 "OutputGenerator.generate_output"):
+        assert spans[name]["parentSpanId"] == root["spanId"]
+    assert int(_attributes(root)["pages"]) > 0
+    assert "cache.hit" in _attributes(spans["MaverickAnalyzer.analyze_transactions"])
+
+    completion = _attributes(spans["LlamaClient.get_completion"])
+    assert completion["llm.retry_count"] == "0"
+    assert completion["llm.fallback_used"] is False
+    assert int(completion["gen_ai.usage.input_tokens"]) > 0
+
+
+def test_file_exporter_rotates_at_its_size_cap(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = OTLPFileExporter(path, max_bytes=200, backups=2)
+    for i in range(10):
+        exporter.export({"batch": i, "padding": "x" * 50})
+
+    assert sorted(os.listdir(tmp_path)) == ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"]
+    assert all(os.path.getsize(os.path.join(tmp_path, name)) <= 200 for name in os.listdir(tmp_path))
+    with open(path) as f:
+        assert json.loads(f.readlines()[-1])["batch"] == 9
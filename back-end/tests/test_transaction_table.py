@@ -0,0 +1,63 @@
+from datetime import datetime
+from decimal import Decimal
+
+from app.models.transaction import Transaction
+from app.models.transaction_table import TransactionTable, TransactionTableBuilder, to_epoch_day
+from app.services.llama_classifier import LlamaClassifier
+from app.services.preprocessor import PreprocessingService
+
+
+def _transactions():
+    return [
+        Transaction(date=datetime(2024, 1, 5), description="PAYROLL", amount=Decimal("2500.00"),
+                    transaction_type="credit", balance_after=Decimal("3000.00"), category="income"),
+        Transaction(date=datetime(2024, 1, 9), description="RENT", amount=Decimal("-1200.50"),
+                    transaction_type="debit", balance_after=Decimal("1799.50")),
+        Transaction(date=datetime(2024, 2, 5), description="PAYROLL", amount=Decimal("2500.00"),
+                    transaction_type="credit", balance_after=Decimal("4299.50"), category="income"),
+    ]
+
+
+def test_round_trip_through_models():
+    transactions = _transactions()
+    table = TransactionTable.from_transactions(transactions)
+    assert len(table.strings) == 3  # PAYROLL and "income" are interned once
+    assert table.to_transactions() == transactions
+
+
+def test_vectorized_aggregates_match_row_sums():
+    table = TransactionTable.from_transactions(_transactions())
+    assert table.inflow_cents() == 500000
+    assert table.outflow_cents() == 120050
+    assert table.net_cents() == 379950
+    assert table.monthly() == {
+        "2024-01": {"inflow": 2500.0, "outflow": 1200.5, "net": 1299.5},
+        "2024-02": {"inflow": 2500.0, "outflow": 0.0, "net": 2500.0},
+    }
+
+
+def test_extract_metrics_accepts_models_or_table():
+    classifier = LlamaClassifier()
+    from_models = classifier.extract_metrics(_transactions())
+    from_table = classifier.extract_metrics(TransactionTable.from_transactions(_transactions()))
+    assert from_models == from_table
+    assert from_table["net_flow"] == 3799.5
+    assert round(from_table["average_transaction"], 2) == 2066.83
+
+
+def test_builder_and_preprocessor_produce_tables():
+    builder = TransactionTableBuilder()
+    builder.append(to_epoch_day(datetime(2024, 3, 1)), "FEE", -400)
+    assert TransactionTable.empty().monthly() == {}
+    assert builder.build().outflow_cents() == 400
+
+    preprocessor = PreprocessingService()
+    preprocessor.debug = False
+    blocks = [
+        {"BlockType": "LINE", "Text": "Deposits", "Geometry": {"BoundingBox": {"Left": 0.1, "Top": 0.1}}},
+        {"BlockType": "LINE", "Text": "ACME PAYROLL 100.00", "Geometry": {"BoundingBox": {"Left": 0.1, "Top": 0.2}}},
+    ]
+    table = preprocessor.textract_blocks_table(blocks)
+    assert len(table) == 2
+    assert table.category(1) == "Deposits"
+    assert preprocessor.process_textract_blocks(blocks) == table.to_transactions()